@@ -0,0 +1,114 @@
+#!/usr/bin/python
+# Caching helpers for avoiding repeated work on packets we've already seen
+import time
+import heapq
+from collections import OrderedDict
+
+class LRUCache:
+    """ A bounded dictionary that evicts the least recently used entry when full.
+    Keeps hit/miss counts for reporting. """
+    def __init__(self, capacity):
+        assert capacity > 0
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """ Returns the value for key (marking it as recently used), or None if not present """
+        if key not in self.entries:
+            self.misses += 1
+            return None
+        self.hits += 1
+        value = self.entries.pop(key)
+        self.entries[key] = value
+        return value
+
+    def put(self, key, value):
+        if key in self.entries:
+            self.entries.pop(key)
+        elif len(self.entries) >= self.capacity:
+            self.entries.popitem(last=False)
+        self.entries[key] = value
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def clear(self):
+        self.entries.clear()
+
+    def get_stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": float(self.hits) / lookups if lookups > 0 else None
+        }
+
+class DedupIndex:
+    """ Remembers keys seen within the last window_s seconds (up to capacity of them, dropping those
+    closest to expiring first) to detect repeats. Each key has an entry dict recording when it was
+    first and last seen and how many times, which callers may add their own metadata to. """
+    def __init__(self, window_s, capacity):
+        assert capacity > 0
+        self.window_s = window_s
+        self.capacity = capacity
+        self.entries = {}
+        self.expiries = [] # heap of (expiry time, key); keys expire window_s after first seen
+        self.checks = 0
+        self.duplicates = 0
+
+    def check(self, key, now=None):
+        """ Returns the entry for key if it was seen within the window (counting the repeat),
+        otherwise adds it and returns None """
+        if now is None:
+            now = time.time()
+        self.expire(now)
+        self.checks += 1
+
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.duplicates += 1
+            entry["count"] += 1
+            entry["last_seen"] = now
+            return entry
+
+        if len(self.entries) >= self.capacity:
+            _, oldest = heapq.heappop(self.expiries)
+            del self.entries[oldest]
+        self.entries[key] = {"first_seen": now, "last_seen": now, "count": 1}
+        heapq.heappush(self.expiries, (now + self.window_s, key))
+        return None
+
+    def expire(self, now=None):
+        """ Removes all keys whose window has passed """
+        if now is None:
+            now = time.time()
+        while len(self.expiries) > 0 and self.expiries[0][0] <= now:
+            _, key = heapq.heappop(self.expiries)
+            del self.entries[key]
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def clear(self):
+        self.entries.clear()
+        self.expiries = []
+
+    def get_stats(self):
+        return {
+            "size": len(self.entries),
+            "capacity": self.capacity,
+            "window_s": self.window_s,
+            "checks": self.checks,
+            "duplicates": self.duplicates,
+            "dedup_rate": float(self.duplicates) / self.checks if self.checks > 0 else None
+        }
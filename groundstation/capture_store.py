@@ -0,0 +1,166 @@
+#!/usr/bin/python
+# Append-only, time-indexed store of the raw data we receive.
+# A capture is a directory of segment files, each a sequence of records:
+#   <receive timestamp (double, seconds since epoch)><data length (uint32)><data>
+# with timestamps never decreasing. Alongside each segment is a sparse index of
+# (timestamp, offset) entries, so a time range can be found without scanning whole segments.
+import os
+import glob
+import mmap
+import time
+import struct
+import datetime
+from bisect import bisect_right
+
+RECORD_HEADER = struct.Struct("<dI")
+INDEX_ENTRY = struct.Struct("<dQ")
+SEGMENT_PREFIX = "capture-"
+SEGMENT_EXT = ".cap"
+INDEX_EXT = ".idx"
+
+class CaptureWriter:
+    """ Appends timestamped records of raw data to the capture in directory. A new segment is started
+    once the current one reaches segment_size bytes or has been open for segment_interval_s, and
+    an index entry is added for at least every index_interval bytes of records. """
+    def __init__(self, directory, segment_size=64*1024*1024, segment_interval_s=60*60, index_interval=64*1024):
+        self.directory = directory
+        self.segment_size = segment_size
+        self.segment_interval_s = segment_interval_s
+        self.index_interval = index_interval
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        self.segment = None
+        self.index = None
+        self.segment_path = None
+        self.segment_opened = None
+        self.segment_len = 0
+        self.last_indexed = None # offset of the last indexed record
+        self.last_timestamp = None
+
+    def append(self, data, timestamp=None):
+        """ Adds a record of the given raw data received at timestamp (now if None).
+        Timestamps earlier than the last record's (i.e. if the clock jumps back) are raised to it. """
+        if timestamp is None:
+            timestamp = time.time()
+        if self.last_timestamp is not None and timestamp < self.last_timestamp:
+            timestamp = self.last_timestamp
+        self.last_timestamp = timestamp
+
+        if self.segment is None or self.segment_len >= self.segment_size or \
+                timestamp - self.segment_opened >= self.segment_interval_s:
+            self._start_segment(timestamp)
+
+        if self.last_indexed is None or self.segment_len - self.last_indexed >= self.index_interval:
+            self.index.write(INDEX_ENTRY.pack(timestamp, self.segment_len))
+            self.last_indexed = self.segment_len
+
+        self.segment.write(RECORD_HEADER.pack(timestamp, len(data)))
+        self.segment.write(data)
+        self.segment_len += RECORD_HEADER.size + len(data)
+
+    def flush(self):
+        if self.segment is not None:
+            self.segment.flush()
+            self.index.flush()
+
+    def sync(self):
+        """ Flushes and fsyncs the current segment and index """
+        if self.segment is not None:
+            self.flush()
+            os.fsync(self.segment.fileno())
+            os.fsync(self.index.fileno())
+
+    def close(self):
+        if self.segment is not None:
+            self.flush()
+            self.segment.close()
+            self.index.close()
+            self.segment = None
+            self.index = None
+
+    def _start_segment(self, timestamp):
+        self.close()
+        start = datetime.datetime.utcfromtimestamp(timestamp).strftime("%Y%m%dT%H%M%S.%f")
+        self.segment_path = os.path.join(self.directory, SEGMENT_PREFIX + start + SEGMENT_EXT)
+        self.segment = open(self.segment_path, "ab")
+        self.index = open(self.segment_path[:-len(SEGMENT_EXT)] + INDEX_EXT, "ab")
+        self.segment_opened = timestamp
+        self.segment_len = os.path.getsize(self.segment_path)
+        self.last_indexed = None
+
+class CaptureReader:
+    """ Reads the records of the capture in directory """
+    def __init__(self, directory):
+        self.directory = directory
+
+    def segments(self):
+        """ Returns the paths of all segments, in time order """
+        return sorted(glob.glob(os.path.join(self.directory, SEGMENT_PREFIX + "*" + SEGMENT_EXT)))
+
+    @staticmethod
+    def read_index(segment_path):
+        """ Returns parallel lists of the timestamps and record offsets in the index of the given segment """
+        timestamps = []
+        offsets = []
+        try:
+            with open(segment_path[:-len(SEGMENT_EXT)] + INDEX_EXT, "rb") as index:
+                data = index.read()
+        except IOError:
+            return timestamps, offsets
+        for i in range(len(data) // INDEX_ENTRY.size):
+            timestamp, offset = INDEX_ENTRY.unpack_from(data, i*INDEX_ENTRY.size)
+            timestamps.append(timestamp)
+            offsets.append(offset)
+        return timestamps, offsets
+
+    @staticmethod
+    def first_timestamp(segment_path):
+        """ Returns the timestamp of the first record in the given segment, or None if it's empty """
+        with open(segment_path, "rb") as segment:
+            header = segment.read(RECORD_HEADER.size)
+        if len(header) < RECORD_HEADER.size:
+            return None
+        return RECORD_HEADER.unpack(header)[0]
+
+    def read(self, start=None, end=None):
+        """ Iterates over (timestamp, data) for all records received in [start, end) (timestamps in seconds
+        since epoch; unbounded if None). The data are read-only buffers into the memory-mapped segments,
+        so nothing is copied unless the caller does. """
+        segments = [(path, CaptureReader.first_timestamp(path)) for path in self.segments()]
+        segments = [(path, first) for path, first in segments if first is not None]
+        for i, (path, first) in enumerate(segments):
+            if end is not None and first >= end:
+                break
+            # skip segments that end (i.e. the next one starts) before the range
+            if start is not None and i + 1 < len(segments) and segments[i + 1][1] < start:
+                continue
+            for record in CaptureReader._read_segment(path, start, end):
+                yield record
+
+    @staticmethod
+    def _read_segment(path, start, end):
+        size = os.path.getsize(path)
+        if size == 0:
+            return
+        # jump to the last indexed record before the start
+        offset = 0
+        if start is not None:
+            timestamps, offsets = CaptureReader.read_index(path)
+            i = bisect_right(timestamps, start) - 1
+            if i >= 0:
+                offset = offsets[i]
+
+        with open(path, "rb") as segment:
+            mm = mmap.mmap(segment.fileno(), size, access=mmap.ACCESS_READ)
+        # (the buffers we return keep the map open as long as they're referenced)
+        while offset + RECORD_HEADER.size <= size:
+            timestamp, length = RECORD_HEADER.unpack_from(mm, offset)
+            data_offset = offset + RECORD_HEADER.size
+            if data_offset + length > size:
+                break # partially written record
+            if end is not None and timestamp >= end:
+                break
+            if start is None or timestamp >= start:
+                yield timestamp, buffer(mm, data_offset, length)
+            offset = data_offset + length
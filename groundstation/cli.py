@@ -40,6 +40,18 @@ class GroundstationCLI(cmd.Cmd):
         print("last data rx:            %s" % self.station.get_last_data_rx())
         print("last packet rx:          %s" % self.station.get_last_packet_rx())
         print("update pass data time:   %s" % self.station.get_update_pass_data_time())
+        print("decode cache:            %s" % self.station.get_decode_cache_stats())
+        print("packet sync:             %s" % self.station.get_sync_stats())
+        print("packet dedup:            %s" % self.station.get_dedup_stats())
+        print("rx dump:                 %s" % self.station.get_rx_dump_stats())
+        print("main loop:               %s" % self.station.get_loop_stats())
+        print("tracking:                %s" % self.station.get_tracking_stats())
+        print("tle refresh:             %s" % self.station.get_tle_stats())
+        print("pass schedule:           %s" % self.station.get_pass_schedule_stats())
+        print("schedule:                %s" % self.station.get_schedule_stats())
+        print("runtime:                 %s" % self.station.get_runtime_stats())
+        print("publisher:               %s" % self.station.get_publisher_stats())
+        print("publish spool:           %s" % self.station.get_spool_stats())
 
         print("doppler corrections: \n%s" % self.station.get_doppler_corrections_str())
 
@@ -92,19 +104,21 @@ class GroundstationCLI(cmd.Cmd):
                 print("command not in queue:")
                 print(self.station.get_tx_cmd_queue())
 
-def start_station(station, radio_preconfig, serial_port, serial_baud, ser_infilename, ser_outfilename):
+def start_station(station, radio_preconfig, serial_port, serial_baud, ser_infilename, ser_outfilename, ser_capture_dir=None,
+                  threaded=False):
     if radio_preconfig is None:
         radio_preconfig = False
 
     def runner_serial():
-        station.run(serial_port=serial_port, serial_baud=serial_baud, radio_preconfig=radio_preconfig)
+        station.run(serial_port=serial_port, serial_baud=serial_baud, radio_preconfig=radio_preconfig, threaded=threaded)
     def runner_test():
-        station.run(ser_infilename=ser_infilename, ser_outfilename=ser_outfilename, radio_preconfig=radio_preconfig)
+        station.run(ser_infilename=ser_infilename, ser_outfilename=ser_outfilename, radio_preconfig=radio_preconfig,
+                    ser_capture_dir=ser_capture_dir, threaded=threaded)
 
     runner = None
     if serial_baud is not None and serial_baud is not None:
         runner = runner_serial
-    elif ser_infilename is not None and ser_outfilename is not None:
+    elif (ser_infilename is not None or ser_capture_dir is not None) and ser_outfilename is not None:
         runner = runner_test
 
     if runner is not None:
@@ -122,8 +136,12 @@ def config_parser():
     parser.add_argument('--radio_preconfig', metavar="pre", type=bool, default=False, help="whether to pre-configure radio frequencies")
     parser.add_argument('--serial_port', metavar="port", type=str, default=config.SERIAL_PORT, help="radio's serial port")
     parser.add_argument('--serial_baud', metavar="baud", type=int, default=config.SERIAL_BAUD, help="radio's serial baud rate")
+    parser.add_argument('--threaded', metavar="th", type=bool, default=config.THREADED_RUNTIME,
+                        help="whether to run the station's stages on separate threads")
     parser.add_argument('--test', metavar="t", type=bool, default=config.USE_TEST_FILE, help="whether to use serial spoofing")
     parser.add_argument('--serial_infile', metavar="in", type=str, default=config.TEST_INFILE, help="file to spoof serial input from")
+    parser.add_argument('--serial_capture', metavar="dir", type=str, default=config.TEST_CAPTURE_DIR,
+                        help="RX capture directory to spoof serial input from (instead of serial_infile)")
     parser.add_argument('--serial_outfile', metavar="out", type=str, default=config.TEST_OUTFILE, help="file for redirecting serial output")
     return parser
 
@@ -142,7 +160,7 @@ def main():
 
     # start groundstation on new thread and command loop on this one
     success = start_station(station, args.radio_preconfig, args.serial_port, args.serial_baud,
-        args.serial_infile, args.serial_outfile)
+        args.serial_infile, args.serial_outfile, args.serial_capture, args.threaded)
     if not success:
         print("Invalid CLI args")
         parser.print_help()
@@ -4,6 +4,72 @@ import logging
 SERIAL_PORT = "/dev/ttyAMA0"
 SERIAL_BAUD = 38400
 SAT_CATALOG_NUMBER = 43552 # ISS: 25544 # NORAD (Space Command) number
+SAT_PRIORITY = 10 # EQUiSat's priority among the satellites we track
+
+# other satellites (sharing the band) to track when EQUiSat isn't overhead, as
+# {"norad_id": ..., "priority": ...} (higher priorities win), with TLEs downloaded to EXTRA_TLE_FILENAME
+EXTRA_SATELLITES = []
+EXTRA_TLE_FILENAME = "extra_tle.txt"
+EXTRA_TLE_ROUTE = "https://celestrak.com/NORAD/elements/cubesat.txt"
+# which of overlapping passes to track: "priority" (satellite priority, then elevation) or "elevation"
+PASS_OVERLAP_PRIORITY = "priority"
+TRACKING_PROCESSES = None # process pool size for computing passes (None for one per CPU)
+THREADED_RUNTIME = False # run the station's stages on separate threads (see runtime.py)
+
+# packet sync: bit errors to allow in packet callsigns
+# (packets found with corrupted callsigns are only accepted if they can be error corrected)
+CALLSIGN_MAX_BIT_ERRORS = 4
+
+# repeats of a packet (by corrected contents) within this window aren't published again
+PACKET_DEDUP_WINDOW_S = 10*60
+PACKET_DEDUP_CAPACITY = 1024
+
+# packet publishing: records queued per destination (API, email, file) before dropping them,
+# and a local file to also log published packets to (JSON lines; None to disable)
+PUBLISH_QUEUE_SIZE = 256
+PACKET_LOG_FILENAME = None
+# API route override (e.g. a local test server; see mock_api.py), None for the default
+PACKET_PUB_ROUTE = None
+# packets are kept in this on-disk spool (SQLite) until the API accepts them; None to POST directly
+PUBLISH_SPOOL_FILENAME = "publish_spool.db"
+# route accepting a JSON list of packets, to upload up to PUBLISH_SPOOL_BATCH_SIZE at a time
+# (None to upload them one per request)
+PACKET_PUB_BATCH_ROUTE = None
+PUBLISH_SPOOL_BATCH_SIZE = 20
+# failed uploads (with a response from the API) after which a packet is given up on
+PUBLISH_SPOOL_MAX_ATTEMPTS = 50
+# email one digest of packets per pass, and per window (None for only per pass),
+# rather than an email per packet; only the first few packets' full info is included
+PACKET_EMAIL_DIGEST = True
+PACKET_EMAIL_DIGEST_WINDOW_S = 30*60
+PACKET_EMAIL_DIGEST_MAX_DUMPS = 5
+
+# RX data dump (written in the background); at most about the batch interval plus the
+# fsync interval of data is lost on a crash (fsync every batch if 0, leave it to the OS if None)
+# (the data goes to the capture below; set RX_DUMP_HEX to also write it in hex to rx_data.log, as we used to)
+RX_DUMP_HEX = False
+RX_DUMP_BATCH_SIZE = 4096 # bytes
+RX_DUMP_BATCH_INTERVAL_S = 2
+RX_DUMP_FSYNC_INTERVAL_S = 10
+RX_DUMP_ROTATE_SIZE = 16*1024*1024 # bytes
+RX_DUMP_ROTATE_INTERVAL_S = 24*60*60
+RX_DUMP_COMPRESS = True # gzip rotated segments
+# binary, timestamped RX capture (see capture_store.py; log_packet_extractor.py reads it); None to disable
+RX_CAPTURE_DIR = "rx_capture"
+RX_CAPTURE_SEGMENT_SIZE = 64*1024*1024 # bytes
+RX_CAPTURE_SEGMENT_INTERVAL_S = 60*60
+
+# upcoming passes and their doppler corrections are precomputed this far ahead and saved
+# (recomputed when the TLEs change), and topped up in the background at this interval
+PASS_SCHEDULE_FILENAME = "pass_schedule.json"
+PASS_SCHEDULE_DAYS = 3
+PASS_SCHEDULE_REFRESH_S = 60*60
+
+# TLE files are refreshed (by conditional request) in the background at this interval,
+# backing off between these bounds when the server fails
+TLE_REFRESH_INTERVAL_S = 60*60
+TLE_REFRESH_MIN_BACKOFF_S = 30
+TLE_REFRESH_MAX_BACKOFF_S = 60*60
 
 UPLINK_COMMANDS_FILE = "uplink_commands.csv"
 
@@ -31,4 +97,5 @@ PUBLISH_PACKETS =           True
 UNHEXLIFY_TEST_FILE = 		False
 
 TEST_INFILE = "../Test Dumps/test_packet_logfile.txt"
+TEST_CAPTURE_DIR = None # if set, replay this RX capture instead of TEST_INFILE
 TEST_OUTFILE = "groundstation_serial_out.txt"
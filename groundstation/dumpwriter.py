@@ -0,0 +1,169 @@
+#!/usr/bin/python
+# Background writer for the RX data dump, so the main loop never waits on the disk
+import os
+import time
+import gzip
+import shutil
+import logging
+import threading
+import datetime
+from Queue import Queue, Empty, Full
+from binascii import hexlify
+
+class RxDumpWriter(threading.Thread):
+    """ Writes RX data (in hex) to a dump file (unless filename is None) on its own thread, and/or to a binary
+    capture store (see capture_store.CaptureWriter) if given one. Data is handed over through a bounded queue
+    without ever blocking (if the queue is full the data is dropped and counted), and written in batches:
+    whenever batch_size bytes are waiting or batch_interval_s has passed since the last write.
+    Written data is fsync'ed at most every fsync_interval_s (every batch if 0, or left to the OS if None),
+    so at most about batch_interval_s + fsync_interval_s of data is lost on a crash.
+    The file is rotated once it reaches rotate_size bytes or has been open for rotate_interval_s,
+    with closed segments renamed with their start time and optionally gzipped. """
+    def __init__(self, filename, queue_size=1024, batch_size=4096, batch_interval_s=2.0, fsync_interval_s=10.0,
+                 rotate_size=16*1024*1024, rotate_interval_s=24*60*60, compress=True, capture=None):
+        threading.Thread.__init__(self, name="rx-dump-writer")
+        self.daemon = True
+        self.filename = filename
+        self.queue = Queue(maxsize=queue_size)
+        self.batch_size = batch_size
+        self.batch_interval_s = batch_interval_s
+        self.fsync_interval_s = fsync_interval_s
+        self.rotate_size = rotate_size
+        self.rotate_interval_s = rotate_interval_s
+        self.compress = compress
+        self.capture = capture
+
+        self.file = None
+        self.file_size = 0
+        self.file_opened = None
+        self.last_fsync = time.time()
+
+        # stats
+        self.bytes_written = 0
+        self.batches = 0
+        self.fsyncs = 0
+        self.rotations = 0
+        self.dropped_bytes = 0
+        self.dropped_chunks = 0
+
+    def write(self, data, timestamp=None):
+        """ Queues the given raw data, received at timestamp (now if None), to be written.
+        Never blocks; returns whether the data was queued. """
+        if timestamp is None:
+            timestamp = time.time()
+        try:
+            self.queue.put_nowait((timestamp, data))
+            return True
+        except Full:
+            self.dropped_chunks += 1
+            self.dropped_bytes += len(data)
+            return False
+
+    def close(self, timeout=None):
+        """ Writes out all queued data and stops the thread """
+        if self.is_alive():
+            self.queue.put(None)
+            self.join(timeout)
+
+    def run(self):
+        self._open()
+        pending = []
+        pending_size = 0
+        next_write = time.time() + self.batch_interval_s
+        stopping = False
+        while not stopping:
+            try:
+                record = self.queue.get(timeout=max(0, next_write - time.time()))
+                if record is None:
+                    stopping = True
+                else:
+                    pending.append(record)
+                    pending_size += len(record[1])
+            except Empty:
+                pass
+
+            if stopping or pending_size >= self.batch_size or time.time() >= next_write:
+                if pending_size > 0:
+                    try:
+                        self._write_batch(pending)
+                    except (IOError, OSError) as e:
+                        logging.error("rx dump: error writing to %s: %s" % (self.filename, e))
+                    pending = []
+                    pending_size = 0
+                next_write = time.time() + self.batch_interval_s
+
+        if self.file is not None:
+            self._sync(force=True)
+            self.file.close()
+            self.file = None
+        if self.capture is not None:
+            self.capture.close()
+
+    def _open(self):
+        if self.filename is None:
+            return
+        self.file = open(self.filename, "a")
+        self.file_size = os.path.getsize(self.filename)
+        self.file_opened = time.time()
+
+    def _write_batch(self, records):
+        """ Writes the given list of (timestamp, data) records """
+        data = b"".join(record[1] for record in records)
+        if self.file is not None:
+            encoded = hexlify(data)
+            self.file.write(encoded)
+            self.file.flush()
+            self.file_size += len(encoded)
+        if self.capture is not None:
+            for timestamp, record_data in records:
+                self.capture.append(record_data, timestamp)
+            self.capture.flush()
+        self.bytes_written += len(data)
+        self.batches += 1
+        self._sync()
+
+        if self.file is not None and \
+                (self.file_size >= self.rotate_size or time.time() - self.file_opened >= self.rotate_interval_s):
+            self._rotate()
+
+    def _sync(self, force=False):
+        if self.fsync_interval_s is None and not force:
+            return
+        now = time.time()
+        if force or now - self.last_fsync >= self.fsync_interval_s:
+            if self.file is not None:
+                os.fsync(self.file.fileno())
+            if self.capture is not None:
+                self.capture.sync()
+            self.last_fsync = now
+            self.fsyncs += 1
+
+    def _rotate(self):
+        """ Closes the current file, moving it aside (named by when it was opened), and starts a new one """
+        self._sync(force=True)
+        self.file.close()
+        opened = datetime.datetime.utcfromtimestamp(self.file_opened).strftime("%Y%m%dT%H%M%S")
+        segment = "%s.%s" % (self.filename, opened)
+        suffix = 1
+        while os.path.exists(segment) or os.path.exists(segment + ".gz"):
+            segment = "%s.%s.%d" % (self.filename, opened, suffix)
+            suffix += 1
+        os.rename(self.filename, segment)
+        if self.compress:
+            with open(segment, "rb") as src, gzip.open(segment + ".gz", "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            os.remove(segment)
+        self.rotations += 1
+        logging.debug("rx dump: rotated %s to %s" % (self.filename, segment))
+        self._open()
+
+    def get_stats(self):
+        return {
+            "bytes_written": self.bytes_written,
+            "batches": self.batches,
+            "fsyncs": self.fsyncs,
+            "rotations": self.rotations,
+            "queued_chunks": self.queue.qsize(),
+            "dropped_chunks": self.dropped_chunks,
+            "dropped_bytes": self.dropped_bytes
+        }
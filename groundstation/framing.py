@@ -0,0 +1,120 @@
+#!/usr/bin/python
+# Incremental packet framing for the RX data stream
+from bisect import bisect_left
+from collections import namedtuple
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+
+# a full packet found in the stream, with the stream offset of its first character,
+# the arrival time of the data containing that first character,
+# and the number of bits in which its callsign differed from the expected one
+PacketEvent = namedtuple("PacketEvent", ["packet", "offset", "arrival_time", "callsign_errors"])
+
+# number of set bits in each byte value
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+def callsign_distances(buf, callsign):
+    """ Returns an array of the bit Hamming distances between the callsign and
+    the window of buf starting at each index (for every full window) """
+    data = np.frombuffer(buf, dtype=np.uint8)
+    num_windows = len(data) - len(callsign) + 1
+    if num_windows <= 0:
+        return np.zeros(0, dtype=np.int32)
+    # (num_windows, len(callsign)) view of all windows without copying the data
+    windows = as_strided(data, shape=(num_windows, len(callsign)), strides=(data.strides[0], data.strides[0]))
+    expected = np.frombuffer(callsign, dtype=np.uint8)
+    return _POPCOUNT[windows ^ expected].sum(axis=1, dtype=np.int32)
+
+class PacketFramer:
+    """ Finds fixed-length packets starting with a callsign in a stream of data, given to it in chunks.
+    Only newly added data is scanned: the framer holds on to at most a partial packet (or a partial callsign)
+    between chunks, so framing is O(new data) rather than rescanning a whole buffer. (With callsign errors
+    allowed, the near-callsign matches already found in the held data are carried over too, so only the
+    last len(callsign)-1 held bytes are scanned again.)
+    Like a regex findall, packets don't overlap; scanning continues after the end of each packet found.
+
+    If max_callsign_errors is set (only for raw byte streams), callsigns with up to that many bit errors
+    are also accepted, as long as the validate function (given the full packet) accepts the packet. """
+    def __init__(self, callsign, packet_len, max_callsign_errors=0, validate=None):
+        assert len(callsign) <= packet_len
+        self.callsign = callsign
+        self.packet_len = packet_len
+        self.max_callsign_errors = max_callsign_errors
+        self.validate = validate
+        self.reset()
+
+    def reset(self):
+        self.pending = self.callsign[:0] # unresolved data: a partial packet or partial callsign
+        self.pending_offset = 0 # stream offset of the start of pending
+        self.pending_matches = [] # (index, callsign errors) of the near-callsigns fully within pending
+        self.stream_offset = 0 # total data fed
+        self.chunk_times = [] # (stream offset, arrival time) of the chunks that make up pending
+        self.num_recovered = 0 # packets found with corrupted callsigns
+        self.num_rejected = 0 # near-callsign candidates that failed validation
+
+    def feed(self, data, arrival_time=None):
+        """ Adds the next chunk of the stream, returning a list of PacketEvents for all packets completed by it """
+        if len(data) == 0:
+            return []
+        self.chunk_times.append((self.stream_offset, arrival_time))
+        self.stream_offset += len(data)
+
+        buf = self.pending + data
+        base = self.pending_offset
+        events = []
+        if self.max_callsign_errors > 0:
+            # only scan the windows that weren't already fully within pending
+            scan_start = max(0, len(self.pending) - (len(self.callsign) - 1))
+            distances = callsign_distances(buf[scan_start:], self.callsign)
+            new_indexes = np.flatnonzero(distances <= self.max_callsign_errors)
+            match_indexes = [index for index, _ in self.pending_matches] + (new_indexes + scan_start).tolist()
+            match_errors = [errors for _, errors in self.pending_matches] + distances[new_indexes].tolist()
+
+        pos = 0 # end of the last packet found
+        search = 0 # where to look for the next callsign from
+        while True:
+            if self.max_callsign_errors > 0:
+                i = bisect_left(match_indexes, search)
+                index, errors = (match_indexes[i], match_errors[i]) if i < len(match_indexes) else (-1, None)
+            else:
+                index, errors = buf.find(self.callsign, search), 0
+
+            if index == -1:
+                # hold on to anything that could be the start of a callsign split across chunks
+                keep = max(pos, len(buf) - (len(self.callsign) - 1))
+                break
+            if index + self.packet_len > len(buf):
+                # partial packet; wait for more data
+                keep = index
+                break
+
+            packet = buf[index:index + self.packet_len]
+            if errors > 0:
+                if self.validate is not None and not self.validate(packet):
+                    self.num_rejected += 1
+                    search = index + 1
+                    continue
+                self.num_recovered += 1
+
+            events.append(PacketEvent(packet, base + index, self._arrival_time(base + index), errors))
+            pos = search = index + self.packet_len
+
+        self.pending = buf[keep:]
+        self.pending_offset = base + keep
+        if self.max_callsign_errors > 0:
+            last_window = len(buf) - len(self.callsign)
+            self.pending_matches = [(index - keep, errors) for index, errors in zip(match_indexes, match_errors)
+                                    if keep <= index <= last_window]
+        # forget times of chunks that have been passed, but keep the one containing the start of pending
+        while len(self.chunk_times) > 1 and self.chunk_times[1][0] <= self.pending_offset:
+            self.chunk_times.pop(0)
+        return events
+
+    def _arrival_time(self, offset):
+        """ Returns the arrival time of the chunk containing the given (pending) stream offset """
+        arrival_time = None
+        for chunk_offset, chunk_time in self.chunk_times:
+            if chunk_offset > offset:
+                break
+            arrival_time = chunk_time
+        return arrival_time
@@ -3,23 +3,37 @@
 # the XDL Micro over serial, performing error correcting, and
 # sending the data to BSE's server.
 import sys
-import re
+import copy
 import serial
 import time
+import select
 import logging
-from binascii import hexlify
-import requests
+import threading
+import hashlib
+from binascii import hexlify, unhexlify
 import yagmail
-from collections import OrderedDict
-import copy
+from collections import OrderedDict, deque
 
 import mock_serial
 from utils import *
-from reedsolomon import rscode
+from reedsolomon import rscode, rsnumpy
 from packetparse import packetparse
 import transmit
 import tracking
+import multi_tracker
+from tle_refresh import TleRefresher
 import radio_control
+import runtime
+from scheduler import Scheduler
+from pass_schedule import PassSchedule
+from pass_model import Pass, DopplerSchedule
+from cache import LRUCache, DedupIndex
+from framing import PacketFramer
+from ringbuffer import RingBuffer
+from dumpwriter import RxDumpWriter
+from capture_store import CaptureWriter
+from publisher import Publisher, HttpSink, EmailSink, DigestEmailSink, FileSink
+from spool import PacketSpool, SpoolSink, SpoolUploader
 
 import station_config as station
 import config
@@ -29,15 +43,18 @@ class EQUiStation:
     LOG_FORMAT = '%(levelname)s [%(asctime)s]: %(message)s'
     LOGFILE = "groundstation.log"
     RX_DUMP_FILENAME = "rx_data.log"
-    RX_DUMP_BUF_MAX_SIZE = 10 # small cause we might lose it!
 
     # RX config
     PACKET_PUB_ROUTE = "http://api.brownspace.org/equisat/receive"
+    PUBLISH_CLOSE_TIMEOUT_S = 30 # per sink worker, to send remaining packets on shutdown
     CALLSIGN_HEX = "574c39585a" # WL9XZE
-    PACKET_STR_LEN = 2*255 # two hex char per byte
-    MAX_BUF_SIZE = 4096
-    packet_regex = re.compile("(%s.{%d})" % (CALLSIGN_HEX, PACKET_STR_LEN-len(CALLSIGN_HEX)))
+    CALLSIGN = unhexlify(CALLSIGN_HEX)
+    HEADER_LEN = 6 # callsign bytes at the start of packets, which aren't covered by the error correction
+    PACKET_LEN = 255
+    PACKET_STR_LEN = 2*PACKET_LEN # two hex char per byte
+    MAX_BUF_SIZE = 2048 # bytes of recent RX data kept (for display)
     PERIODIC_PACKET_SCAN_FREQ_S = 2*60
+    DECODE_CACHE_SIZE = 256 # recent packets to remember decode results for (the satellite repeats packets)
 
     # doppler correction config
     ORBITAL_PERIOD_S = 93*60 if not config.GENERATE_FAKE_PASSES else 480
@@ -47,38 +64,67 @@ class EQUiStation:
     RADIO_EMERGENCY_DOPPLER_CORRECT_HZ = 0 # assume we'll get good data at closest approach
     DOPPLER_FAIL_RETRY_DELAY_S = 1.2*60 # time to delay before retrying doppler connect
     PACKET_SEND_FREQ_S = 20
+    DOPPLER_TIME_TOLERANCE_S = 0.05 # accuracy of planned doppler correction times
+    PASS_UPDATE_LEAD_S = 2*60 # how long before the next pass rises to update for it, at the latest
+
+    # main loop waiting config
+    MAX_WAIT_S = 60 # longest to go without waking up, even with nothing scheduled
+    MIN_WAIT_S = 0.1 # so we don't spin retrying failed doppler corrections, etc.
+    POLL_INTERVAL_S = 0.5 # for serial ports we can't wait on (i.e. mock ones), and when continually transmitting
+    DETECTION_LATENCIES_KEPT = 100
 
     # whether to adjust doppler correction times to avoid interference with transmissions
     INTERLACE_TIMES = False
 
+    # scheduled events (see scheduler.py); when due at the same time, lower priorities run first
+    PASS_EVENT = "pass"
+    PACKET_SCAN_EVENT = "packet-scan"
+    PASS_EVENT_PRIORITY = 0
+    PACKET_SCAN_EVENT_PRIORITY = 1
+
     def __init__(self):
         # globals for external api use, etc.
         self.last_data_rx = None
         self.last_packet_rx = None
-        self.rx_buf = ""
-        self.rx_dump_buf = ""
+        self.rx_buf = RingBuffer(self.MAX_BUF_SIZE) # raw bytes
         self.rx_since_pass_start = 0
+        self.packets_since_pass_start = 0
+        self.recovered_since_pass_start = 0 # packets only found thanks to tolerating callsign errors
         self.received_packets = []
+        self.framer = PacketFramer(self.CALLSIGN, self.PACKET_LEN, max_callsign_errors=config.CALLSIGN_MAX_BIT_ERRORS,
+                                   validate=EQUiStation.is_correctable_packet)
+        self.framed_packets = [] # PacketEvents found by the framer but not yet picked up by scan_for_packets
+        self.rx_lock = threading.RLock() # guards the RX buffers and packet lists, which the threaded runtime shares
         self.tx_cmd_queue = []
         self.only_send_tx_cmd = False
+        self.decode_cache = LRUCache(self.DECODE_CACHE_SIZE)
+        self.runtime = None # set if running the threaded runtime
+        self.dedup_index = DedupIndex(config.PACKET_DEDUP_WINDOW_S, config.PACKET_DEDUP_CAPACITY)
 
         # doppler shift/tracking
         self.station_lat = station.station_lat
         self.station_lon = station.station_lon
         self.station_alt = station.station_alt
-        self.doppler_corrections = []
+        self.doppler_corrections = DopplerSchedule()
         self.doppler_correction_index = 0 # current index in the set of doppler corrections
         self.update_pass_data_time = datetime.datetime.utcnow()
         self.next_packet_scan = datetime.datetime.utcnow()
         self.radio_cur_channel = 1 # default no correction channel
         self.ready_for_pass = True # we preconfig on first boot
+        self.scheduler = Scheduler()
+
+        # main loop metrics
+        self.wakeups = 0
+        self.idle_wakeups = 0 # woke up with no data (to run scheduled events or on a timeout)
+        self.last_wakeup = time.time()
+        self.detection_latencies = deque(maxlen=self.DETECTION_LATENCIES_KEPT)
 
         # RSSI tracking
         self.latest_rssi = None
         self.latest_packet_rssi = None
 
-        # just stored to be accessible to API, no actual use
-        self.next_pass_data = {}
+        # just stored to be accessible to API, no actual use (a Pass, once we have one)
+        self.next_pass_data = None
 
         self._check_configs()
 
@@ -86,7 +132,31 @@ class EQUiStation:
         self.ser = None
         self.transmitter = None # waiting on serial
         self.tracker = tracking.SatTracker(config.SAT_CATALOG_NUMBER)
-        self.rx_dump_file = open(self.RX_DUMP_FILENAME, "a")
+        # (the other satellites we track, if any, share EQUiSat's pass timeline)
+        # (created before any of our threads start, as it forks its process pool)
+        self.multi_tracker = multi_tracker.from_config(self.tracker, base_freq_hz=self.RADIO_BASE_FREQ_HZ)
+        self.tle_refresher = TleRefresher(self.multi_tracker.get_trackers(), interval_s=config.TLE_REFRESH_INTERVAL_S,
+                                          min_backoff_s=config.TLE_REFRESH_MIN_BACKOFF_S,
+                                          max_backoff_s=config.TLE_REFRESH_MAX_BACKOFF_S)
+        self.tle_refresher.start()
+        self.pass_schedule = PassSchedule(self.multi_tracker, config.PASS_SCHEDULE_FILENAME, days=config.PASS_SCHEDULE_DAYS,
+                                          plan_pass=self.plan_pass,
+                                          refresh_interval_s=config.PASS_SCHEDULE_REFRESH_S)
+        self.pass_schedule.start()
+        capture = None
+        if config.RX_CAPTURE_DIR is not None:
+            capture = CaptureWriter(config.RX_CAPTURE_DIR,
+                                    segment_size=config.RX_CAPTURE_SEGMENT_SIZE,
+                                    segment_interval_s=config.RX_CAPTURE_SEGMENT_INTERVAL_S)
+        self.rx_dump = RxDumpWriter(self.RX_DUMP_FILENAME if config.RX_DUMP_HEX else None,
+                                    batch_size=config.RX_DUMP_BATCH_SIZE,
+                                    batch_interval_s=config.RX_DUMP_BATCH_INTERVAL_S,
+                                    fsync_interval_s=config.RX_DUMP_FSYNC_INTERVAL_S,
+                                    rotate_size=config.RX_DUMP_ROTATE_SIZE,
+                                    rotate_interval_s=config.RX_DUMP_ROTATE_INTERVAL_S,
+                                    compress=config.RX_DUMP_COMPRESS,
+                                    capture=capture)
+        self.rx_dump.start()
 
         # setup email
         if hasattr(station, "station_gmail_user") and hasattr(station, "station_gmail_pass") \
@@ -95,6 +165,31 @@ class EQUiStation:
         else:
             self.yag = None
 
+        # publishing (in the background)
+        self.publisher = Publisher(queue_size=config.PUBLISH_QUEUE_SIZE)
+        pub_route = config.PACKET_PUB_ROUTE or self.PACKET_PUB_ROUTE
+        if config.PUBLISH_SPOOL_FILENAME is not None:
+            # spool packets on disk until the API has them
+            self.spool = PacketSpool(config.PUBLISH_SPOOL_FILENAME, max_attempts=config.PUBLISH_SPOOL_MAX_ATTEMPTS)
+            self.spool_uploader = SpoolUploader(self.spool, pub_route,
+                                                batch_route=config.PACKET_PUB_BATCH_ROUTE,
+                                                batch_size=config.PUBLISH_SPOOL_BATCH_SIZE)
+            self.spool_uploader.start()
+            self.publisher.add_sink(SpoolSink(self.spool, self.spool_uploader))
+        else:
+            self.spool = None
+            self.spool_uploader = None
+            self.publisher.add_sink(HttpSink(pub_route))
+        if self.yag is not None and config.PACKET_EMAIL_DIGEST:
+            self.publisher.add_sink(DigestEmailSink(self.yag, station.packet_email_recipients, station.station_name,
+                                                    window_s=config.PACKET_EMAIL_DIGEST_WINDOW_S,
+                                                    max_dumps=config.PACKET_EMAIL_DIGEST_MAX_DUMPS))
+        elif self.yag is not None:
+            self.publisher.add_sink(EmailSink(self.yag, station.packet_email_recipients, station.station_name))
+        if config.PACKET_LOG_FILENAME is not None:
+            self.publisher.add_sink(FileSink(config.PACKET_LOG_FILENAME))
+        self.publisher.start()
+
         # config logging
         logging.basicConfig(
             filename=self.LOGFILE,
@@ -109,8 +204,8 @@ class EQUiStation:
         logging.getLogger().addHandler(self.console)
 
     def __del__(self):
-        if hasattr(self, "rx_dump_file"):
-            self.rx_dump_file.close()
+        if hasattr(self, "rx_dump"):
+            self.rx_dump.close()
 
     @staticmethod
     def _check_configs():
@@ -126,20 +221,38 @@ class EQUiStation:
     # Groundstation state machine
     ##################################################################
     def run(self, serial_port=None, serial_baud=38400, radio_preconfig=False,
-            ser_infilename=None, ser_outfilename=None, file_read_size=PACKET_STR_LEN/4):
+            ser_infilename=None, ser_outfilename=None, file_read_size=PACKET_STR_LEN/4, ser_capture_dir=None,
+            threaded=False):
+        """ Runs the station on the given serial port, or if an input file (or RX capture directory)
+        and output file are given, on a mock serial port reading from/writing to those.
+        Uses the threaded runtime (see runtime.py) if threaded is set, or the single-threaded mainloop otherwise. """
+        loop = self.mainloop
+        if threaded:
+            loop = lambda radio_preconfig: runtime.StationRuntime(self).run(radio_preconfig=radio_preconfig)
         try:
-            if ser_infilename is not None and ser_outfilename is not None:
+            if (ser_infilename is not None or ser_capture_dir is not None) and ser_outfilename is not None:
                 with mock_serial.MockSerial(infile_name=ser_infilename, outfile_name=ser_outfilename,
+                                            capture_dir=ser_capture_dir,
                                             max_inwaiting=file_read_size, unhex=config.UNHEXLIFY_TEST_FILE) as ser:
                     self.ser = ser
                     self.setup_mock_serial(ser)
-                    self.mainloop(radio_preconfig=radio_preconfig)
+                    loop(radio_preconfig=radio_preconfig)
             else:
                 with serial.Serial(serial_port, serial_baud, timeout=None) as ser:
                     self.ser = ser
-                    self.mainloop(radio_preconfig=radio_preconfig)
+                    loop(radio_preconfig=radio_preconfig)
         except KeyboardInterrupt:
             return
+        finally:
+            # make sure all received data makes it to disk, and packets get sent
+            self.rx_dump.close()
+            self.publisher.close(timeout=self.PUBLISH_CLOSE_TIMEOUT_S)
+            self.pass_schedule.stop()
+            self.tle_refresher.stop(timeout=self.PUBLISH_CLOSE_TIMEOUT_S)
+            self.multi_tracker.close()
+            if self.spool_uploader is not None:
+                # (anything not yet uploaded stays in the spool for next time)
+                self.spool_uploader.stop(timeout=self.PUBLISH_CLOSE_TIMEOUT_S)
 
     def setup_mock_serial(self, ser):
         """ Register handlers for the main radio serial commands so they succeed """
@@ -173,10 +286,17 @@ class EQUiStation:
         # get radio ready for a pass
         self.update_radio_for_pass()
 
+        # start the scheduled events
+        self.schedule_pass_event()
+        self.schedule_packet_scan()
+
     def mainloop(self, radio_preconfig=False):
         self.pre_init(radio_preconfig)
         while True:
             try:
+                # sleep until we get data or have something scheduled to do
+                self.wait_for_data()
+
                 # try and receive data (a packet),
                 got_packet = self.receive()
 
@@ -184,23 +304,52 @@ class EQUiStation:
                 if got_packet or self.only_send_tx_cmd:
                     self.transmit()
 
-                # and then try to adjust the frequency for doppler effects
-                self.correct_for_doppler()
-
-                # periodically perform random scans for packets in case we missed something
-                if self.next_packet_scan <= datetime.datetime.utcnow():
-                    self.scan_for_packets()
-                    self.next_packet_scan = datetime.datetime.utcnow() + \
-                                            datetime.timedelta(seconds=self.PERIODIC_PACKET_SCAN_FREQ_S)
+                # and then run anything scheduled (adjusting the frequency for doppler effects, etc.)
+                self.scheduler.run_due()
 
                 # publish any packets we got (after trying uplink commands, etc.)
                 self.publish_received_packets()
 
-                time.sleep(0.5)
-
             except KeyboardInterrupt:
                 break
 
+    def time_to_next_event(self):
+        """ Returns the number of seconds until the next scheduled event
+        (a doppler correction, pass update, or packet scan) is due, at most MAX_WAIT_S """
+        if self.only_send_tx_cmd:
+            return self.POLL_INTERVAL_S
+
+        wait = self.scheduler.time_until_next()
+        if wait is None:
+            return self.MAX_WAIT_S
+        return min(max(wait, 0), self.MAX_WAIT_S)
+
+    def wait_for_data(self, timeout=None):
+        """ Blocks until there is serial data to read or the next scheduled event is due
+        (or the given timeout passes). Returns whether there is data. """
+        if timeout is None:
+            timeout = self.time_to_next_event()
+        try:
+            fd = self.ser.fileno()
+        except (AttributeError, ValueError, IOError):
+            fd = None
+
+        if fd is None:
+            # can't wait on the port (i.e. a mock one), so fall back to polling it
+            time.sleep(min(timeout, self.POLL_INTERVAL_S))
+            has_data = self.ser.in_waiting > 0
+        else:
+            has_data = self.ser.in_waiting > 0
+            if not has_data and timeout > 0:
+                readable, _, _ = select.select([fd], [], [], timeout)
+                has_data = len(readable) > 0
+
+        self.last_wakeup = time.time()
+        self.wakeups += 1
+        if not has_data:
+            self.idle_wakeups += 1
+        return has_data
+
     ##################################################################
     # Groundstation states
     ##################################################################
@@ -211,16 +360,28 @@ class EQUiStation:
         inwaiting = self.ser.in_waiting
         if inwaiting > 0:
             in_data = self.ser.read(size=inwaiting)
-            self.update_rx_buf(hexlify(in_data))
-            self.last_data_rx = datetime.datetime.utcnow()
-            self.rx_since_pass_start += len(in_data)
-
-            # look for (and extract/send) any packets in the buffer, trimming
-            # the buffer after finding any. (Only finds full packets)
-            # We do this here because all of the above may capture packets
-            return self.scan_for_packets()
+            return self.handle_rx_data(in_data, self.last_wakeup)
         return False
 
+    def handle_rx_data(self, in_data, wakeup_time):
+        """ Processes data read off the serial line after waking up at wakeup_time.
+        Returns whether a packet was received. """
+        self.update_rx_buf(in_data)
+        self.last_data_rx = datetime.datetime.utcnow()
+        self.rx_since_pass_start += len(in_data)
+
+        # look for (and extract/send) any packets in the buffer, trimming
+        # the buffer after finding any. (Only finds full packets)
+        # We do this here because all of the above may capture packets
+        got_packet = self.scan_for_packets()
+        if got_packet:
+            # (bound on) how long the packet's data has been waiting for us: the time since we woke up,
+            # plus how long it takes the data we read to come in over the serial line
+            baud = getattr(self.ser, "baudrate", None)
+            backlog_s = 10.0*len(in_data)/baud if baud else 0 # 10 bits per byte with start/stop bits
+            self.detection_latencies.append(time.time() - wakeup_time + backlog_s)
+        return got_packet
+
     def transmit(self):
         """ Checks if there are any uplink commands on the queue and transmits
             them/waits for response if so.
@@ -231,7 +392,7 @@ class EQUiStation:
             logging.info("SENDING UPLINK COMMAND: %s" % command)
 
             got_response, rx = self.transmitter.send(command["cmd"])
-            self.update_rx_buf(hexlify(rx))
+            self.update_rx_buf(rx)
             self.rx_since_pass_start += len(rx)
 
             logging.info("uplink command success: %s" % got_response)
@@ -248,12 +409,50 @@ class EQUiStation:
         else:
             return False, False
 
+    def schedule_pass_event(self, retry=False):
+        """ (Re)schedules correct_for_doppler for when it next has something to do: update the pass data
+        when between passes, or make the next doppler correction (or finish the pass) during one.
+        If retry is set, it isn't scheduled any sooner than MIN_WAIT_S from now (so failures aren't retried in a spin). """
+        # shift the next doppler correction away from the satellite's transmissions
+        if self.INTERLACE_TIMES and self.ready_for_pass:
+            self.interlace_doppler_and_tx_times()
+
+        now = datetime.datetime.utcnow()
+        if not self.ready_for_pass:
+            deadline = self.update_pass_data_time
+        elif self.doppler_correction_index < len(self.doppler_corrections):
+            deadline = self.doppler_corrections.times[self.doppler_correction_index]
+        else:
+            deadline = now # pass needs to be finished
+        if retry:
+            deadline = max(deadline, now + datetime.timedelta(seconds=self.MIN_WAIT_S))
+        self.scheduler.schedule(deadline, self._run_pass_event, self.PASS_EVENT, self.PASS_EVENT_PRIORITY)
+
+    def _run_pass_event(self):
+        done = False
+        try:
+            done = self.correct_for_doppler()
+        finally:
+            self.schedule_pass_event(retry=not done)
+
+    def schedule_packet_scan(self):
+        """ Schedules the next periodic scan for packets (in case we missed something) """
+        self.next_packet_scan = datetime.datetime.utcnow() + datetime.timedelta(seconds=self.PERIODIC_PACKET_SCAN_FREQ_S)
+        self.scheduler.schedule(self.next_packet_scan, self._run_packet_scan,
+                                self.PACKET_SCAN_EVENT, self.PACKET_SCAN_EVENT_PRIORITY)
+
+    def _run_packet_scan(self):
+        try:
+            if self.scan_for_packets() and self.runtime is not None:
+                self.runtime.packet_received.set()
+        finally:
+            self.schedule_packet_scan()
+
     def correct_for_doppler(self):
         """ Shifts the receive and transmit frequency of the XDL micro to compensate
             for doppler shift based on the current estimated position of the satellite.
             Returns whether the correction was made. """
 
-        # on every iteration as we're coming onto a pass,
         # check if the doppler_correct_time will land close
         # to our expected next RX, and correct it if necessary
         if self.INTERLACE_TIMES and self.ready_for_pass:
@@ -268,6 +467,8 @@ class EQUiStation:
             if good:
                 self.ready_for_pass = True
                 self.rx_since_pass_start = 0 # reset count now
+                self.packets_since_pass_start = 0
+                self.recovered_since_pass_start = 0
                 # (NOTE: doppler_correct_time updated in above function)
                 # schedule the next update (tentatively) for an orbital period away
                 self.update_pass_data_time = datetime.datetime.utcnow() + \
@@ -285,6 +486,10 @@ class EQUiStation:
             def move_on_to_next_pass():
                 # indicate we need to set up for next pass at some point
                 self.ready_for_pass = False
+                logging.info("PASS FINISHED: %d packets received, %d recovered from corrupted callsigns" %
+                             (self.packets_since_pass_start, self.recovered_since_pass_start))
+                # send out the pass's email digest, etc.
+                self.publisher.flush()
                 # (NOTE: leave doppler_corrections as they were, just for historical purposes)
 
                 # update pass time to be halfway around the orbit from this pass. Ideally
@@ -292,9 +497,20 @@ class EQUiStation:
                 # we have bad pass data that results in the update time being in the past
                 # (leading to an update loop), just set it to half an orbit from now
                 half_orbit_delta = datetime.timedelta(seconds=EQUiStation.ORBITAL_PERIOD_S / 2)
-                next_update_time = self.next_pass_data["max_alt_time"] + half_orbit_delta
-                if not dtime_after(next_update_time): # not after now
+                next_update_time = self.next_pass_data.max_alt_time + half_orbit_delta \
+                    if self.next_pass_data is not None else None
+                if next_update_time is None or not dtime_after(next_update_time): # not after now
                     next_update_time = datetime.datetime.utcnow() + half_orbit_delta
+
+                # but other satellites' passes may come sooner, so update in time for the next pass in the timeline
+                # (though not before this pass sets, or we'd get this pass again)
+                this_set_time = self.next_pass_data.set_time if self.next_pass_data is not None else None
+                next_pass, _ = self.pass_schedule.get_next_pass(after=this_set_time)
+                if next_pass is not None:
+                    lead_update_time = next_pass.rise_time - datetime.timedelta(seconds=EQUiStation.PASS_UPDATE_LEAD_S)
+                    if this_set_time is not None:
+                        lead_update_time = max(lead_update_time, this_set_time)
+                    next_update_time = min(next_update_time, lead_update_time)
                 self.update_pass_data_time = next_update_time
 
             # if the list is empty, something has gone wrong with getting pass data, and
@@ -311,9 +527,13 @@ class EQUiStation:
                 move_on_to_next_pass()
                 return False
 
-            # check if it's time
-            if now >= self.doppler_corrections[self.doppler_correction_index]["time"]:
-                freq = self.doppler_corrections[self.doppler_correction_index]["freq"]
+            # check if it's time (skipping straight to the latest correction due, if we've fallen behind)
+            active_index = self.doppler_corrections.active_index(now, self.doppler_correction_index)
+            if active_index >= self.doppler_correction_index:
+                if active_index > self.doppler_correction_index:
+                    logging.warning("skipping %d overdue doppler corrections" % (active_index - self.doppler_correction_index))
+                    self.doppler_correction_index = active_index
+                freq = self.doppler_corrections.freqs[active_index]
                 good = self.radio_activate_pass_freq(freq)
                 # keep trying to perform this correction on failure, but otherwise set target to next one
                 if good:
@@ -332,7 +552,7 @@ class EQUiStation:
         epoch = self.last_packet_rx # use this to avoid a string of recent noise pushing forward our doppler shift
         if epoch is None or self.doppler_correction_index >= len(self.doppler_corrections):
             return # nothing can be done
-        next_doppler_correct_time = self.doppler_corrections[self.doppler_correction_index]["time"]
+        next_doppler_correct_time = self.doppler_corrections.times[self.doppler_correction_index]
 
         delta_to_doppler = (next_doppler_correct_time - epoch).total_seconds()
         remainder = delta_to_doppler % self.PACKET_SEND_FREQ_S
@@ -353,8 +573,8 @@ class EQUiStation:
         correction = self.PACKET_SEND_FREQ_S / 2 - remainder
         if correction != 0:
             # actually adjust time
-            self.doppler_corrections[self.doppler_correction_index]["time"] = next_doppler_correct_time + \
-                                                                              datetime.timedelta(seconds=correction)
+            self.doppler_corrections = self.doppler_corrections.with_time(
+                self.doppler_correction_index, next_doppler_correct_time + datetime.timedelta(seconds=correction))
             logging.debug("shifted doppler correct based on packet info, by %.2fs" % correction)
             logging.debug("upcoming corrections:\n%s" % self.get_doppler_corrections_str(self.doppler_correction_index))
 
@@ -362,88 +582,118 @@ class EQUiStation:
     # Receive/Decode Helpers
     ##################################################################
     def update_rx_buf(self, new):
-        self.rx_buf += new
-        self.rx_dump_buf += new
+        """ Adds newly received raw bytes to the RX buffer and dump, framing any packets in them """
+        new = bytes(new)
+        with self.rx_lock:
+            # frame packets as data comes in, so only new data is ever scanned
+            self.framed_packets += self.framer.feed(new, datetime.datetime.utcnow())
 
-        # if dump buf gets big enough, write it to a file
-        # note we need to clear buf to make sure it doesn't get written twice
-        if len(self.rx_dump_buf) > self.RX_DUMP_BUF_MAX_SIZE:
-            self.rx_dump_file.write(self.rx_dump_buf)
-            self.rx_dump_file.flush()
-            self.rx_dump_buf = ""
+            # the buffer itself is only kept for display, so it just holds the latest data
+            self.rx_buf.write(new)
+            # written out (in hex, and to the capture store) in the background
+            self.rx_dump.write(new)
 
     def scan_for_packets(self):
-        """ Scans for packets in the RX buffer, as well as performs maintenance on the buffer.
+        """ Collects any packets the framer has found in RX data since the last scan.
         Should be run at some point whenever the buffer is updated. """
-        logging.debug("reading buffer of size %d for packets" % len(self.rx_buf))
-
-        # look for any packets in the buffer (Only finds full packets)
-        packets, indexes = EQUiStation.extract_packets(self.rx_buf)
-
-        # if we got a packet, update the last packet rx time to when we got data
-        if len(packets) > 0:
-            logging.info("found %d packets in buffer" % len(packets))
-            self.last_packet_rx = self.last_data_rx
-            self.received_packets += packets
-
-            # if we got packets,
-            # make sure to trim the buffer to the end of the last received packet,
-            # so we don't read them again
-            lastindex = indexes[len(indexes) - 1]
-            self.rx_buf = self.rx_buf[lastindex+self.PACKET_STR_LEN:]
-
-        # regardless of whether we got a packet, if the buffer exceeds a max size trim it as well,
-        # making sure to leave at least a packet's worth of characters in case one is currently coming in
-        self.rx_buf, _ = EQUiStation.trim_buffer(self.rx_buf, self.MAX_BUF_SIZE, self.PACKET_STR_LEN)
-        return len(packets) > 0
+        with self.rx_lock:
+            events = self.framed_packets
+            self.framed_packets = []
+            self.received_packets += [event.packet for event in events]
+
+        # if we got a packet, update the last packet rx time to when we got its data
+        if len(events) > 0:
+            logging.info("found %d packets in buffer" % len(events))
+            self.last_packet_rx = events[-1].arrival_time
+            self.packets_since_pass_start += len(events)
+            for event in events:
+                if event.callsign_errors > 0:
+                    logging.info("recovered packet with %d callsign bit errors" % event.callsign_errors)
+                    self.recovered_since_pass_start += 1
+            # (re-)center the next doppler correction between transmissions based on this packet
+            if self.INTERLACE_TIMES and self.ready_for_pass:
+                self.schedule_pass_event()
+        return len(events) > 0
 
     def publish_received_packets(self):
-        """ Publishes all packets received that haven't been sent """
-        # error correct and send packets to API
-        for raw in self.received_packets:
+        """ Publishes all packets received that haven't been sent (or recently published) """
+        for record in self.decode_received_packets():
+            self.publish_packet(**record)
+
+    def decode_received_packets(self):
+        """ Error corrects and parses all packets received since the last call, returning a list of
+        the arguments to publish_packet for each that hasn't been recently published """
+        with self.rx_lock:
+            packets = self.received_packets
+            self.received_packets = []
+
+        records = []
+        for packet in packets:
             logging.info("GOT PACKET: correcting & sending...")
-            corrected, error = EQUiStation.correct_packet_errors(raw)
+            corrected, error, parsed, rs_stats = self.decode_packet(packet)
             errors_corrected = error is None
 
-            # parse if was corrected
-            parsed = {}
-            if errors_corrected:
-                try:
-                    parsed, err = packetparse.parse_packet(corrected)
-                    if err is not None:
-                        logging.error("error parsing packet: %s" % err)
-                except ValueError or KeyError as e:
-                    logging.error("exception parsing packet: %s", e)
+            # the satellite repeats packets, so skip any we've just published
+            # (by corrected contents if possible, because each copy may have different errors)
+            duplicate = self.dedup_index.check(hashlib.sha1(corrected if errors_corrected else packet).digest())
+            if duplicate is not None:
+                duplicate["latest_packet_rssi"] = self.latest_packet_rssi
+                logging.info("packet is a repeat (received %d times since %s), not publishing" %
+                             (duplicate["count"], date_to_str(datetime.datetime.utcfromtimestamp(duplicate["first_seen"]))))
+                continue
 
             # post packet to API (no matter what)
-            self.publish_packet(raw, corrected, parsed, errors_corrected, error=error)
+            records.append({
+                "raw": hexlify(packet),
+                "corrected": corrected,
+                "parsed": parsed,
+                "errors_corrected": errors_corrected,
+                "error": error,
+                "rs_stats": rs_stats
+            })
+        return records
+
+    def decode_packet(self, packet):
+        """ Error corrects and parses the given packet (raw bytes), returning the corrected packet (in hex),
+        any correction error, the parsed packet (empty if it couldn't be corrected),
+        and the correction statistics (see correct_packet_errors).
+        Results for recently seen packets are cached, so exact repeats aren't decoded or parsed again
+        (each caller gets its own copy of the parsed packet and statistics, so it can modify them). """
+        key = hashlib.sha1(packet).digest()
+        cached = self.decode_cache.get(key)
+        if cached is not None:
+            logging.debug("packet decode cache hit")
+            return copy.deepcopy(cached)
+
+        corrected, error, rs_stats = EQUiStation.correct_raw_packet_errors(packet)
+        corrected = hexlify(corrected)
+
+        # parse if was corrected
+        parsed = {}
+        if error is None:
+            try:
+                parsed, err = packetparse.parse_packet(corrected)
+                if err is not None:
+                    logging.error("error parsing packet: %s" % err)
+            except ValueError or KeyError as e:
+                logging.error("exception parsing packet: %s", e)
 
-        # reset packet list
-        self.received_packets = []
+        result = (corrected, error, parsed, rs_stats)
+        self.decode_cache.put(key, result)
+        return copy.deepcopy(result)
 
-    def publish_packet(self, raw, corrected, parsed, errors_corrected, error=None, route=PACKET_PUB_ROUTE):
-        """ Sends a POST request to the given API route to publish the packet. """
+    def publish_packet(self, raw, corrected, parsed, errors_corrected, error=None, rs_stats=None, route=None):
+        """ Queues the packet to be published by the publisher's sinks (POSTed to the given API route
+        (or the default one if None), emailed, etc.).
+        rs_stats are the error correction statistics from correct_packet_errors, if known. """
 
         packet_info_msg = "\nraw:\n%s\n\n corrected (len: %d, actually corrected: %r, error: %s):\n%s\n\nparsed:\n%s\n\n" % \
                           (raw, len(corrected), errors_corrected, error, corrected, parsed)
         logging.info("publishing packet: %s" % packet_info_msg)
 
-        # convert pass data and doppler correction dates to strings
-        pass_data_strs = None
-        doppler_corrections_strs = None
-        try:
-            if self.next_pass_data is not None:
-                pass_data_strs = copy.deepcopy(self.next_pass_data)
-                pass_data_strs["rise_time"] = pass_data_strs["rise_time"].isoformat()
-                pass_data_strs["max_alt_time"] = pass_data_strs["max_alt_time"].isoformat()
-                pass_data_strs["set_time"] = pass_data_strs["set_time"].isoformat()
-
-            if self.doppler_corrections is not None:
-                doppler_corrections_strs = copy.deepcopy(self.doppler_corrections)
-                for correct in doppler_corrections_strs:
-                    correct["time"] = correct["time"].isoformat()
-        except AttributeError:
-            pass
+        # pass data and doppler corrections with dates as strings (built once per pass, and shared by every packet)
+        pass_data_strs = self.next_pass_data.serialize() if self.next_pass_data is not None else None
+        doppler_corrections_strs = self.doppler_corrections.serialize()
 
         jsn = {
             "raw": raw,
@@ -455,10 +705,11 @@ class EQUiStation:
             "latitude": station.station_lat,
             "longitude": station.station_lon,
             "errors_corrected": errors_corrected,
+            "error_correction_stats": rs_stats,
             "pass_data": pass_data_strs,
             "doppler_corrections": doppler_corrections_strs,
             "doppler_correction":
-                self.doppler_corrections[self.doppler_correction_index]["freq"] \
+                self.doppler_corrections.freqs[self.doppler_correction_index] \
                     if self.doppler_correction_index < len(self.doppler_corrections) \
                     else None,
             "latest_rssi": self.latest_rssi,
@@ -467,42 +718,67 @@ class EQUiStation:
         }
 
         if config.PUBLISH_PACKETS:
-            # publish packet to API
-            try:
-                r = requests.post(route, json=jsn)
-                if r.status_code != requests.codes.ok:
-                    logging.warning("couldn't publish packet (%d): %s" % (r.status_code, r.text))
-            except Exception as ex:
-                logging.error("Error publishing packet: %s" % ex)
-
-            # also send out email
-            if self.yag is not None:
-                try:
-                    logging.debug("sending email message with packet")
-                    contents = "Information on packet: \n%s" % packet_info_msg
-                    self.yag.send(to=station.packet_email_recipients,
-                                  subject="EQUiSat Station '%s' Received a Packet!" % station.station_name,
-                                  contents=contents)
-                except Exception as ex:
-                    logging.error("Error sending email: %s" % ex)
+            # publish packet to API, email, etc. (in the background)
+            self.publisher.publish({
+                "json": jsn,
+                "info": packet_info_msg,
+                "route": route
+            })
 
     @staticmethod
     def extract_packets(buf):
         """ Attempts to find and extract full packets from the given buffer based on callsign matching.
             Also returns a parallel list of starting indexes of the packets in the buffer. """
-        packets = EQUiStation.packet_regex.findall(buf)
-        indexes = [buf.index(packet) for packet in packets]
-        return packets, indexes
+        events = PacketFramer(EQUiStation.CALLSIGN_HEX, EQUiStation.PACKET_STR_LEN).feed(buf)
+        return [event.packet for event in events], [event.offset for event in events]
 
     @staticmethod
     def correct_packet_errors(raw):
         """ Corrects the packet's error using Reed Solomon error correction
-        and the packet's parity bytes. Makes sure to avoid correcting the callsign. """
+        and the packet's parity bytes. Makes sure to avoid correcting the callsign.
+        Returns the corrected packet, any error, and the correction statistics
+        (whether the packet was received clean, and the number and byte positions in the packet of
+        corrected symbols; see rscode.correction_stats), which are None if the packet couldn't be corrected
+        or they aren't known. """
         assert len(raw) == EQUiStation.PACKET_STR_LEN
-        callsign = raw[:12]
-        raw_no_callsign = raw[12:] # callsign is 6 chars
-        corrected, error = rscode.decode(raw_no_callsign)
-        return callsign + corrected, error
+        try:
+            packet = unhexlify(raw)
+        except (TypeError, ValueError):
+            return raw[:2*EQUiStation.HEADER_LEN], rscode.ERROR.INVALID_HEX, None
+
+        corrected, error, stats = EQUiStation.correct_raw_packet_errors(packet)
+        return hexlify(corrected), error, stats
+
+    @staticmethod
+    def correct_raw_packet_errors(packet):
+        """ Same as correct_packet_errors, but takes and returns raw bytes rather than hex.
+        The callsign is restored in the corrected packet, in case it was received with errors. """
+        assert len(packet) == EQUiStation.PACKET_LEN
+        packet = memoryview(packet)
+        header = EQUiStation.CALLSIGN + packet[len(EQUiStation.CALLSIGN):EQUiStation.HEADER_LEN].tobytes()
+        corrected, error, stats = rscode.decode_with_stats(packet[EQUiStation.HEADER_LEN:])
+        if stats is not None:
+            # report positions relative to the whole packet
+            stats["error_positions"] = [pos + EQUiStation.HEADER_LEN for pos in stats["error_positions"]]
+        return header + corrected, error, stats
+
+    @staticmethod
+    def is_correctable_packet(packet):
+        """ Returns whether the given raw packet can be error corrected (i.e. is likely a real packet).
+        The decoders only succeed if the corrected packet passes the syndrome check, so noise that happens
+        to follow a near-callsign isn't accepted on a miscorrection. """
+        _, error = rscode.decode_bytes(memoryview(packet)[EQUiStation.HEADER_LEN:])
+        return error is None
+
+    @staticmethod
+    def correct_packets_errors(raws):
+        """ Same as correct_packet_errors, but corrects a whole list of packets in one batch.
+        Returns parallel lists of corrected packets and errors. """
+        for raw in raws:
+            assert len(raw) == EQUiStation.PACKET_STR_LEN
+        header_len = 2*EQUiStation.HEADER_LEN
+        corrected, errors = rsnumpy.decode_hex_batch([raw[header_len:] for raw in raws])
+        return [raws[i][:header_len] + corrected[i] for i in range(len(raws))], errors
 
     @staticmethod
     def trim_buffer(buf, max_size, min_to_leave):
@@ -546,7 +822,7 @@ class EQUiStation:
         rssi_packet_okay, rx4, packet_rssi = radio_control.getPacketRSSICurrent(self.ser, retries=0)
         exit_okay, rx5 = radio_control.exitCommandMode(self.ser, retries=self.RADIO_MAX_SETCHAN_RETRIES)
 
-        self.update_rx_buf(hexlify(rx1 + rx2 + rx3 + rx4 + rx5))
+        self.update_rx_buf(rx1 + rx2 + rx3 + rx4 + rx5)
         # don't scan for packets in RX buf because we're pressed for time
         good = enter_okay and channel_okay and exit_okay
 
@@ -583,7 +859,7 @@ class EQUiStation:
         # enter command mode and set default (no shift channel) - mainly for testing
         enter_okay, rx1 = radio_control.enterCommandMode(self.ser, dealer=True)
         def_okay, rx2 = radio_control.addChannel(self.ser, 1, self.RADIO_BASE_FREQ_HZ, self.RADIO_BASE_FREQ_HZ)
-        self.update_rx_buf(hexlify(rx1 + rx2))
+        self.update_rx_buf(rx1 + rx2)
         # set shifted channels
         mid_channels_okay = True
         channel = 2
@@ -598,12 +874,12 @@ class EQUiStation:
             # update
             channel += 2
             mid_channels_okay = mid_channels_okay and in_okay and out_okay
-            self.update_rx_buf(hexlify(rx1 + rx2))
+            self.update_rx_buf(rx1 + rx2)
 
         # program settings and exit command mode
         program_okay, rx1 = radio_control.program(self.ser)
         exit_okay, rx2 = radio_control.exitCommandMode(self.ser)
-        self.update_rx_buf(hexlify(rx1 + rx2))
+        self.update_rx_buf(rx1 + rx2)
 
         okay = enter_okay and def_okay and mid_channels_okay and exit_okay
         logging.info("preconfigured radio channels: %s" % "success" if okay else "FAILURE")
@@ -612,17 +888,29 @@ class EQUiStation:
     ##################################################################
     # Doppler correct helpers
     ##################################################################
+    def plan_pass(self, pass_data):
+        """ Returns the doppler corrections for the given pass (with its satellite's "norad_id"):
+        those planned with the pass timeline if there are any, otherwise newly generated ones """
+        corrections = self.multi_tracker.get_doppler_corrections(pass_data)
+        if corrections is None:
+            corrections = EQUiStation.generate_doppler_corrections(
+                pass_data, self.multi_tracker.get_tracker(pass_data["norad_id"]), self.RADIO_BASE_FREQ_HZ)
+        return corrections
+
     @staticmethod
-    def generate_doppler_corrections(pass_data, tracker, base_freq_hz):
+    def generate_doppler_corrections(pass_data, tracker, base_freq_hz, curve=None):
         """ Updates the list of doppler correction times and frequencies based on the
-        characteristics of the given next pass and the given tracker class. """
+        characteristics of the given next pass and the given tracker class.
+        If the pass's PassCurve is given, the times are interpolated from it rather than solved for. """
         freq_step = radio_control.RADIO_FREQ_STEP_HZ
         # check what the times are during the pass that we hit the frequencies between
         # our step points. Those are the times that we want to swap from one frequency setting
         # to the next (lower) one, so we'll use those times as correction times
         #                       +12.5k         +6.25k           0k            -6.25k         -12.5k
         doppler_threshold_freqs = [1.5*freq_step, 0.5*freq_step, -0.5*freq_step, -1.5*freq_step]
-        doppler_threshold_times = tracker.get_doppler_freq_times(doppler_threshold_freqs, pass_data, base_freq_hz)
+        doppler_threshold_times = tracker.get_doppler_freq_times(doppler_threshold_freqs, pass_data, base_freq_hz,
+                                                                 tolerance_s=EQUiStation.DOPPLER_TIME_TOLERANCE_S,
+                                                                 curve=curve)
 
         corrections = []
         # do default (single) correction if we get no times at all
@@ -662,7 +950,7 @@ class EQUiStation:
     def update_radio_for_pass(self):
         data_good = self.update_pass_data()
         if data_good and len(self.doppler_corrections) > 0: # note: !data_good should imply no doppler corrections
-            activate_good = self.radio_activate_pass_freq(self.doppler_corrections[self.doppler_correction_index]["freq"])
+            activate_good = self.radio_activate_pass_freq(self.doppler_corrections.freqs[self.doppler_correction_index])
             if activate_good:
                 self.doppler_correction_index = 1 # just did first
         else:
@@ -674,21 +962,16 @@ class EQUiStation:
         return good
 
     def update_pass_data(self):
-        """ Updates our cached information on the next EQUiSat pass via an API call """
-
-        # update the TLE cache (every pass, we might as well)
-        success = self.tracker.update_tle()
-        if not success:
-            logging.error("error updating TLE data to latest")
+        """ Updates our cached information on the next EQUiSat pass from the precomputed schedule """
 
+        # (the TLEs are kept up to date in the background, so we never wait on the tracking server here)
         if self.tracker.tle is not None:
             logging.info("Using TLEs: %s; id %s" % (self.tracker.tle.name, self.tracker.tle.catalog_number))
         else:
             logging.warning("No TLE found!")
 
-        # compute next pass geometrically
-        next_pass_data = self.tracker.get_next_pass()
-        # next_pass_data = self.tracker.get_next_pass(start=self.tracker.datetime_to_ephem(datetime.datetime.utcnow()+datetime.timedelta(hours=7)))
+        # look up the next pass (and its doppler corrections) in the precomputed schedule
+        next_pass_data, doppler_corrections = self.pass_schedule.get_next_pass()
 
         # TESTING override; determine a random elevation and select the closest elevation
         # real pass from subsequent ones, then time shift it up (below)
@@ -696,25 +979,31 @@ class EQUiStation:
         if config.GENERATE_FAKE_PASSES:
             desired_elev = random.randint(5, 90)
             logging.debug("TESTING: finding pass with elevation near %d deg" % desired_elev)
-            next_pass_data = EQUiStation.find_pass_with_elev(desired_elev, self.tracker)
+            next_pass_data = Pass.from_dict(EQUiStation.find_pass_with_elev(desired_elev, self.tracker))
+            doppler_corrections = None
 
         # on fails, our best bet is probably to use the old pass as it won't change a ton (don't set self.next_pass_data)
         if next_pass_data is None:
             logging.error("ERROR retrieving next pass data")
-            self.doppler_corrections = [] # there is no data
+            self.doppler_corrections = DopplerSchedule() # there is no data
             self.doppler_correction_index = 0
             return False
 
-        elif next_pass_data["max_alt_time"] is None or next_pass_data["max_alt"] is None:
+        elif next_pass_data.max_alt_time is None or next_pass_data.max_alt is None:
             logging.warning("ERROR retrieving next pass data: %s" % self.next_pass_data)
-            self.doppler_corrections = []  # there is no data
+            self.doppler_corrections = DopplerSchedule()  # there is no data
             self.doppler_correction_index = 0
             return False
 
         else:
             self.next_pass_data = next_pass_data
-            # generate the best set of doppler corrections for this pass and set them as the new ones
-            self.doppler_corrections = self.generate_doppler_corrections(self.next_pass_data, self.tracker, self.RADIO_BASE_FREQ_HZ)
+            # generate the best set of doppler corrections for this pass (unless already planned) and set them as the new ones
+            if doppler_corrections is None:
+                tracker = self.multi_tracker.get_tracker(self.next_pass_data.norad_id) \
+                    if self.next_pass_data.norad_id is not None else self.tracker
+                doppler_corrections = DopplerSchedule.from_corrections(
+                    self.generate_doppler_corrections(self.next_pass_data, tracker, self.RADIO_BASE_FREQ_HZ))
+            self.doppler_corrections = doppler_corrections
             self.doppler_correction_index = 0
 
             # if we're 'faking' passes such that we make sure to run one right now, shift all the times in the
@@ -723,10 +1012,11 @@ class EQUiStation:
                 self.shift_next_pass_to(duration_from_now=datetime.timedelta(seconds=15)) #duration_from_now=datetime.timedelta(seconds=EQUiStation.ORBITAL_PERIOD_S / 2))
 
             # make sure we active the first one ASAP (it will be activated right after this regardless)
-            self.doppler_corrections[0]["time"] = datetime.datetime.utcnow()
+            self.doppler_corrections = self.doppler_corrections.with_time(0, datetime.datetime.utcnow())
 
-            logging.info("TARGETED NEW PASS with:\n\n%s\ndoppler corrections:\n%s" % \
-                         (self.tracker.pass_tostr(self.next_pass_data, self.RADIO_BASE_FREQ_HZ), self.get_doppler_corrections_str()))
+            logging.info("TARGETED NEW PASS of %s with:\n\n%s\ndoppler corrections:\n%s" % \
+                         (self.next_pass_data.sat_name or self.tracker.tle.name,
+                          self.tracker.pass_tostr(self.next_pass_data, self.RADIO_BASE_FREQ_HZ), self.get_doppler_corrections_str()))
             return True
 
     @staticmethod
@@ -744,14 +1034,11 @@ class EQUiStation:
 
     def shift_next_pass_to(self, duration_from_now):
         """ Shifts all the pass timing attributes for the next pass up to or back to duration_from_now from now """
-        to_subtract = self.next_pass_data["rise_time"] - (datetime.datetime.utcnow() + duration_from_now)
+        to_subtract = self.next_pass_data.rise_time - (datetime.datetime.utcnow() + duration_from_now)
         logging.debug("TESTING: shifting pass up by %s from\n%s" % (to_subtract,
                    self.tracker.pass_tostr(self.next_pass_data, self.RADIO_BASE_FREQ_HZ)))
-        self.next_pass_data["rise_time"] -= to_subtract
-        self.next_pass_data["max_alt_time"] -= to_subtract
-        self.next_pass_data["set_time"] -= to_subtract
-        for dop_shift in self.doppler_corrections:
-            dop_shift["time"] -= to_subtract
+        self.next_pass_data = self.next_pass_data.shifted(-to_subtract)
+        self.doppler_corrections = self.doppler_corrections.shifted(-to_subtract)
         logging.debug("TESTING: shifted pass:\n%s" % self.tracker.pass_tostr(self.next_pass_data, self.RADIO_BASE_FREQ_HZ))
 
     @staticmethod
@@ -813,7 +1100,65 @@ class EQUiStation:
         return self.next_pass_data
 
     def get_rx_buf(self):
-        return self.rx_buf
+        """ Returns the recent RX data in hex """
+        return self.rx_buf.tohex()
+
+    def get_decode_cache_stats(self):
+        return self.decode_cache.get_stats()
+
+    def get_dedup_stats(self):
+        return self.dedup_index.get_stats()
+
+    def get_rx_dump_stats(self):
+        return self.rx_dump.get_stats()
+
+    def get_publisher_stats(self):
+        """ Returns the queue depth, delivery counts and latency of each publishing sink """
+        return self.publisher.get_stats()
+
+    def get_spool_stats(self):
+        """ Returns the spool's upload counts and packets by status, or None if it isn't being used """
+        return self.spool_uploader.get_stats() if self.spool_uploader is not None else None
+
+    def get_tracking_stats(self):
+        """ Returns the number of satellites tracked, stats on their merged pass timeline, and the TLE files' sizes """
+        return self.multi_tracker.get_stats()
+
+    def get_tle_stats(self):
+        """ Returns the age of each satellite's TLEs, and how the TLE files' background refreshes have gone """
+        return self.tle_refresher.get_stats()
+
+    def get_pass_schedule_stats(self):
+        """ Returns how many passes are precomputed (and until when), and how often they've been used """
+        return self.pass_schedule.get_stats()
+
+    def get_schedule_stats(self):
+        """ Returns the pending scheduled events, and how many times each kind has run and how late """
+        return self.scheduler.get_stats()
+
+    def get_runtime_stats(self):
+        """ Returns the threaded runtime's thread and queue stats, or None if it isn't being used """
+        return self.runtime.get_stats() if self.runtime is not None else None
+
+    def get_loop_stats(self):
+        """ Returns main loop wakeup counts, and stats on the latency from packets arriving to us finding them """
+        latencies = list(self.detection_latencies)
+        return {
+            "wakeups": self.wakeups,
+            "idle_wakeups": self.idle_wakeups,
+            "detection_latency_last_s": latencies[-1] if len(latencies) > 0 else None,
+            "detection_latency_mean_s": sum(latencies) / len(latencies) if len(latencies) > 0 else None,
+            "detection_latency_max_s": max(latencies) if len(latencies) > 0 else None
+        }
+
+    def get_sync_stats(self):
+        """ Returns counts of packets found this pass, and of those recovered despite corrupted callsigns """
+        return {
+            "packets_since_pass_start": self.packets_since_pass_start,
+            "recovered_since_pass_start": self.recovered_since_pass_start,
+            "recovered_total": self.framer.num_recovered,
+            "rejected_total": self.framer.num_rejected
+        }
 
     def get_tx_cmd_queue(self):
         return self.tx_cmd_queue
@@ -859,9 +1204,11 @@ def main():
 
     gs = EQUiStation()
     if config.USE_TEST_FILE:
-        gs.run(ser_infilename=config.TEST_INFILE, ser_outfilename=config.TEST_OUTFILE, radio_preconfig=radio_preconfig)
+        gs.run(ser_infilename=config.TEST_INFILE, ser_outfilename=config.TEST_OUTFILE, radio_preconfig=radio_preconfig,
+               ser_capture_dir=config.TEST_CAPTURE_DIR, threaded=config.THREADED_RUNTIME)
     else:
-        gs.run(serial_port=config.SERIAL_PORT, serial_baud=config.SERIAL_BAUD, radio_preconfig=radio_preconfig)
+        gs.run(serial_port=config.SERIAL_PORT, serial_baud=config.SERIAL_BAUD, radio_preconfig=radio_preconfig,
+               threaded=config.THREADED_RUNTIME)
 
 if __name__ == "__main__":
     #print(trim_buffer("cats are cool", 4, 4)) # should be "cool"
@@ -0,0 +1,132 @@
+#!/usr/bin/python
+# A local stand-in for the packet and TLE APIs, for testing publishing and TLE refreshes without the real server.
+# Point config.PACKET_PUB_ROUTE (and/or PACKET_PUB_BATCH_ROUTE) at it, e.g. http://localhost:8080/receive,
+# and/or a tracker's TLE route, e.g. http://localhost:8080/tle
+# Usage: python mock_api.py [port] [fraction of requests to fail] [TLE file to serve]
+import sys
+import json
+import random
+import time
+import hashlib
+import email.utils
+import threading
+import BaseHTTPServer
+
+class MockApiHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """ Accepts POSTed packet JSON (one packet, or a list of them), and serves the TLEs on GETs,
+    failing a random fraction of requests with a 503. Repeated upload_ids are counted but otherwise accepted.
+    Requests with a packet the server's fail_packet function returns a status code for are answered with it.
+    TLE requests are answered with a 304 if the TLEs haven't changed since the ETag or date given. """
+    def do_GET(self):
+        self.server.tle_requests += 1
+        if random.random() < self.server.fail_fraction:
+            self.send_response(503)
+            self.end_headers()
+            return
+        with self.server.lock:
+            tle_data = self.server.tle_data
+            tle_modified = self.server.tle_modified
+        if tle_data is None:
+            self.send_response(404)
+            self.end_headers()
+            return
+
+        etag = '"%s"' % hashlib.sha1(tle_data).hexdigest()
+        last_modified = email.utils.formatdate(tle_modified, usegmt=True)
+        since = self.headers.getheader("if-modified-since")
+        since = email.utils.parsedate_tz(since) if since is not None else None
+        if self.headers.getheader("if-none-match") == etag or \
+                (since is not None and email.utils.mktime_tz(since) >= int(tle_modified)):
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", last_modified)
+        self.end_headers()
+        self.wfile.write(tle_data)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.getheader("content-length", 0)))
+        if random.random() < self.server.fail_fraction:
+            self.send_response(503)
+            self.end_headers()
+            return
+
+        try:
+            packets = json.loads(body)
+        except ValueError:
+            self.send_response(400)
+            self.end_headers()
+            self.wfile.write("invalid JSON")
+            return
+        if not isinstance(packets, list):
+            packets = [packets]
+        if self.server.fail_packet is not None:
+            for packet in packets:
+                status = self.server.fail_packet(packet)
+                if status is not None:
+                    self.send_response(status)
+                    self.end_headers()
+                    return
+
+        with self.server.lock:
+            for packet in packets:
+                upload_id = packet.get("upload_id")
+                if upload_id is not None and upload_id in self.server.upload_ids:
+                    self.server.repeats += 1
+                else:
+                    self.server.upload_ids.add(upload_id)
+                    self.server.packets.append(packet)
+        self.send_response(200)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            BaseHTTPServer.BaseHTTPRequestHandler.log_message(self, format, *args)
+
+class MockApiServer(BaseHTTPServer.HTTPServer):
+    """ The stand-in API server; received packets are kept in packets, and tle_data is served (see set_tle_data) """
+    def __init__(self, port=8080, fail_fraction=0.0, verbose=False, tle_data=None):
+        BaseHTTPServer.HTTPServer.__init__(self, ("localhost", port), MockApiHandler)
+        self.fail_fraction = fail_fraction
+        self.fail_packet = None # function from a packet to the status code to answer with, or None to accept it
+        self.verbose = verbose
+        self.lock = threading.Lock()
+        self.packets = []
+        self.upload_ids = set()
+        self.repeats = 0
+        self.tle_requests = 0
+        self.tle_data = None
+        self.tle_modified = None
+        if tle_data is not None:
+            self.set_tle_data(tle_data)
+
+    def set_tle_data(self, tle_data):
+        """ Serves the given TLEs from now on (as modified now) """
+        with self.lock:
+            self.tle_data = tle_data
+            self.tle_modified = time.time()
+
+    def start(self):
+        """ Serves requests on a background thread """
+        thread = threading.Thread(target=self.serve_forever, name="mock-api")
+        thread.daemon = True
+        thread.start()
+
+def main():
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8080
+    fail_fraction = float(sys.argv[2]) if len(sys.argv) > 2 else 0.0
+    tle_data = None
+    if len(sys.argv) > 3:
+        with open(sys.argv[3], "r") as f:
+            tle_data = f.read()
+    server = MockApiServer(port, fail_fraction, verbose=True, tle_data=tle_data)
+    print("mock API listening on http://localhost:%d/" % port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("received %d packets (%d repeats)" % (len(server.packets), server.repeats))
+
+if __name__ == "__main__":
+    main()
@@ -4,11 +4,18 @@ import random
 import re
 import logging
 
+from capture_store import CaptureReader
+
 # A mock serial class that can be hot-swapped with serial.Serial to emulate it.
 class MockSerial:
-    def __init__(self, infile_name=None, outfile_name=None, max_inwaiting=100, unhex=False):
-        self.infile = open(infile_name, "r")
-        self.outfile = open(outfile_name, "w")
+    def __init__(self, infile_name=None, outfile_name=None, max_inwaiting=100, unhex=False, capture_dir=None):
+        """ Reads from infile_name, or replays the raw RX capture (see capture_store) in capture_dir if given """
+        self.infile = open(infile_name, "r") if infile_name is not None and capture_dir is None else None
+        self.outfile = open(outfile_name, "w") if outfile_name is not None else None
+
+        self.capture = CaptureReader(capture_dir) if capture_dir is not None else None
+        self.capture_records = None
+        self.capture_leftover = ""
 
         self.unhex = unhex
         self.max_inwaiting = max_inwaiting
@@ -93,6 +100,8 @@ class MockSerial:
                 # take only what part we need; rest will be taken next time
                 ret = response[:size]
 
+        elif self.capture is not None:
+            ret = self._read_capture(size)
         elif self.infile is None:
             ret = self._rand_seq(size)
         else:
@@ -101,8 +110,8 @@ class MockSerial:
             if len(ret) < size:
                 self.infile.seek(0)
 
-        # return value, possibly changed
-        if self.unhex:
+        # return value, possibly changed (captures are already raw)
+        if self.unhex and self.capture is None:
             return binascii.unhexlify(ret)
         else:
             return ret
@@ -119,9 +128,24 @@ class MockSerial:
         if self.infile is not None:
             self.infile.flush()
 
+    def _read_capture(self, size):
+        """ Reads up to size bytes from the capture's records, wrapping around at the end like file reads """
+        ret = self.capture_leftover
+        while len(ret) < size:
+            if self.capture_records is None:
+                self.capture_records = self.capture.read()
+            try:
+                _, data = next(self.capture_records)
+                ret += str(data)
+            except StopIteration:
+                self.capture_records = None
+                break
+        self.capture_leftover = ret[size:]
+        return ret[:size]
+
     def _rand_in_waiting(self):
         val = random.randint(1, self.max_inwaiting)
-        if self.unhex and val % 2 != 0:
+        if self.unhex and self.capture is None and val % 2 != 0:
             val -= 1
         return val
 
@@ -0,0 +1,247 @@
+#!/usr/bin/python
+# Tracking of several satellites at once (EQUiSat plus others sharing the band), merging
+# their passes into one timeline of which satellite to listen to when.
+import copy
+import time
+import ephem
+import logging
+import datetime
+import threading
+import multiprocessing
+from collections import OrderedDict
+
+import config
+import tracking
+import tle_catalog
+import groundstation
+
+# which of two overlapping passes is tracked: the one of the higher priority satellite
+# (then the higher elevation pass), or the higher elevation pass (then the higher priority satellite)
+OVERLAP_BY_PRIORITY = "priority"
+OVERLAP_BY_ELEVATION = "elevation"
+
+def compute_passes(args):
+    """ Returns a list of (pass data, PassCurve, doppler corrections) for the passes rising in [start, end)
+    (datetimes) of the satellite with the given NORAD ID and TLE lines, with doppler curves at curve_step_s
+    resolution (or None if curve_step_s is None), and the doppler corrections planned from them for a radio at
+    base_freq_hz (see EQUiStation.generate_doppler_corrections; None if either is None).
+    Takes a single tuple of arguments so it can be run on a process pool. """
+    norad_id, tle_lines, start, end, curve_step_s, base_freq_hz = args
+    tracker = tracking.SatTracker(norad_id, tle_lines=tle_lines)
+    passes = []
+    while start < end:
+        pass_data = tracker.get_next_pass(tracker.datetime_to_ephem(start))
+        if pass_data is None or pass_data["max_alt_time"] is None or pass_data["rise_time"] >= end:
+            break
+        # (skip a pass in progress, for which we get the next pass's rise but this one's set)
+        if pass_data["set_time"] > pass_data["rise_time"]:
+            curve = tracker.get_pass_curve(pass_data, curve_step_s) if curve_step_s is not None else None
+            corrections = None
+            if curve is not None and base_freq_hz is not None:
+                corrections = groundstation.EQUiStation.generate_doppler_corrections(pass_data, tracker, base_freq_hz,
+                                                                                   curve=curve)
+            passes.append((pass_data, curve, corrections))
+        start = pass_data["set_time"] + datetime.timedelta(minutes=1)
+    return passes
+
+def resolve_overlaps(entries, overlap_priority=OVERLAP_BY_PRIORITY):
+    """ Given timeline entries (see MultiSatTracker.get_timeline) of possibly overlapping passes, returns the
+    entries to track (in time order) such that none overlap, preferring passes by overlap_priority,
+    and the list of entries left out """
+    if overlap_priority == OVERLAP_BY_ELEVATION:
+        rank = lambda entry: (entry["pass"]["max_alt"], entry["priority"])
+    else:
+        rank = lambda entry: (entry["priority"], entry["pass"]["max_alt"])
+
+    tracked = []
+    conflicts = []
+    for entry in sorted(entries, key=rank, reverse=True):
+        overlaps = any(entry["pass"]["rise_time"] < other["pass"]["set_time"] and
+                       other["pass"]["rise_time"] < entry["pass"]["set_time"] for other in tracked)
+        if overlaps:
+            conflicts.append(entry)
+        else:
+            tracked.append(entry)
+    tracked.sort(key=lambda entry: entry["pass"]["rise_time"])
+    conflicts.sort(key=lambda entry: entry["pass"]["rise_time"])
+    return tracked, conflicts
+
+class MultiSatTracker:
+    """ Tracks several satellites (each with a SatTracker and a priority, higher being more important),
+    computing their passes and doppler curves in parallel on a process pool (of processes processes,
+    or one per CPU if None) and merging them into one timeline without overlapping passes.
+    If base_freq_hz is given, the doppler corrections of each pass are also planned from its curve on the pool.
+    The timeline is computed horizon_days ahead and cached until it runs out or the TLEs change.
+    The pool is created here, so create the tracker before starting any threads (forking a process
+    with other threads running can deadlock it), and close it when done. Safe to use from multiple threads. """
+    def __init__(self, trackers, overlap_priority=OVERLAP_BY_PRIORITY, processes=None, horizon_days=3,
+                 curve_step_s=1, base_freq_hz=None):
+        self.trackers = OrderedDict((tracker.norad_id, (tracker, priority)) for tracker, priority in trackers)
+        self.overlap_priority = overlap_priority
+        self.processes = processes
+        self.horizon = datetime.timedelta(days=horizon_days)
+        self.curve_step_s = curve_step_s
+        self.base_freq_hz = base_freq_hz
+        self.lock = threading.RLock()
+        self.pool = None
+        if len(self.trackers) > 1 and self.processes != 1:
+            self.pool = multiprocessing.Pool(min(self.processes or multiprocessing.cpu_count(), len(self.trackers)))
+
+        self.timeline = []
+        self.conflicts = []
+        self.timeline_key = None
+        self.timeline_start = None
+        self.timeline_end = None
+
+        # stats
+        self.computations = 0
+        self.last_compute_s = None
+
+    @staticmethod
+    def datetime_to_ephem(dt):
+        return tracking.SatTracker.datetime_to_ephem(dt)
+
+    def get_tracker(self, norad_id):
+        """ Returns the SatTracker for the satellite with the given NORAD ID """
+        return self.trackers[str(norad_id)][0]
+
+    def get_trackers(self):
+        """ Returns the SatTrackers of all satellites """
+        return [tracker for tracker, _ in self.trackers.values()]
+
+    def update_tle(self):
+        """ Updates the TLEs of all satellites (downloading each TLE file only once). Returns if all were successful """
+        success = True
+        updated = {}
+        for tracker, _ in self.trackers.values():
+            source = (tracker.tle_fname, tracker.tle_route)
+            if source not in updated:
+                updated[source] = tracker.update_tle()
+            else:
+                tracker.reload_tle() # (already downloaded)
+            success = success and updated[source]
+        return success
+
+    def get_tle_key(self):
+        """ Returns a string identifying the TLEs of all satellites, or None if there are none """
+        keys = [tracker.get_tle_key() for tracker, _ in self.trackers.values()]
+        keys = [key for key in keys if key is not None]
+        return ",".join(keys) if len(keys) > 0 else None
+
+    def compute_timeline(self, start, end):
+        """ Computes the passes of all satellites rising in [start, end) in parallel, and returns
+        (timeline, conflicts) as given by resolve_overlaps """
+        jobs = []
+        for norad_id, (tracker, priority) in self.trackers.items():
+            if tracker.tle_lines is None:
+                logging.warning("multi tracker: no TLEs for %s, not tracking it" % norad_id)
+                continue
+            jobs.append((norad_id, tracker.tle_lines, start, end, self.curve_step_s, self.base_freq_hz))
+
+        began = time.time()
+        if len(jobs) <= 1 or self.pool is None:
+            results = [compute_passes(job) for job in jobs]
+        else:
+            results = self.pool.map(compute_passes, jobs)
+        self.last_compute_s = time.time() - began
+        self.computations += 1
+
+        entries = []
+        for job, passes in zip(jobs, results):
+            tracker, priority = self.trackers[job[0]]
+            for pass_data, curve, corrections in passes:
+                entries.append({
+                    "norad_id": job[0],
+                    "name": tracker.tle.name,
+                    "priority": priority,
+                    "pass": pass_data,
+                    "curve": curve,
+                    "doppler_corrections": corrections
+                })
+        return resolve_overlaps(entries, self.overlap_priority)
+
+    def get_timeline(self, start=None, end=None):
+        """ Returns the timeline of passes to track between start and end (datetimes; now and the end of
+        the horizon if None), as a time-ordered list of non-overlapping entries of the form
+        {"norad_id", "name", "priority", "pass": pass data, "curve": PassCurve, "doppler_corrections": list of
+        correction dictionaries, or None if not planned}. Don't modify them. """
+        if start is None:
+            start = datetime.datetime.utcnow()
+        if end is None:
+            end = start + self.horizon
+        with self.lock:
+            if not self._is_cached(start, end):
+                self._update_timeline(start, end)
+            return [entry for entry in self.timeline
+                    if entry["pass"]["set_time"] > start and entry["pass"]["rise_time"] < end]
+
+    def get_next_pass(self, start=None):
+        """ Returns the pass data (like SatTracker.get_next_pass, plus the satellite's "norad_id" and "sat_name")
+        of the next pass in the timeline rising after start (an ephem date, or None for now),
+        or None if there isn't one. """
+        start = ephem.Date(start).datetime() if start is not None else datetime.datetime.utcnow()
+        with self.lock:
+            entry = self._find_next(start) if self._is_cached(start, start) else None
+            if entry is None:
+                # (the cached timeline ran out)
+                self._update_timeline(start, start + self.horizon)
+                entry = self._find_next(start)
+        if entry is None:
+            return None
+        pass_data = copy.deepcopy(entry["pass"])
+        pass_data["norad_id"] = entry["norad_id"]
+        pass_data["sat_name"] = entry["name"]
+        return pass_data
+
+    def get_doppler_corrections(self, pass_data):
+        """ Returns the doppler corrections planned for the given pass of the timeline (a copy of the list of
+        correction dictionaries), or None if they weren't planned or the pass isn't in the timeline """
+        with self.lock:
+            for entry in self.timeline:
+                if entry["norad_id"] == pass_data["norad_id"] and entry["pass"]["rise_time"] == pass_data["rise_time"]:
+                    return copy.deepcopy(entry["doppler_corrections"])
+        return None
+
+    def close(self):
+        """ Shuts down the process pool """
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+    def _is_cached(self, start, end):
+        return self.timeline_start is not None and self.timeline_start <= start and end <= self.timeline_end and \
+               self.timeline_key == self.get_tle_key()
+
+    def _update_timeline(self, start, end):
+        self.timeline_key = self.get_tle_key()
+        self.timeline, self.conflicts = self.compute_timeline(start, end)
+        self.timeline_start = start
+        self.timeline_end = end
+
+    def _find_next(self, start):
+        for entry in self.timeline:
+            if entry["pass"]["rise_time"] >= start:
+                return entry
+        return None
+
+    def get_stats(self):
+        return {
+            "satellites": len(self.trackers),
+            "timeline_passes": len(self.timeline),
+            "conflicting_passes": len(self.conflicts),
+            "computations": self.computations,
+            "last_compute_s": self.last_compute_s,
+            "tle_catalogs": tle_catalog.get_stats()
+        }
+
+def from_config(primary, base_freq_hz=None):
+    """ Returns a MultiSatTracker of the given (EQUiSat) tracker plus the other satellites in config,
+    planning doppler corrections for a radio at base_freq_hz if given """
+    trackers = [(primary, config.SAT_PRIORITY)]
+    for sat in config.EXTRA_SATELLITES:
+        trackers.append((tracking.SatTracker(sat["norad_id"], tle_fname=config.EXTRA_TLE_FILENAME,
+                                             tle_route=config.EXTRA_TLE_ROUTE), sat["priority"]))
+    return MultiSatTracker(trackers, overlap_priority=config.PASS_OVERLAP_PRIORITY,
+                           processes=config.TRACKING_PROCESSES, horizon_days=config.PASS_SCHEDULE_DAYS,
+                           base_freq_hz=base_freq_hz)
@@ -0,0 +1,140 @@
+#!/usr/bin/python
+# Compact, immutable records of a pass and its doppler correction schedule, shared (without copying)
+# between the pass schedule, the station loop and every packet published during the pass.
+import bisect
+from collections import OrderedDict
+
+class Pass(object):
+    """ A satellite pass (see SatTracker.get_next_pass), with the NORAD ID and name of the satellite
+    if known. Fields can be read as attributes or, like the pass data dictionaries, by key.
+    Immutable; use shifted to get a moved copy. """
+    FIELDS = ("rise_time", "rise_azimuth", "rise_doppler_factor", "max_alt_time", "max_alt",
+              "set_time", "set_azimuth", "set_doppler_factor")
+    OPTIONAL_FIELDS = ("norad_id", "sat_name")
+    TIME_FIELDS = ("rise_time", "max_alt_time", "set_time")
+    __slots__ = FIELDS + OPTIONAL_FIELDS + ("_serialized",)
+
+    def __init__(self, rise_time, rise_azimuth, rise_doppler_factor, max_alt_time, max_alt,
+                 set_time, set_azimuth, set_doppler_factor, norad_id=None, sat_name=None):
+        object.__setattr__(self, "rise_time", rise_time)
+        object.__setattr__(self, "rise_azimuth", rise_azimuth)
+        object.__setattr__(self, "rise_doppler_factor", rise_doppler_factor)
+        object.__setattr__(self, "max_alt_time", max_alt_time)
+        object.__setattr__(self, "max_alt", max_alt)
+        object.__setattr__(self, "set_time", set_time)
+        object.__setattr__(self, "set_azimuth", set_azimuth)
+        object.__setattr__(self, "set_doppler_factor", set_doppler_factor)
+        object.__setattr__(self, "norad_id", norad_id)
+        object.__setattr__(self, "sat_name", sat_name)
+        object.__setattr__(self, "_serialized", None)
+
+    @staticmethod
+    def from_dict(pass_data):
+        """ Returns the Pass of the given pass data dictionary """
+        return Pass(**dict((field, pass_data[field]) for field in Pass.FIELDS + Pass.OPTIONAL_FIELDS
+                           if field in pass_data))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("passes are immutable")
+
+    def keys(self):
+        return [field for field in Pass.FIELDS + Pass.OPTIONAL_FIELDS
+                if field in Pass.FIELDS or getattr(self, field) is not None]
+
+    def items(self):
+        return [(field, getattr(self, field)) for field in self.keys()]
+
+    def __getitem__(self, key):
+        if key in Pass.FIELDS or (key in Pass.OPTIONAL_FIELDS and getattr(self, key) is not None):
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        return key in self.keys()
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def to_dict(self):
+        """ Returns the pass data dictionary of the pass """
+        return OrderedDict(self.items())
+
+    def shifted(self, delta):
+        """ Returns a copy of the pass with all its times moved by delta (a timedelta) """
+        values = dict(self.items())
+        for field in Pass.TIME_FIELDS:
+            values[field] += delta
+        return Pass(**values)
+
+    def serialize(self):
+        """ Returns the pass as a JSON-able dictionary (times as ISO strings), built only once.
+        Don't modify it. """
+        if self._serialized is None:
+            serialized = self.to_dict()
+            for field in Pass.TIME_FIELDS:
+                serialized[field] = serialized[field].isoformat()
+            object.__setattr__(self, "_serialized", serialized)
+        return self._serialized
+
+    def __repr__(self):
+        return "Pass(%s)" % ", ".join("%s=%s" % (field, value) for field, value in self.items())
+
+class DopplerSchedule(object):
+    """ The doppler corrections to make over a pass: at each of times (UTC datetimes, in order),
+    switch to the corresponding frequency shift in freqs (Hz). Corrections can also be read by index,
+    like the correction dictionaries ({"time", "freq"}). Immutable; use with_time and shifted to get
+    modified copies. """
+    __slots__ = ("times", "freqs", "_serialized")
+
+    def __init__(self, times=(), freqs=()):
+        object.__setattr__(self, "times", tuple(times))
+        object.__setattr__(self, "freqs", tuple(freqs))
+        object.__setattr__(self, "_serialized", None)
+
+    @staticmethod
+    def from_corrections(corrections):
+        """ Returns the DopplerSchedule of the given list of correction dictionaries """
+        return DopplerSchedule([c["time"] for c in corrections], [c["freq"] for c in corrections])
+
+    def __setattr__(self, name, value):
+        raise AttributeError("doppler schedules are immutable")
+
+    def __len__(self):
+        return len(self.times)
+
+    def __getitem__(self, i):
+        return {"time": self.times[i], "freq": self.freqs[i]}
+
+    def active_index(self, when, lo=0):
+        """ Returns the index of the last correction (from lo on) due by when, or lo-1 if none are """
+        return bisect.bisect_right(self.times, when, lo) - 1
+
+    def with_time(self, i, time):
+        """ Returns a copy of the schedule with correction i moved to time """
+        times = list(self.times)
+        times[i] = time
+        schedule = DopplerSchedule(times, self.freqs)
+        if self._serialized is not None:
+            # (only reformat the correction that moved)
+            serialized = list(self._serialized)
+            serialized[i] = {"time": time.isoformat(), "freq": self.freqs[i]}
+            object.__setattr__(schedule, "_serialized", serialized)
+        return schedule
+
+    def shifted(self, delta):
+        """ Returns a copy of the schedule with all its times moved by delta (a timedelta) """
+        return DopplerSchedule([time + delta for time in self.times], self.freqs)
+
+    def serialize(self):
+        """ Returns the schedule as a JSON-able list of correction dictionaries (times as ISO strings),
+        built only once. Don't modify it. """
+        if self._serialized is None:
+            object.__setattr__(self, "_serialized", [{"time": time.isoformat(), "freq": freq}
+                                                     for time, freq in zip(self.times, self.freqs)])
+        return self._serialized
+
+    def __repr__(self):
+        return "DopplerSchedule(%s)" % self.serialize()
@@ -0,0 +1,222 @@
+#!/usr/bin/python
+# Precomputed schedule of upcoming passes (and their doppler corrections), kept on disk so
+# the station can start planning instantly after a restart.
+import os
+import json
+import logging
+import datetime
+import threading
+from collections import OrderedDict
+
+import station_config as station
+from pass_model import Pass, DopplerSchedule
+
+TIME_FORMAT = "%Y-%m-%dT%H:%M:%S.%f"
+
+def _time_to_str(dt):
+    return dt.strftime(TIME_FORMAT)
+
+def _str_to_time(s):
+    return datetime.datetime.strptime(s, TIME_FORMAT)
+
+class PassSchedule:
+    """ The passes over the next days days, each with the doppler corrections planned for it by plan_pass
+    (a function from pass data to a list of corrections, or None to not plan any), saved in filename (JSON).
+    The passes come from tracker (a SatTracker or MultiSatTracker).
+    The schedule is keyed by the tracker's TLE epochs and the station location, and thrown out whenever
+    either changes. Expired passes are dropped and new ones computed by top_up, which a background
+    thread runs every refresh_interval_s once started. Safe to use from multiple threads. """
+    def __init__(self, tracker, filename, days=3, plan_pass=None, refresh_interval_s=60*60):
+        self.tracker = tracker
+        self.filename = filename
+        self.days = days
+        self.plan_pass = plan_pass
+        self.refresh_interval_s = refresh_interval_s
+        self.lock = threading.RLock()
+        self.key = None
+        self.passes = [] # {"pass": Pass, "doppler_corrections": DopplerSchedule}, in time order
+        self.thread = None
+        self.wakeup = threading.Event()
+        self.stopped = threading.Event()
+
+        # stats
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.passes_computed = 0
+        self.load()
+
+    def get_key(self):
+        """ Returns the key of schedules computed with the tracker's current TLEs, or None if there are none """
+        tle_key = self.tracker.get_tle_key()
+        if tle_key is None:
+            return None
+        return "%s|%s|%s|%s" % (tle_key, station.station_lat, station.station_lon, station.station_alt)
+
+    def load(self):
+        """ Loads the saved schedule, if there is one for the current TLE and location """
+        try:
+            with open(self.filename, "r") as f:
+                saved = json.load(f, object_pairs_hook=OrderedDict)
+        except (IOError, ValueError) as e:
+            logging.debug("pass schedule: no saved schedule loaded: %s" % e)
+            return
+        if saved.get("key") != self.get_key():
+            logging.info("pass schedule: saved schedule is out of date, ignoring it")
+            return
+
+        with self.lock:
+            self.key = saved["key"]
+            self.passes = [self._decode_entry(entry) for entry in saved["passes"]]
+        logging.info("pass schedule: loaded %d passes" % len(self.passes))
+
+    def save(self):
+        with self.lock:
+            saved = {
+                "key": self.key,
+                "passes": [self._encode_entry(entry) for entry in self.passes]
+            }
+        # write then rename, so a crash never leaves a partial file
+        tmp_filename = self.filename + ".tmp"
+        with open(tmp_filename, "w") as f:
+            json.dump(saved, f)
+        os.rename(tmp_filename, self.filename)
+
+    def top_up(self, limit=None):
+        """ Drops expired passes and computes any new ones in the schedule's window (recomputing all of them
+        if the TLE or location changed), computing at most limit passes if given. Returns whether the schedule changed.
+        The passes are computed without holding the lock, so readers aren't held up by it. """
+        key = self.get_key()
+        if key is None:
+            return False
+        now = datetime.datetime.utcnow()
+        with self.lock:
+            if key == self.key:
+                last_set_time = self.passes[-1]["pass"].set_time if len(self.passes) > 0 else None
+            else:
+                last_set_time = None
+
+        # add passes after the last one until the end of the window
+        start = last_set_time + datetime.timedelta(minutes=1) if last_set_time is not None and last_set_time > now else now
+        end = now + datetime.timedelta(days=self.days)
+        new_entries = self._compute_passes(start, end, limit)
+
+        with self.lock:
+            if key != self.get_key():
+                # (the TLE or location changed again while we were computing; the next top up will redo it)
+                return False
+            self.passes_computed += len(new_entries)
+            if key != self.key:
+                if self.key is not None:
+                    self.invalidations += 1
+                    logging.info("pass schedule: TLE or location changed, recomputed")
+                self.key = key
+                self.passes = new_entries
+                changed = True
+            else:
+                num_passes = len(self.passes)
+                self.passes = [entry for entry in self.passes if entry["pass"].set_time > now]
+                # (another top up may have added some of the same passes while we were computing)
+                last_set_time = self.passes[-1]["pass"].set_time if len(self.passes) > 0 else None
+                self.passes.extend(entry for entry in new_entries
+                                   if last_set_time is None or entry["pass"].rise_time > last_set_time)
+                changed = len(self.passes) != num_passes or len(new_entries) > 0
+
+        if changed:
+            try:
+                self.save()
+            except (IOError, OSError) as e:
+                logging.error("pass schedule: error saving to %s: %s" % (self.filename, e))
+        return changed
+
+    def _compute_passes(self, start, end, limit=None):
+        """ Returns the schedule entries of the passes from start until end (at most limit of them if given) """
+        entries = []
+        while start < end and (limit is None or len(entries) < limit):
+            pass_data = self.tracker.get_next_pass(self.tracker.datetime_to_ephem(start))
+            if pass_data is None or pass_data["max_alt_time"] is None or pass_data["rise_time"] >= end:
+                break
+            if pass_data["set_time"] <= pass_data["rise_time"]:
+                # (we're in the middle of a pass, so this is the next pass's rise but this one's set)
+                start = pass_data["set_time"] + datetime.timedelta(minutes=1)
+                continue
+            corrections = self.plan_pass(pass_data) if self.plan_pass is not None else []
+            entries.append({"pass": Pass.from_dict(pass_data),
+                            "doppler_corrections": DopplerSchedule.from_corrections(corrections)})
+            start = pass_data["set_time"] + datetime.timedelta(minutes=1)
+        return entries
+
+    def get_next_pass(self, after=None):
+        """ Returns the first pass that hasn't yet ended by after (now if None), and its doppler
+        corrections, as (Pass, DopplerSchedule). Computes the schedule first if it's empty or out of date.
+        Returns (None, None) if there is no such pass. """
+        if after is None:
+            after = datetime.datetime.utcnow()
+        with self.lock:
+            if self.key == self.get_key() and len(self.passes) > 0 and self.passes[-1]["pass"].set_time > after:
+                self.hits += 1
+                return self._find_pass(after)
+            self.misses += 1
+        # just compute the next pass now, and leave the rest for the background
+        self.top_up(limit=1)
+        self.wakeup.set()
+        with self.lock:
+            return self._find_pass(after)
+
+    def _find_pass(self, after):
+        for entry in self.passes:
+            if entry["pass"].set_time > after:
+                # (they're immutable, so no need to copy them)
+                return entry["pass"], entry["doppler_corrections"]
+        return None, None
+
+    def get_passes(self):
+        """ Returns all the passes in the schedule, as a list of (Pass, DopplerSchedule) """
+        with self.lock:
+            return [(entry["pass"], entry["doppler_corrections"]) for entry in self.passes]
+
+    def start(self):
+        """ Starts topping up the schedule in the background """
+        self.thread = threading.Thread(target=self._run, name="pass-schedule")
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.wakeup.set()
+
+    def _run(self):
+        while not self.stopped.is_set():
+            try:
+                self.top_up()
+            except Exception:
+                logging.exception("pass schedule: error topping up")
+            self.wakeup.wait(self.refresh_interval_s)
+            self.wakeup.clear()
+
+    @staticmethod
+    def _encode_entry(entry):
+        pass_data = OrderedDict((k, _time_to_str(v) if isinstance(v, datetime.datetime) else v)
+                                for k, v in entry["pass"].items())
+        schedule = entry["doppler_corrections"]
+        corrections = [{"time": _time_to_str(time), "freq": freq} for time, freq in zip(schedule.times, schedule.freqs)]
+        return {"pass": pass_data, "doppler_corrections": corrections}
+
+    @staticmethod
+    def _decode_entry(entry):
+        pass_data = OrderedDict((k, _str_to_time(v) if k.endswith("_time") and v is not None else v)
+                                for k, v in entry["pass"].items())
+        schedule = DopplerSchedule([_str_to_time(c["time"]) for c in entry["doppler_corrections"]],
+                                   [c["freq"] for c in entry["doppler_corrections"]])
+        return {"pass": Pass.from_dict(pass_data), "doppler_corrections": schedule}
+
+    def get_stats(self):
+        with self.lock:
+            return {
+                "passes": len(self.passes),
+                "until": _time_to_str(self.passes[-1]["pass"].set_time) if len(self.passes) > 0 else None,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "passes_computed": self.passes_computed
+            }
@@ -0,0 +1,289 @@
+#!/usr/bin/python
+# Delivers received packets to their destinations (the API, email, local files) in the background.
+# Each destination ("sink") has its own bounded queue and worker threads, so a slow one never
+# holds up the others or the station itself.
+import json
+import logging
+import datetime
+import threading
+from collections import deque, Counter
+from Queue import Queue, Full
+from timeit import default_timer as timer
+import requests
+
+class Sink:
+    """ A destination for published packet records. Subclasses implement send,
+    which should raise an exception if the record couldn't be delivered.
+    Records are dicts with the packet's API JSON ("json") and a human-readable summary ("info"). """
+    name = "sink"
+
+    def send(self, record):
+        raise NotImplementedError
+
+    def flush(self):
+        """ Delivers anything the sink has been holding back (e.g. to batch it) """
+        pass
+
+    def close(self):
+        pass
+
+class HttpSink(Sink):
+    """ POSTs the packet JSON to an API route """
+    name = "http"
+    TIMEOUT_S = 10
+
+    def __init__(self, route):
+        self.route = route
+        self.session = requests.Session()
+
+    def send(self, record):
+        r = self.session.post(record.get("route") or self.route, json=record["json"], timeout=self.TIMEOUT_S)
+        if r.status_code != requests.codes.ok:
+            raise IOError("couldn't publish packet (%d): %s" % (r.status_code, r.text))
+
+class EmailSink(Sink):
+    """ Emails a summary of each packet through a yagmail SMTP client """
+    name = "email"
+
+    def __init__(self, yag, recipients, station_name):
+        self.yag = yag
+        self.recipients = recipients
+        self.station_name = station_name
+
+    def send(self, record):
+        logging.debug("sending email message with packet")
+        self.yag.send(to=self.recipients,
+                      subject="EQUiSat Station '%s' Received a Packet!" % self.station_name,
+                      contents="Information on packet: \n%s" % record["info"])
+
+class DigestEmailSink(Sink):
+    """ Collects packets and emails one summary of them (counts by message type, error correction
+    and RSSI stats) per window_s, or whenever flushed (e.g. at the end of a pass), instead of an email
+    per packet. Only the full dumps of the first max_dumps packets in each digest are included. """
+    name = "email-digest"
+
+    def __init__(self, yag, recipients, station_name, window_s=30*60, max_dumps=5):
+        self.yag = yag
+        self.recipients = recipients
+        self.station_name = station_name
+        self.window_s = window_s
+        self.max_dumps = max_dumps
+        self.lock = threading.Lock()
+        self.timer = None
+        self._reset()
+
+        self.digests_sent = 0
+
+    def _reset(self):
+        self.started = None
+        self.num_packets = 0
+        self.num_corrected = 0 # packets that had errors corrected
+        self.num_uncorrectable = 0
+        self.symbols_corrected = 0
+        self.message_types = Counter()
+        self.rssis = []
+        self.dumps = []
+
+    def send(self, record):
+        jsn = record["json"]
+        with self.lock:
+            if self.num_packets == 0:
+                self.started = datetime.datetime.utcnow()
+                if self.window_s is not None:
+                    # (the email is sent from the timer's thread)
+                    self.timer = threading.Timer(self.window_s, self.flush)
+                    self.timer.daemon = True
+                    self.timer.start()
+
+            self.num_packets += 1
+            # (the stats may not be known even if the packet was corrected, so they only give the symbol count)
+            rs_stats = jsn.get("error_correction_stats")
+            if not jsn.get("errors_corrected"):
+                self.num_uncorrectable += 1
+            elif rs_stats is not None and rs_stats["num_corrected"] > 0:
+                self.num_corrected += 1
+                self.symbols_corrected += rs_stats["num_corrected"]
+            try:
+                self.message_types[jsn["transmission"]["preamble"]["message_type"]] += 1
+            except (KeyError, TypeError):
+                self.message_types["[unparsed]"] += 1
+            if jsn.get("latest_packet_rssi") is not None:
+                self.rssis.append(jsn["latest_packet_rssi"])
+            if len(self.dumps) < self.max_dumps:
+                self.dumps.append(record["info"])
+
+    def flush(self):
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            if self.num_packets == 0:
+                return
+            subject = "EQUiSat Station '%s' Received %d Packet%s" % \
+                      (self.station_name, self.num_packets, "" if self.num_packets == 1 else "s")
+            contents = [self._summary()] + \
+                       ["Information on packet %d: \n%s" % (i + 1, dump) for i, dump in enumerate(self.dumps)]
+            self._reset()
+
+        logging.debug("sending email digest of packets")
+        try:
+            self.yag.send(to=self.recipients, subject=subject, contents=contents)
+            self.digests_sent += 1
+        except Exception as ex:
+            logging.error("Error sending packet email digest: %s" % ex)
+
+    def _summary(self):
+        lines = [
+            "%d packets received since %s UTC" % (self.num_packets, self.started.isoformat()),
+            "",
+            "by message type:"
+        ]
+        lines += ["    %s: %d" % (msg_type, count) for msg_type, count in self.message_types.most_common()]
+        lines += [
+            "",
+            "error correction: %d/%d packets (%.0f%%) had errors corrected (%d bytes total), %d were uncorrectable" %
+            (self.num_corrected, self.num_packets, 100.0 * self.num_corrected / self.num_packets,
+             self.symbols_corrected, self.num_uncorrectable)
+        ]
+        if len(self.rssis) > 0:
+            lines.append("packet RSSI: min %d, mean %.1f, max %d" %
+                         (min(self.rssis), float(sum(self.rssis)) / len(self.rssis), max(self.rssis)))
+        else:
+            lines.append("packet RSSI: unknown")
+        if len(self.dumps) < self.num_packets:
+            lines += ["", "(full information on the first %d packets follows)" % len(self.dumps)]
+        return "\n".join(lines)
+
+    def close(self):
+        self.flush()
+
+class FileSink(Sink):
+    """ Appends the packet JSON to a local file, one packet per line """
+    name = "file"
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.file = open(filename, "a")
+        self.lock = threading.Lock() # in case of multiple workers
+
+    def send(self, record):
+        with self.lock:
+            self.file.write(json.dumps(record["json"]) + "\n")
+            self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+class SinkWorkers:
+    """ The queue, worker threads and stats for one sink """
+    LATENCIES_KEPT = 100
+    FLUSH = object() # queued to have a worker flush the sink
+
+    def __init__(self, sink, queue_size, num_workers):
+        self.sink = sink
+        self.queue = Queue(maxsize=queue_size)
+        self.threads = []
+        for i in range(num_workers):
+            thread = threading.Thread(target=self._work, name="publish-%s-%d" % (sink.name, i))
+            thread.daemon = True
+            self.threads.append(thread)
+
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+        self.latencies = deque(maxlen=self.LATENCIES_KEPT)
+
+    def start(self):
+        for thread in self.threads:
+            thread.start()
+
+    def put(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except Full:
+            self.dropped += 1
+            logging.warning("publisher: %s queue full, dropping packet" % self.sink.name)
+
+    def _work(self):
+        while True:
+            record = self.queue.get()
+            if record is None:
+                return
+            if record is self.FLUSH:
+                self.sink.flush()
+                continue
+            start = timer()
+            try:
+                self.sink.send(record)
+                self.sent += 1
+            except Exception as ex:
+                self.failed += 1
+                logging.error("Error publishing packet to %s: %s" % (self.sink.name, ex))
+            self.latencies.append(timer() - start)
+
+    def flush(self):
+        """ Has a worker flush the sink after what's queued now """
+        try:
+            self.queue.put_nowait(self.FLUSH)
+        except Full:
+            pass # (the sink will still be flushed when it's closed)
+
+    def stop(self, timeout=None):
+        """ Lets the workers finish what's queued, then stops them """
+        for _ in self.threads:
+            try:
+                self.queue.put(None, timeout=timeout)
+            except Full:
+                break # workers are stuck; leave them (they're daemons)
+        for thread in self.threads:
+            thread.join(timeout)
+        self.sink.close()
+
+    def get_stats(self):
+        latencies = list(self.latencies)
+        return {
+            "queue_depth": self.queue.qsize(),
+            "sent": self.sent,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "latency_mean_s": sum(latencies) / len(latencies) if len(latencies) > 0 else None,
+            "latency_max_s": max(latencies) if len(latencies) > 0 else None
+        }
+
+class Publisher:
+    """ Fans published packet records out to a set of sinks, each with its own bounded queue
+    (records are dropped for that sink if it's full) and pool of worker threads """
+    def __init__(self, queue_size=256):
+        self.queue_size = queue_size
+        self.sinks = []
+        self.started = False
+
+    def add_sink(self, sink, num_workers=1):
+        workers = SinkWorkers(sink, self.queue_size, num_workers)
+        self.sinks.append(workers)
+        if self.started:
+            workers.start()
+
+    def start(self):
+        for workers in self.sinks:
+            workers.start()
+        self.started = True
+
+    def publish(self, record):
+        """ Queues the record for every sink. Never blocks. """
+        for workers in self.sinks:
+            workers.put(record)
+
+    def flush(self):
+        """ Has every sink deliver anything it's holding back, in the background """
+        for workers in self.sinks:
+            workers.flush()
+
+    def close(self, timeout=None):
+        if self.started:
+            for workers in self.sinks:
+                workers.stop(timeout)
+            self.started = False
+
+    def get_stats(self):
+        return dict((workers.sink.name, workers.get_stats()) for workers in self.sinks)
@@ -0,0 +1,235 @@
+#!/usr/bin/python
+# Throughput and latency benchmarks for the Reed Solomon backends:
+# the rsencode/rsdecode binaries (subprocess), the in-process codec library (ctypes),
+# and the NumPy implementation (single codewords and batches).
+# Writes a JSON report so results from different machines (i.e. the Pis) can be compared.
+import json
+import random
+import argparse
+import platform
+import datetime
+from timeit import default_timer as timer
+from binascii import hexlify, unhexlify
+
+import rscode
+from rscode import NPAR
+
+try:
+    import rsnumpy
+except ImportError:
+    rsnumpy = None
+
+# same as the packets we receive (minus the callsign)
+CODEWORD_LEN = 249
+MSG_LEN = CODEWORD_LEN - NPAR
+MAX_ERRORS = NPAR / 2
+ERASURE_COUNTS = [4, 8, 16, 32]
+DEFAULT_COUNT = 200
+DEFAULT_SUBPROCESS_COUNT = 50
+DEFAULT_REPORT_FNAME = "rsbench_report.json"
+
+def _subprocess_encode(msg):
+    encoded, error = rscode.subprocess_encode(hexlify(msg))
+    return unhexlify(encoded), error
+
+def _subprocess_decode(codeword, erasures):
+    # the binary doesn't take erasures
+    decoded, error = rscode.subprocess_decode(hexlify(codeword))
+    return unhexlify(decoded), error
+
+def get_backends():
+    """ Returns a dict of the available backends, from name to (encode, decode) functions,
+    where decode takes the codeword and list of erasures """
+    backends = {
+        "subprocess": (_subprocess_encode, _subprocess_decode)
+    }
+    if rscode.has_codec():
+        backends["ctypes"] = (rscode.encode_bytes,
+                              lambda codeword, erasures: rscode.decode_bytes(codeword, erasures=erasures))
+    if rsnumpy is not None:
+        backends["numpy"] = (rsnumpy.encode_bytes,
+                             lambda codeword, erasures: rsnumpy.decode_bytes(codeword, erasures=erasures))
+    return backends
+
+def random_msg(rand):
+    return bytearray(rand.getrandbits(8) for _ in range(MSG_LEN))
+
+def corrupt(codeword, num_errors, num_erasures, rand):
+    """ Returns a copy of codeword with num_errors random symbol errors and num_erasures
+    erased (zeroed) symbols, along with the list of erasure locations """
+    codeword = bytearray(codeword)
+    locs = rand.sample(range(len(codeword)), num_errors + num_erasures)
+    for loc in locs[:num_errors]:
+        codeword[loc] ^= rand.randint(1, 255)
+    erasures = locs[num_errors:]
+    for loc in erasures:
+        codeword[loc] = 0
+    return codeword, erasures
+
+def generate_scenarios():
+    """ Returns a list of (name, errors, erasures) decode scenarios """
+    scenarios = [("clean", 0, 0)]
+    for errors in range(1, MAX_ERRORS + 1):
+        scenarios.append(("errors", errors, 0))
+    for erasures in ERASURE_COUNTS:
+        scenarios.append(("erasures", 0, erasures))
+        # use up whatever correction capacity is left with errors
+        errors = (NPAR - erasures) / 2
+        if errors > 0:
+            scenarios.append(("errors+erasures", errors, erasures))
+    return scenarios
+
+def percentile(sorted_vals, pct):
+    """ Nearest-rank percentile of an already sorted list """
+    if len(sorted_vals) == 0:
+        return None
+    rank = int(round(pct / 100.0 * (len(sorted_vals) - 1)))
+    return sorted_vals[rank]
+
+def summarize(backend, operation, scenario, errors, erasures, latencies, failures):
+    latencies = sorted(latencies)
+    total = sum(latencies)
+    return {
+        "backend": backend,
+        "operation": operation,
+        "scenario": scenario,
+        "errors": errors,
+        "erasures": erasures,
+        "count": len(latencies),
+        "failures": failures,
+        "throughput_cps": len(latencies) / total if total > 0 else None,
+        "p50_ms": 1000 * percentile(latencies, 50),
+        "p99_ms": 1000 * percentile(latencies, 99)
+    }
+
+def bench_encode(name, encode, msgs):
+    latencies = []
+    failures = 0
+    for msg in msgs:
+        start = timer()
+        _, error = encode(msg)
+        latencies.append(timer() - start)
+        if error is not None:
+            failures += 1
+    return summarize(name, "encode", "clean", 0, 0, latencies, failures)
+
+def bench_decode(name, decode, cases, scenario, errors, erasures):
+    latencies = []
+    failures = 0
+    for msg, codeword, erasure_locs in cases:
+        start = timer()
+        decoded, error = decode(codeword, erasure_locs)
+        latencies.append(timer() - start)
+        if error is not None or bytearray(decoded) != msg:
+            failures += 1
+    return summarize(name, "decode", scenario, errors, erasures, latencies, failures)
+
+def bench_decode_batch(cases, scenario, errors, erasures):
+    """ Decodes all the cases in one rsnumpy batch. Latencies are per-codeword averages. """
+    codewords = [codeword for _, codeword, _ in cases]
+    erasure_lists = [erasure_locs for _, _, erasure_locs in cases]
+    start = timer()
+    decoded, batch_errors = rsnumpy.decode_batch(codewords, erasures=erasure_lists)
+    per_codeword = (timer() - start) / len(cases)
+
+    failures = 0
+    for i in range(len(cases)):
+        if batch_errors[i] is not None or bytearray(decoded[i].tobytes()) != cases[i][0]:
+            failures += 1
+    return summarize("numpy_batch", "decode", scenario, errors, erasures, [per_codeword] * len(cases), failures)
+
+def bench_decode_threads(cases, scenario, errors, erasures, num_threads):
+    """ Decodes all the cases with rscode.decode_many. Latencies are per-codeword averages. """
+    start = timer()
+    results = rscode.decode_many([codeword for _, codeword, _ in cases], num_threads=num_threads)
+    per_codeword = (timer() - start) / len(cases)
+
+    failures = 0
+    for i in range(len(cases)):
+        decoded, error = results[i]
+        if error is not None or bytearray(decoded) != cases[i][0]:
+            failures += 1
+    return summarize("ctypes_threads%d" % num_threads, "decode", scenario, errors, erasures,
+                     [per_codeword] * len(cases), failures)
+
+def run(backend_names=None, count=DEFAULT_COUNT, subprocess_count=DEFAULT_SUBPROCESS_COUNT, num_threads=4, seed=0):
+    """ Runs all benchmarks for the given backends (all available if None). Returns the report dict. """
+    rand = random.Random(seed)
+    backends = get_backends()
+    if backend_names is not None:
+        backends = dict((name, backends[name]) for name in backend_names if name in backends)
+
+    # reference encoder for generating test codewords
+    ref_encode = rscode.encode_bytes
+    results = []
+
+    msgs = [random_msg(rand) for _ in range(count)]
+    for name in sorted(backends.keys()):
+        n = subprocess_count if name == "subprocess" else count
+        results.append(bench_encode(name, backends[name][0], msgs[:n]))
+
+    for scenario, errors, erasures in generate_scenarios():
+        cases = []
+        for msg in msgs:
+            codeword, erasure_locs = corrupt(ref_encode(msg)[0], errors, erasures, rand)
+            cases.append((msg, codeword, erasure_locs))
+
+        for name in sorted(backends.keys()):
+            # the binary can't use erasures, so those scenarios would only measure failures
+            if name == "subprocess" and erasures > 0:
+                continue
+            n = subprocess_count if name == "subprocess" else count
+            results.append(bench_decode(name, backends[name][1], cases[:n], scenario, errors, erasures))
+
+        if rsnumpy is not None and (backend_names is None or "numpy_batch" in backend_names):
+            results.append(bench_decode_batch(cases, scenario, errors, erasures))
+        if rscode.has_codec() and erasures == 0 and (backend_names is None or "ctypes_threads" in backend_names):
+            results.append(bench_decode_threads(cases, scenario, errors, erasures, num_threads))
+
+    return {
+        "time": datetime.datetime.utcnow().isoformat(),
+        "platform": {
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+            "system": platform.platform(),
+            "python": platform.python_version()
+        },
+        "config": {
+            "codeword_len": CODEWORD_LEN,
+            "npar": NPAR,
+            "count": count,
+            "subprocess_count": subprocess_count,
+            "num_threads": num_threads,
+            "seed": seed
+        },
+        "results": results
+    }
+
+def print_report(report):
+    print("%-16s %-7s %-16s %4s %4s %12s %10s %10s %5s" %
+          ("backend", "op", "scenario", "err", "ers", "codewords/s", "p50 ms", "p99 ms", "fail"))
+    for res in report["results"]:
+        print("%-16s %-7s %-16s %4d %4d %12.1f %10.3f %10.3f %5d" % (
+            res["backend"], res["operation"], res["scenario"], res["errors"], res["erasures"],
+            res["throughput_cps"] or 0, res["p50_ms"], res["p99_ms"], res["failures"]))
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Reed Solomon backends")
+    parser.add_argument('--out', metavar="file", type=str, default=DEFAULT_REPORT_FNAME, help="JSON report output file")
+    parser.add_argument('--count', metavar="n", type=int, default=DEFAULT_COUNT, help="codewords per scenario")
+    parser.add_argument('--subprocess_count', metavar="n", type=int, default=DEFAULT_SUBPROCESS_COUNT,
+                        help="codewords per scenario for the (slow) subprocess backend")
+    parser.add_argument('--threads', metavar="n", type=int, default=4, help="threads for the parallel decode benchmark")
+    parser.add_argument('--backends', metavar="b", type=str, nargs="+", default=None,
+                        help="backends to run (subprocess, ctypes, ctypes_threads, numpy, numpy_batch); default all")
+    parser.add_argument('--seed', metavar="s", type=int, default=0, help="random seed")
+    args = parser.parse_args()
+
+    report = run(args.backends, args.count, args.subprocess_count, args.threads, args.seed)
+    print_report(report)
+    with open(args.out, "w") as out:
+        json.dump(report, out, indent=4)
+    print("wrote report to %s" % args.out)
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,197 @@
 #!/usr/bin/python
 import os
+import ctypes
+import logging
+import threading
 import subprocess
+from multiprocessing.pool import ThreadPool
+from binascii import hexlify, unhexlify
 
 NPAR = 32
+MAX_CODEWORD_LEN = 255
 
 EXEC_DIR = os.path.dirname(os.path.abspath(__file__))
+CODEC_LIB = "librscode.so"
 
 class ERROR:
     PROG_ERROR = "program execution error"
     INVALID_HEX = "invalid input hex string"
     TOO_CORRUPT = "packet had too many errors"
+    INVALID_LENGTH = "invalid message or codeword length"
+
+# return codes of the codec library (see rscodec.h)
+RSCODEC_OK = 0
+RSCODEC_TOO_CORRUPT = 2
+RSCODEC_INVALID_LENGTH = 3
+_RSCODEC_ERRORS = {
+    RSCODEC_TOO_CORRUPT: ERROR.TOO_CORRUPT,
+    RSCODEC_INVALID_LENGTH: ERROR.INVALID_LENGTH
+}
+
+def _load_codec():
+    """ Loads and initializes the in-process codec library (built by the Makefile alongside rsencode/rsdecode).
+    Returns None if it isn't available, in which case we fall back to running the binaries. """
+    try:
+        lib = ctypes.CDLL(os.path.join(EXEC_DIR, CODEC_LIB))
+    except OSError as e:
+        logging.warning("rscode: couldn't load %s, falling back to subprocesses (err: %s)" % (CODEC_LIB, e))
+        return None
+
+    lib.rscodec_init.argtypes = []
+    lib.rscodec_init.restype = None
+    lib.rscodec_decoder_size.argtypes = []
+    lib.rscodec_decoder_size.restype = ctypes.c_int
+    lib.rscodec_encode.argtypes = [ctypes.c_void_p, ctypes.c_int, ctypes.c_void_p]
+    lib.rscodec_encode.restype = ctypes.c_int
+    lib.rscodec_decode.argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_int, ctypes.c_int, ctypes.c_void_p]
+    lib.rscodec_decode.restype = ctypes.c_int
+    lib.rscodec_syndrome_nonzero.argtypes = [ctypes.c_void_p]
+    lib.rscodec_syndrome_nonzero.restype = ctypes.c_int
+    lib.rscodec_corrections.argtypes = [ctypes.c_void_p, ctypes.c_int, ctypes.c_void_p]
+    lib.rscodec_corrections.restype = ctypes.c_int
+
+    # only done once; the tables are shared by all later calls
+    lib.rscodec_init()
+    return lib
+
+_codec = _load_codec()
+_thread_state = threading.local()
+
+def correction_stats(syndrome_zero, error_positions):
+    """ Returns the correction statistics dict given by the decode_with_stats functions:
+    whether the syndrome was zero (i.e. the codeword was received clean), the number of corrected
+    symbols and their (sorted) byte indexes in the codeword. """
+    return {
+        "syndrome_zero": syndrome_zero,
+        "num_corrected": len(error_positions),
+        "error_positions": sorted(error_positions)
+    }
+
+def has_codec():
+    """ Returns whether the in-process codec is loaded (as opposed to using the rsencode/rsdecode binaries) """
+    return _codec is not None
+
+def _as_buffer(data, size=None):
+    """ Copies the given bytes-like data into a mutable ctypes buffer (of at least size bytes) the codec can use.
+    Returns the buffer and the length of the data. """
+    data = bytearray(data)
+    length = len(data)
+    if size is not None and size > length:
+        data.extend(b"\x00" * (size - length))
+    return (ctypes.c_ubyte * len(data)).from_buffer(data), length
+
+def encode_bytes(msg):
+    """ Encodes the given message (bytes, bytearray or memoryview) using Reed Solomon, appending NPAR parity bytes.
+    Returns the encoded message as bytes and any error. """
+    if _codec is None:
+        encoded_hex, error = subprocess_encode(hexlify(msg))
+        return (unhexlify(encoded_hex) if error is None else b""), error
+
+    buf, length = _as_buffer(msg, size=len(msg) + NPAR)
+    status = _codec.rscodec_encode(buf, length, buf)
+    if status != RSCODEC_OK:
+        return b"", _RSCODEC_ERRORS.get(status, ERROR.PROG_ERROR)
+    return bytes(bytearray(buf)), None
+
+class RSDecoder:
+    """ Owns the decoder state (syndrome, error locator/evaluator polynomials, error locations) for
+    the in-process codec, so decoding is reentrant. The codec releases the GIL while decoding, so
+    separate decoders can correct packets in parallel on different threads; a single decoder
+    must only be used by one thread at a time. """
+    def __init__(self):
+        if _codec is None:
+            raise RuntimeError("in-process codec not loaded")
+        self.state = ctypes.create_string_buffer(_codec.rscodec_decoder_size())
+
+    def decode_bytes(self, data, npar=NPAR, erasures=None):
+        """ Decodes the given codeword (bytes, bytearray or memoryview) using Reed Solomon, with npar parity bytes
+        assumed to be on the end. Optionally takes a list of known erasure locations (byte indexes into data).
+        Returns the corrected message as bytes, without parity bytes, and any error. """
+        decoded, error, _ = self.decode_with_stats(data, npar, erasures)
+        return decoded, error
+
+    def decode_with_stats(self, data, npar=NPAR, erasures=None):
+        """ Same as decode_bytes, but additionally returns the correction statistics (see correction_stats),
+        or None if the codeword couldn't be decoded (i.e. the corrections didn't give a valid codeword). """
+        buf, length = _as_buffer(data)
+        if erasures is None:
+            erasures = []
+        # the library counts erasure locations from the end of the codeword
+        erasure_buf, _ = _as_buffer([length - 1 - loc for loc in erasures if 0 <= loc < length])
+        status = _codec.rscodec_decode(self.state, buf, length, len(erasure_buf), erasure_buf)
+        if status != RSCODEC_OK:
+            return b"", _RSCODEC_ERRORS.get(status, ERROR.PROG_ERROR), None
+
+        positions = (ctypes.c_ubyte * NPAR)()
+        num_corrected = _codec.rscodec_corrections(self.state, length, positions)
+        stats = correction_stats(_codec.rscodec_syndrome_nonzero(self.state) == 0, list(positions[:num_corrected]))
+        return bytes(bytearray(buf)[:length - npar]), None, stats
+
+def _thread_decoder():
+    """ Returns the decoder for the current thread, creating it if necessary """
+    decoder = getattr(_thread_state, "decoder", None)
+    if decoder is None:
+        decoder = _thread_state.decoder = RSDecoder()
+    return decoder
+
+def decode_bytes(data, npar=NPAR, erasures=None):
+    """ Decodes the given codeword (bytes, bytearray or memoryview) using Reed Solomon, with npar parity bytes
+    assumed to be on the end. Optionally takes a list of known erasure locations (byte indexes into data).
+    Returns the corrected message as bytes, without parity bytes, and any error.
+    Safe to call from multiple threads at once. """
+    if _codec is None:
+        decoded_hex, error = subprocess_decode(hexlify(data), npar)
+        return (unhexlify(decoded_hex) if error is None else b""), error
+    return _thread_decoder().decode_bytes(data, npar, erasures)
+
+def decode_with_stats(data, npar=NPAR, erasures=None):
+    """ Same as decode_bytes, but additionally returns the correction statistics (see correction_stats),
+    or None if they aren't available (the codeword couldn't be decoded, or we're using the rsdecode binary). """
+    if _codec is None:
+        decoded, error = decode_bytes(data, npar, erasures)
+        return decoded, error, None
+    return _thread_decoder().decode_with_stats(data, npar, erasures)
+
+def decode_many(codewords, npar=NPAR, num_threads=4):
+    """ Decodes the given list of codewords (bytes-like) in parallel on a pool of num_threads threads.
+    Returns a parallel list of (message, error) tuples like decode_bytes. """
+    if num_threads <= 1 or len(codewords) <= 1:
+        return [decode_bytes(codeword, npar) for codeword in codewords]
+
+    pool = ThreadPool(min(num_threads, len(codewords)))
+    try:
+        return pool.map(lambda codeword: decode_bytes(codeword, npar), codewords)
+    finally:
+        pool.close()
 
 def encode(hex_msg):
     """ Encodes the given hex message using Reed Solomon, using the library default of 32 parity bytes. The returned message will have those bytes appended.
     Returns the encoded message in hex and any error."""
+    try:
+        msg = unhexlify(hex_msg)
+    except (TypeError, ValueError):
+        return "", ERROR.INVALID_HEX
+
+    encoded_msg, error = encode_bytes(msg)
+    if error is not None:
+        return "", error
+    return hexlify(encoded_msg), None
+
+def decode(hex_data, npar=NPAR):
+    """ Decodes the given hex data using Reed Solomon, using npar number of parity bytes assumed to be on the end. The returned message will have no parity bytes.
+    Returns the decoded message in hex and any error. """
+    try:
+        data = unhexlify(hex_data)
+    except (TypeError, ValueError):
+        return "", ERROR.INVALID_HEX
+
+    decoded_msg, error = decode_bytes(data, npar)
+    if error is not None:
+        return "", error
+    return hexlify(decoded_msg), None
+
+def subprocess_encode(hex_msg):
+    """ Same as encode, but runs the rsencode binary in a new process. """
     p1 = subprocess.Popen([EXEC_DIR + '/rsencode', str(hex_msg)], stdout=subprocess.PIPE)
     encoded_msg, err = p1.communicate()
 
@@ -26,9 +204,8 @@ def encode(hex_msg):
     else:
         return encoded_msg, None
 
-def decode(hex_data, npar=NPAR):
-    """ Decodes the given hex data using Reed Solomon, using npar number of parity bytes assumed to be on the end. The returned message will have no parity bytes.
-    Returns the decoded message in hex and any error. """
+def subprocess_decode(hex_data, npar=NPAR):
+    """ Same as decode, but runs the rsdecode binary in a new process. """
     p2 = subprocess.Popen([EXEC_DIR + '/rsdecode', str(hex_data), str(npar)],\
         stdout=subprocess.PIPE)
     decoded_msg, err = p2.communicate()
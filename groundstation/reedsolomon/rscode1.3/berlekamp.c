@@ -37,46 +37,36 @@
 
 #include "ecc.h"
 
-/* The Error Locator Polynomial, also known as Lambda or Sigma. Lambda[0] == 1 */
-static int Lambda[MAXDEG];
-
-/* The Error Evaluator Polynomial */
-static uint8_t Omega[MAXDEG];
+/* The decoder state (Lambda, Omega, error and erasure locations) used by the
+ * non-reentrant correct_errors_erasures; see rs_decoder in ecc.h */
+static rs_decoder global_decoder;
 
 /* local ANSI declarations */
 static int compute_discrepancy(int lambda[], int S[], uint8_t L, uint8_t n);
-static void init_gamma(int gamma[]);
-static void compute_modified_omega (void);
+static void init_gamma(rs_decoder *dec, int gamma[]);
+static void compute_modified_omega (rs_decoder *dec);
 static void mul_z_poly (int src[]);
 
-/* error locations found using Chien's search*/
-static uint8_t ErrorLocs[256];
-static uint8_t NErrors;
-
-/* erasure flags */
-static uint8_t ErasureLocs[256];
-static uint8_t NErasures;
-
 /* From  Cain, Clark, "Error-Correction Coding For Digital Communications", pp. 216. */
-static void Modified_Berlekamp_Massey (void)
+static void Modified_Berlekamp_Massey (rs_decoder *dec)
 {	
   int n, L, L2, k, d, i;
   int psi[MAXDEG], psi2[MAXDEG], D[MAXDEG];
   int gamma[MAXDEG];
 	
   /* initialize Gamma, the erasure locator polynomial */
-  init_gamma(gamma);
+  init_gamma(dec, gamma);
 
   /* initialize to z */
   copy_poly(D, gamma);
   mul_z_poly(D);
 	
   copy_poly(psi, gamma);	
-  k = -1; L = NErasures;
+  k = -1; L = dec->NErasures;
 	
-  for (n = NErasures; n < NPAR; n++) {
+  for (n = dec->NErasures; n < NPAR; n++) {
 	
-    d = compute_discrepancy(psi, synBytes, L, n);
+    d = compute_discrepancy(psi, dec->synBytes, L, n);
 		
     if (d != 0) {
 		
@@ -99,8 +89,8 @@ static void Modified_Berlekamp_Massey (void)
     mul_z_poly(D);
   }
 	
-  for(i = 0; i < MAXDEG; i++) Lambda[i] = psi[i];
-  compute_modified_omega();
+  for(i = 0; i < MAXDEG; i++) dec->Lambda[i] = psi[i];
+  compute_modified_omega(dec);
 
 	
 }
@@ -110,14 +100,14 @@ static void Modified_Berlekamp_Massey (void)
    Psi*S mod z^4
   */
 void
-compute_modified_omega ()
+compute_modified_omega (rs_decoder *dec)
 {
   uint8_t i;
   int product[MAXDEG*2];
 	
-  mult_polys(product, Lambda, synBytes);	
-  zero_poly_uint8(Omega);
-  for(i = 0; i < NPAR; i++) Omega[i] = product[i];
+  mult_polys(product, dec->Lambda, dec->synBytes);	
+  zero_poly_uint8(dec->Omega);
+  for(i = 0; i < NPAR; i++) dec->Omega[i] = product[i];
 
 }
 
@@ -148,7 +138,7 @@ mult_polys (int dst[], int p1[], int p2[])
 	
 /* gamma = product (1-z*a^Ij) for erasure locs Ij */
 void
-init_gamma (int gamma[])
+init_gamma (rs_decoder *dec, int gamma[])
 {
   int e, tmp[MAXDEG];
 	
@@ -156,9 +146,9 @@ init_gamma (int gamma[])
   zero_poly(tmp);
   gamma[0] = 1;
 	
-  for (e = 0; e < NErasures; e++) {
+  for (e = 0; e < dec->NErasures; e++) {
     copy_poly(tmp, gamma);
-    scale_poly(gexp[ErasureLocs[e]], tmp);
+    scale_poly(gexp[dec->ErasureLocs[e]], tmp);
     mul_z_poly(tmp);
     add_polys(gamma, tmp);
   }
@@ -219,6 +209,14 @@ void zero_poly_uint8 (uint8_t poly[])
 }
 
 
+void zero_decoder (rs_decoder *dec)
+{
+  unsigned int i;
+  unsigned char *bytes = (unsigned char *) dec;
+  for (i = 0; i < sizeof(rs_decoder); i++) bytes[i] = 0;
+}
+
+
 /* multiply by z, i.e., shift right by 1 */
 static void mul_z_poly (int src[])
 {
@@ -235,20 +233,20 @@ static void mul_z_poly (int src[])
  */
 
 
-static void Find_Roots (void)
+static void Find_Roots (rs_decoder *dec)
 {
   uint16_t sum, r, k;	
-  NErrors = 0;
+  dec->NErrors = 0;
   
   for (r = 1; r < 256; r++) {
     sum = 0;
     /* evaluate lambda at r */
     for (k = 0; k < NPAR+1; k++) {
-      sum ^= gmult(gexp[(k*r)%255], Lambda[k]);
+      sum ^= gmult(gexp[(k*r)%255], dec->Lambda[k]);
     }
     if (sum == 0) 
       { 
-	ErrorLocs[NErrors] = (255-r); NErrors++; 
+	dec->ErrorLocs[dec->NErrors] = (255-r); dec->NErrors++; 
 	//if (DEBUG) fprintf(stderr, "Root found at r = %d, (255-r) = %d\n", r, (255-r));
       }
   }
@@ -272,42 +270,56 @@ correct_errors_erasures (uint8_t codeword[],
 			 uint8_t csize,
 			 uint8_t nerasures,
 			 uint8_t erasures[])
+{
+  /* use the syndrome computed by decode_data */
+  copy_poly(global_decoder.synBytes, synBytes);
+  return correct_errors_erasures_r(&global_decoder, codeword, csize, nerasures, erasures);
+}
+
+/* Same as correct_errors_erasures, but using the given decoder state
+ * (with its syndrome already computed by decode_data_r) */
+uint8_t
+correct_errors_erasures_r (rs_decoder *dec,
+			 uint8_t codeword[], 
+			 uint8_t csize,
+			 uint8_t nerasures,
+			 uint8_t erasures[])
 {
   uint8_t r, i, j, err;
 
   /* If you want to take advantage of erasure correction, be sure to
      set NErasures and ErasureLocs[] with the locations of erasures. 
      */
-  NErasures = nerasures;
-  for (i = 0; i < NErasures; i++) ErasureLocs[i] = erasures[i];
+  dec->NErasures = nerasures;
+  for (i = 0; i < dec->NErasures; i++) dec->ErasureLocs[i] = erasures[i];
 
-  Modified_Berlekamp_Massey();
-  Find_Roots();
+  Modified_Berlekamp_Massey(dec);
+  Find_Roots(dec);
   
 
-  if ((NErrors <= NPAR) && NErrors > 0) { 
+  if ((dec->NErrors <= NPAR) && dec->NErrors > 0) { 
 
     /* first check for illegal error locs */
-    for (r = 0; r < NErrors; r++) {
-      if (ErrorLocs[r] >= csize) {
+    for (r = 0; r < dec->NErrors; r++) {
+      if (dec->ErrorLocs[r] >= csize) {
 	//if (DEBUG) fprintf(stderr, "Error loc i=%d outside of codeword length %d\n", i, csize);
 	return(0);
       }
     }
 
-    for (r = 0; r < NErrors; r++) {
+    for (r = 0; r < dec->NErrors; r++) {
       int num, denom;
-      i = ErrorLocs[r];
+      i = dec->ErrorLocs[r];
       /* evaluate Omega at alpha^(-i) */
 
       num = 0;
       for (j = 0; j < MAXDEG; j++) 
-	num ^= gmult(Omega[j], gexp[((255-i)*j)%255]);
+	num ^= gmult(dec->Omega[j], gexp[((255-i)*j)%255]);
       
       /* evaluate Lambda' (derivative) at alpha^(-i) ; all odd powers disappear */
       denom = 0;
       for (j = 1; j < MAXDEG; j += 2) {
-	denom ^= gmult(Lambda[j], gexp[((255-i)*(j-1)) % 255]);
+	denom ^= gmult(dec->Lambda[j], gexp[((255-i)*(j-1)) % 255]);
       }
       
       err = gmult(num, ginv(denom));
@@ -64,6 +64,23 @@ extern uint8_t pBytes[MAXDEG];
 /* Decoder syndrome bytes */
 extern int synBytes[MAXDEG];
 
+/* Decoder state. The routines taking one of these are reentrant (once
+ * initialize_ecc has been called), so separate decoders can be used at once
+ * from different threads; the original routines share a global one. */
+typedef struct {
+  /* syndrome bytes */
+  int synBytes[MAXDEG];
+  /* error locator (Lambda) and evaluator (Omega) polynomials */
+  int Lambda[MAXDEG];
+  uint8_t Omega[MAXDEG];
+  /* error locations found using Chien's search */
+  uint8_t ErrorLocs[256];
+  uint8_t NErrors;
+  /* erasure locations */
+  uint8_t ErasureLocs[256];
+  uint8_t NErasures;
+} rs_decoder;
+
 /* print debugging info */
 //extern uint8_t DEBUG;
 
@@ -73,6 +90,12 @@ int check_syndrome (void);
 void decode_data (unsigned char data[], int nbytes);
 void encode_data (unsigned char msg[], int nbytes, unsigned char dst[]);
 
+/* Reentrant versions of the above */
+void zero_decoder (rs_decoder *dec);
+int check_syndrome_r (rs_decoder *dec);
+void decode_data_r (rs_decoder *dec, unsigned char data[], int nbytes);
+void encode_data_r (unsigned char msg[], int nbytes, unsigned char dst[]);
+
 /* CRC-CCITT checksum generator */
 BIT16 crc_ccitt(unsigned char *msg, uint8_t len);
 
@@ -87,6 +110,7 @@ uint8_t gmult(uint8_t a, uint8_t b);
 
 /* Error location routines */
 uint8_t correct_errors_erasures (uint8_t codeword[], uint8_t csize,uint8_t nerasures, uint8_t erasures[]);
+uint8_t correct_errors_erasures_r (rs_decoder *dec, uint8_t codeword[], uint8_t csize, uint8_t nerasures, uint8_t erasures[]);
 
 /* polynomial arithmetic */
 void add_polys(int dst[], int src[]) ;
@@ -81,14 +81,14 @@ print_syndrome (void)
 }*/
 
 /* Append the parity bytes onto the end of the message */
-static void build_codeword (unsigned char msg[], int nbytes, unsigned char dst[])
+static void build_codeword (unsigned char msg[], int nbytes, unsigned char dst[], uint8_t parity[])
 {
   uint8_t i;
 	
   for (i = 0; i < nbytes; i++) dst[i] = msg[i];
 	
   for (i = 0; i < NPAR; i++) {
-    dst[i+nbytes] = pBytes[NPAR-1-i];
+    dst[i+nbytes] = parity[NPAR-1-i];
   }
 }
 	
@@ -99,8 +99,8 @@ static void build_codeword (unsigned char msg[], int nbytes, unsigned char dst[]
  * into the synBytes[] array.
  */
  
-void
-decode_data(unsigned char data[], int nbytes)
+static void
+compute_syndrome (unsigned char data[], int nbytes, int syn[])
 {
   uint8_t i, j, sum;
   for (j = 0; j < NPAR;  j++) {
@@ -108,18 +108,33 @@ decode_data(unsigned char data[], int nbytes)
     for (i = 0; i < nbytes; i++) {
       sum = data[i] ^ gmult(gexp[j+1], sum);
     }
-    synBytes[j]  = sum;
+    syn[j]  = sum;
   }
 }
 
+void
+decode_data(unsigned char data[], int nbytes)
+{
+  compute_syndrome(data, nbytes, synBytes);
+}
+
+void
+decode_data_r(rs_decoder *dec, unsigned char data[], int nbytes)
+{
+  uint8_t j;
+  compute_syndrome(data, nbytes, dec->synBytes);
+  /* the upper half is used as a polynomial when computing Omega */
+  for (j = NPAR; j < MAXDEG; j++) dec->synBytes[j] = 0;
+}
+
 
 /* Check if the syndrome is zero */
-int
-check_syndrome (void)
+static int
+syndrome_nonzero (int syn[])
 {
  uint8_t i, nz = 0;
  for (i =0 ; i < NPAR; i++) {
-  if (synBytes[i] != 0) {
+  if (syn[i] != 0) {
       nz = 1;
       break;
   }
@@ -127,6 +142,18 @@ check_syndrome (void)
  return nz;
 }
 
+int
+check_syndrome (void)
+{
+  return syndrome_nonzero(synBytes);
+}
+
+int
+check_syndrome_r (rs_decoder *dec)
+{
+  return syndrome_nonzero(dec->synBytes);
+}
+
 
 /*void
 debug_check_syndrome (void)
@@ -175,8 +202,8 @@ compute_genpoly (int nbytes, int genpoly[])
  * 
  */
 
-void
-encode_data (unsigned char msg[], int nbytes, unsigned char dst[])
+static void
+compute_parity (unsigned char msg[], int nbytes, uint8_t parity[])
 {
   uint8_t i, LFSR[NPAR+1],dbyte, j;
 	
@@ -191,7 +218,21 @@ encode_data (unsigned char msg[], int nbytes, unsigned char dst[])
   }
 
   for (i = 0; i < NPAR; i++) 
-    pBytes[i] = LFSR[i];
-	
-  build_codeword(msg, nbytes, dst);
+    parity[i] = LFSR[i];
+}
+
+void
+encode_data (unsigned char msg[], int nbytes, unsigned char dst[])
+{
+  compute_parity(msg, nbytes, pBytes);
+  build_codeword(msg, nbytes, dst, pBytes);
+}
+
+/* Same as encode_data, but doesn't touch the global pBytes[] */
+void
+encode_data_r (unsigned char msg[], int nbytes, unsigned char dst[])
+{
+  uint8_t parity[NPAR];
+  compute_parity(msg, nbytes, parity);
+  build_codeword(msg, nbytes, dst, parity);
 }
\ No newline at end of file
@@ -0,0 +1,73 @@
+#include "rscodec.h"
+
+void rscodec_init(void) {
+    initialize_ecc();
+}
+
+int rscodec_decoder_size(void) {
+    return sizeof(rs_decoder);
+}
+
+int rscodec_encode(unsigned char msg[], int nbytes, unsigned char dst[]) {
+    if (nbytes < 0 || nbytes + NPAR > 255) {
+        return RSCODEC_INVALID_LENGTH;
+    }
+    encode_data_r(msg, nbytes, dst);
+    return RSCODEC_OK;
+}
+
+int rscodec_decode(rs_decoder *dec, unsigned char codeword[], int nbytes, int nerasures, unsigned char erasures[]) {
+    if (nbytes <= NPAR || nbytes > 255 || nerasures < 0 || nerasures > NPAR) {
+        return RSCODEC_INVALID_LENGTH;
+    }
+
+    /* same sequence as rsdecode: compute syndrome, then try and correct */
+    decode_data_r(dec, codeword, nbytes);
+
+    /* fast path: a zero syndrome means a clean codeword (the full correction
+     * would find no error locations and leave it unchanged) */
+    if (nerasures == 0 && check_syndrome_r(dec) == 0) {
+        dec->NErrors = 0;
+        return RSCODEC_OK;
+    }
+
+    int corrected = correct_errors_erasures_r(dec, codeword, nbytes, nerasures, erasures);
+
+    /* correct_errors_erasures also "fails" on a codeword with no errors,
+     * so only report a failure if the syndrome says there were some */
+    if (!corrected) {
+        dec->NErrors = 0;
+        if (check_syndrome_r(dec) != 0) {
+            return RSCODEC_TOO_CORRUPT;
+        }
+        return RSCODEC_OK;
+    }
+
+    /* rscode doesn't detect miscorrections (with too many errors, it can "correct" the
+     * codeword into something that isn't a codeword at all), so make sure the result is one.
+     * (a separate decoder keeps dec's syndrome, which is that of the received codeword) */
+    if (!rscodec_is_codeword(codeword, nbytes)) {
+        dec->NErrors = 0;
+        return RSCODEC_TOO_CORRUPT;
+    }
+    return RSCODEC_OK;
+}
+
+int rscodec_is_codeword(unsigned char codeword[], int nbytes) {
+    rs_decoder check;
+    decode_data_r(&check, codeword, nbytes);
+    return check_syndrome_r(&check) == 0;
+}
+
+int rscodec_syndrome_nonzero(rs_decoder *dec) {
+    return check_syndrome_r(dec);
+}
+
+int rscodec_corrections(rs_decoder *dec, int nbytes, unsigned char positions[]) {
+    int i;
+    for (i = 0; i < dec->NErrors; i++) {
+        /* error locations are counted from the end of the codeword */
+        positions[i] = nbytes - dec->ErrorLocs[i] - 1;
+    }
+    return dec->NErrors;
+}
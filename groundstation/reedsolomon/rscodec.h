@@ -0,0 +1,65 @@
+#ifndef RSCODEC_H
+#define RSCODEC_H
+
+#include "rscode1.3/ecc.h"
+
+/**
+ * In-process interface to the rscode1.3 library, for loading as a shared library
+ * (i.e. from python via ctypes) instead of running the rsencode/rsdecode binaries.
+ * The return codes match the exit codes of the binaries where they overlap.
+ */
+#define RSCODEC_OK              0
+#define RSCODEC_TOO_CORRUPT     2
+#define RSCODEC_INVALID_LENGTH  3
+
+/**
+ * Initializes the galois tables and generator polynomial. Must be called once
+ * before any encoding or decoding.
+ */
+void rscodec_init(void);
+
+/**
+ * Returns the size of the decoder state (rs_decoder) passed to rscodec_decode,
+ * for callers that allocate it themselves.
+ * A decoder can be reused, but only by one caller at a time.
+ */
+int rscodec_decoder_size(void);
+
+/**
+ * Encodes the nbytes of msg into dst, appending NPAR parity bytes.
+ * dst must be at least nbytes + NPAR long.
+ * Returns RSCODEC_OK, or RSCODEC_INVALID_LENGTH if the codeword would be too long.
+ */
+int rscodec_encode(unsigned char msg[], int nbytes, unsigned char dst[]);
+
+/**
+ * Corrects the nbytes-long codeword in place using the given decoder state, given nerasures known
+ * erasure locations (counted from the end of the codeword, as in correct_errors_erasures).
+ * Reentrant; different decoders can be used from different threads at once.
+ * Returns immediately (without trying to correct) if the syndrome is zero.
+ * Returns RSCODEC_OK, RSCODEC_TOO_CORRUPT if the codeword had errors that
+ * couldn't be corrected (including if the "corrected" codeword still has a nonzero
+ * syndrome, i.e. it was miscorrected), or RSCODEC_INVALID_LENGTH on a bad codeword size.
+ */
+int rscodec_decode(rs_decoder *dec, unsigned char codeword[], int nbytes, int nerasures, unsigned char erasures[]);
+
+/**
+ * Returns whether the nbytes-long codeword is a valid codeword (has a zero syndrome).
+ */
+int rscodec_is_codeword(unsigned char codeword[], int nbytes);
+
+/**
+ * Returns whether the syndrome of the last codeword decoded with dec was nonzero
+ * (i.e. the codeword had errors when received).
+ */
+int rscodec_syndrome_nonzero(rs_decoder *dec);
+
+/**
+ * Copies the indexes (from the start of the codeword) of the symbols corrected by the
+ * last rscodec_decode with dec into positions, which must be at least NPAR long.
+ * Returns the number of corrected symbols (zero if the codeword couldn't be corrected).
+ * Note corrections at erasure locations are included even if the symbol was already right.
+ */
+int rscodec_corrections(rs_decoder *dec, int nbytes, unsigned char positions[]);
+
+#endif
@@ -30,18 +30,21 @@ int main (int argc, char *argv[]) {
     decode_data(codeword, codewordLength);
 
     /* check if syndrome is all zeros */
-    // if (check_syndrome() != 0) {
+    if (check_syndrome() != 0) {
         correct_errors_erasures(codeword, codewordLength, 0, NULL);
 
-        // convert back to hex for output
-        int outputLen = codewordLength - numParityBytes;
-        char codeword_hex[2*outputLen];
-        raw_to_hex_str(codeword, outputLen, codeword_hex);
-        printf("%.*s", 2*outputLen, codeword_hex);
-        return 0;
+        /* make sure it was actually corrected (rscode doesn't detect miscorrections) */
+        decode_data(codeword, codewordLength);
+        if (check_syndrome() != 0) {
+            printf("unable to correct errors\n");
+            return 2;
+        }
+    }
 
-    // } else {
-    //     printf("unable to correct errors\n");
-    //     return 2;
-    // }
+    // convert back to hex for output
+    int outputLen = codewordLength - numParityBytes;
+    char codeword_hex[2*outputLen];
+    raw_to_hex_str(codeword, outputLen, codeword_hex);
+    printf("%.*s", 2*outputLen, codeword_hex);
+    return 0;
 }
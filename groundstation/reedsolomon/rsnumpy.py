@@ -0,0 +1,287 @@
+#!/usr/bin/python
+# Pure python/NumPy implementation of the rscode1.3 Reed Solomon codec (NPAR parity bytes, GF(256)),
+# matching the C library bit-for-bit (including its behavior on uncorrectable codewords).
+# Syndromes are computed for whole batches of codewords at once, so it's suited to reprocessing
+# large archives where most codewords are clean; only those with errors go through the
+# (per-codeword) Berlekamp-Massey, Chien search and Forney stages.
+import numpy as np
+from binascii import hexlify, unhexlify
+
+import rscode
+from rscode import ERROR, NPAR
+
+MAXDEG = 2*NPAR
+PPOLY = 0x1D # x^8 + x^4 + x^3 + x^2 + 1 (high order bit implicit)
+
+def _init_galois_tables():
+    """ Builds the exponent (doubled, so sums of two logs don't need a mod) and log tables like galois.c """
+    gexp = np.zeros(512, dtype=np.int32)
+    glog = np.zeros(256, dtype=np.int32) # glog[0] is left as 0 like the C library
+    x = 1
+    for i in range(255):
+        gexp[i] = x
+        gexp[i + 255] = x
+        x <<= 1
+        if x & 0x100:
+            x ^= 0x100 | PPOLY
+    gexp[510] = gexp[0]
+    gexp[511] = gexp[1]
+    for i in range(255):
+        glog[gexp[i]] = i
+    return gexp, glog
+
+GEXP, GLOG = _init_galois_tables()
+_gexp = GEXP.tolist()
+_glog = GLOG.tolist()
+
+def gmult(a, b):
+    if a == 0 or b == 0:
+        return 0
+    return _gexp[_glog[a] + _glog[b]]
+
+def ginv(elt):
+    return _gexp[255 - _glog[elt]]
+
+def _mult_polys(p1, p2):
+    """ Multiplies two MAXDEG polynomials, giving a 2*MAXDEG one """
+    dst = [0] * (2*MAXDEG)
+    for i in range(MAXDEG):
+        if p1[i] == 0:
+            continue
+        for j in range(MAXDEG):
+            dst[i + j] ^= gmult(p2[j], p1[i])
+    return dst
+
+def _compute_genpoly(nbytes):
+    """ Multiplies (x + a^n) for n = 1 to nbytes """
+    genpoly = [0] * MAXDEG
+    genpoly[0] = 1
+    for i in range(1, nbytes + 1):
+        tp = [0] * MAXDEG
+        tp[0] = _gexp[i]
+        tp[1] = 1
+        genpoly = _mult_polys(tp, genpoly)[:MAXDEG]
+    return genpoly
+
+_genpoly = _compute_genpoly(NPAR)
+
+# exponents of alpha for evaluating Lambda at every alpha^r in the Chien search (indexed [k][r-1])
+_CHIEN_EXPS = (np.arange(NPAR + 1).reshape(-1, 1) * np.arange(1, 256).reshape(1, -1)) % 255
+
+def encode_bytes(msg):
+    """ Encodes the given message using Reed Solomon, appending NPAR parity bytes.
+    Returns the encoded message as bytes and any error. """
+    msg = bytearray(msg)
+    if len(msg) + NPAR > rscode.MAX_CODEWORD_LEN:
+        return b"", ERROR.INVALID_LENGTH
+
+    lfsr = [0] * (NPAR + 1)
+    for byte in msg:
+        dbyte = byte ^ lfsr[NPAR - 1]
+        for j in range(NPAR - 1, 0, -1):
+            lfsr[j] = lfsr[j - 1] ^ gmult(_genpoly[j], dbyte)
+        lfsr[0] = gmult(_genpoly[0], dbyte)
+
+    return bytes(msg + bytearray(reversed(lfsr[:NPAR]))), None
+
+def compute_syndromes(codewords):
+    """ Computes the NPAR syndrome bytes of every row of an (N, n) uint8 array of codewords at once.
+    Returns an (N, NPAR) int array. """
+    codewords = np.asarray(codewords, dtype=np.uint8)
+    nbytes = codewords.shape[1]
+    logs = GLOG[codewords]
+    nonzero = codewords != 0
+    # S_j = sum_i data[i] * a^((j+1)*(n-1-i)); i.e. the codeword evaluated at a^(j+1)
+    powers = np.arange(nbytes - 1, -1, -1)
+    syndromes = np.empty((codewords.shape[0], NPAR), dtype=np.int32)
+    for j in range(NPAR):
+        terms = np.where(nonzero, GEXP[logs + ((j + 1) * powers) % 255], 0)
+        syndromes[:, j] = np.bitwise_xor.reduce(terms, axis=1)
+    return syndromes
+
+def _init_gamma(erasure_locs):
+    """ gamma = product (1-z*a^Ij) for erasure locs Ij """
+    gamma = [0] * MAXDEG
+    gamma[0] = 1
+    for loc in erasure_locs:
+        scale = _gexp[loc]
+        tmp = [0] + [gmult(scale, c) for c in gamma[:MAXDEG - 1]]
+        gamma = [g ^ t for g, t in zip(gamma, tmp)]
+    return gamma
+
+def _modified_berlekamp_massey(syn, erasure_locs):
+    """ Computes the error locator (Lambda) and evaluator (Omega) polynomials from the syndrome """
+    nerasures = len(erasure_locs)
+    gamma = _init_gamma(erasure_locs)
+
+    D = [0] + gamma[:MAXDEG - 1]
+    psi = list(gamma)
+    k = -1
+    L = nerasures
+
+    for n in range(nerasures, NPAR):
+        d = 0
+        for i in range(L + 1):
+            d ^= gmult(psi[i], syn[n - i])
+
+        if d != 0:
+            psi2 = [p ^ gmult(d, dc) for p, dc in zip(psi, D)]
+            if L < n - k:
+                L2 = n - k
+                k = n - L
+                d_inv = ginv(d)
+                D = [gmult(p, d_inv) for p in psi]
+                L = L2
+            psi = psi2
+
+        D = [0] + D[:MAXDEG - 1]
+
+    omega = _mult_polys(psi, syn + [0] * (MAXDEG - NPAR))[:NPAR] + [0] * (MAXDEG - NPAR)
+    return psi, omega
+
+def _find_roots(lam):
+    """ Chien search: returns the error locations (from the end of the codeword) where Lambda has roots """
+    coeffs = np.array(lam[:NPAR + 1], dtype=np.int32)
+    terms = np.where((coeffs != 0).reshape(-1, 1), GEXP[GLOG[coeffs].reshape(-1, 1) + _CHIEN_EXPS], 0)
+    sums = np.bitwise_xor.reduce(terms, axis=0)
+    return [255 - r for r in (np.nonzero(sums == 0)[0] + 1).tolist()]
+
+def _correct_errors_erasures(codeword, syn, erasure_locs):
+    """ Corrects the given bytearray codeword in place given its syndrome.
+    Returns the corrected byte indexes, or None if the correction couldn't be performed
+    (like correct_errors_erasures) or didn't give a valid codeword (like rscodec_decode). """
+    lam, omega = _modified_berlekamp_massey(syn, erasure_locs)
+    error_locs = _find_roots(lam)
+    csize = len(codeword)
+
+    if not (0 < len(error_locs) <= NPAR):
+        return None
+    for loc in error_locs:
+        if loc >= csize:
+            return None
+
+    for loc in error_locs:
+        num = 0
+        for j in range(MAXDEG):
+            num ^= gmult(omega[j], _gexp[((255 - loc) * j) % 255])
+        denom = 0
+        for j in range(1, MAXDEG, 2):
+            denom ^= gmult(lam[j], _gexp[((255 - loc) * (j - 1)) % 255])
+        codeword[csize - loc - 1] ^= gmult(num, ginv(denom))
+
+    # the library doesn't detect miscorrections (into something that isn't a codeword), so we check
+    if compute_syndromes(np.frombuffer(bytes(codeword), dtype=np.uint8).reshape(1, -1)).any():
+        return None
+    return [csize - loc - 1 for loc in error_locs]
+
+def _decode_row(codeword, syn, erasures):
+    """ Corrects a single bytearray codeword with a nonzero syndrome.
+    Returns any error and the corrected byte indexes. """
+    csize = len(codeword)
+    erasure_locs = [csize - 1 - idx for idx in erasures if 0 <= idx < csize]
+    if len(erasure_locs) > NPAR:
+        return ERROR.INVALID_LENGTH, []
+    positions = _correct_errors_erasures(codeword, syn, erasure_locs)
+    if positions is None:
+        return ERROR.TOO_CORRUPT, []
+    return None, positions
+
+def decode_batch(codewords, npar=NPAR, erasures=None, return_stats=False):
+    """ Decodes an (N, n) uint8 array (or list of equal-length bytes) of codewords, with npar parity bytes
+    assumed to be on the end of each. Optionally takes a parallel list of erasure location lists.
+    Returns an (N, n-npar) uint8 array of decoded messages and a parallel list of errors (None if successful).
+    If return_stats is set, also returns a parallel list of correction statistics (see rscode.correction_stats),
+    with None for the codewords that couldn't be decoded. Messages that couldn't be corrected are left as received. """
+    if not isinstance(codewords, np.ndarray):
+        codewords = np.array([bytearray(cw) for cw in codewords], dtype=np.uint8)
+    codewords = np.array(codewords, dtype=np.uint8, ndmin=2) # copy, as we correct in place
+    num, nbytes = codewords.shape
+    if not (NPAR < nbytes <= rscode.MAX_CODEWORD_LEN):
+        if return_stats:
+            return codewords[:, :0], [ERROR.INVALID_LENGTH] * num, [None] * num
+        return codewords[:, :0], [ERROR.INVALID_LENGTH] * num
+
+    errors = [None] * num
+    syndromes = compute_syndromes(codewords)
+    syndrome_zero = np.logical_not(syndromes.any(axis=1)).tolist()
+    stats = [rscode.correction_stats(zero, []) for zero in syndrome_zero]
+    # only codewords with errors (or given erasures) need the full decode
+    to_correct = np.nonzero(syndromes.any(axis=1))[0].tolist()
+    if erasures is not None:
+        to_correct = sorted(set(to_correct) | set(i for i in range(num) if len(erasures[i]) > 0))
+
+    for i in to_correct:
+        codeword = bytearray(codewords[i].tobytes())
+        error, positions = _decode_row(codeword, syndromes[i].tolist(), erasures[i] if erasures is not None else [])
+        # like the library, failing to correct is only an error if there was something to correct
+        if error == ERROR.TOO_CORRUPT and syndrome_zero[i]:
+            error = None
+        if error is None:
+            codewords[i] = np.frombuffer(bytes(codeword), dtype=np.uint8)
+        errors[i] = error
+        stats[i] = rscode.correction_stats(syndrome_zero[i], positions) if error is None else None
+
+    if return_stats:
+        return codewords[:, :nbytes - npar], errors, stats
+    return codewords[:, :nbytes - npar], errors
+
+def decode_bytes(data, npar=NPAR, erasures=None):
+    """ Same interface as rscode.decode_bytes """
+    decoded, error, _ = decode_with_stats(data, npar, erasures)
+    return decoded, error
+
+def decode_with_stats(data, npar=NPAR, erasures=None):
+    """ Same interface as rscode.decode_with_stats """
+    decoded, errors, stats = decode_batch([data], npar, erasures=[erasures] if erasures is not None else None,
+                                          return_stats=True)
+    if errors[0] is not None:
+        return b"", errors[0], stats[0]
+    return decoded[0].tobytes(), None, stats[0]
+
+def encode(hex_msg):
+    """ Same interface as rscode.encode """
+    try:
+        msg = unhexlify(hex_msg)
+    except (TypeError, ValueError):
+        return "", ERROR.INVALID_HEX
+
+    encoded_msg, error = encode_bytes(msg)
+    if error is not None:
+        return "", error
+    return hexlify(encoded_msg), None
+
+def decode(hex_data, npar=NPAR):
+    """ Same interface as rscode.decode """
+    try:
+        data = unhexlify(hex_data)
+    except (TypeError, ValueError):
+        return "", ERROR.INVALID_HEX
+
+    decoded_msg, error = decode_bytes(data, npar)
+    if error is not None:
+        return "", error
+    return hexlify(decoded_msg), None
+
+def decode_hex_batch(hex_codewords, npar=NPAR):
+    """ Decodes a list of equal-length hex codewords in one batch.
+    Returns parallel lists of decoded hex messages (empty on error) and errors. """
+    codewords = []
+    hex_errors = []
+    for hex_codeword in hex_codewords:
+        try:
+            codewords.append(bytearray(unhexlify(hex_codeword)))
+            hex_errors.append(None)
+        except (TypeError, ValueError):
+            codewords.append(None)
+            hex_errors.append(ERROR.INVALID_HEX)
+
+    valid = [i for i in range(len(codewords)) if codewords[i] is not None]
+    decoded_hex = [""] * len(codewords)
+    errors = list(hex_errors)
+    if len(valid) > 0:
+        decoded, batch_errors = decode_batch([codewords[i] for i in valid], npar)
+        for row, i in enumerate(valid):
+            errors[i] = batch_errors[row]
+            if errors[i] is None:
+                decoded_hex[i] = hexlify(decoded[row].tobytes())
+    return decoded_hex, errors
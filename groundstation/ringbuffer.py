@@ -0,0 +1,59 @@
+#!/usr/bin/python
+# Fixed-capacity byte buffer for holding recent RX data
+from binascii import hexlify
+
+class RingBuffer:
+    """ A fixed-capacity byte buffer that keeps the most recently written data, overwriting the oldest.
+    Storage is allocated once; writes only copy the new data in (existing contents are never shifted),
+    and contents can be read through memoryviews without copying. """
+    def __init__(self, capacity):
+        assert capacity > 0
+        self.capacity = capacity
+        self.buf = bytearray(capacity)
+        self.view = memoryview(self.buf)
+        self.start = 0 # index of the oldest byte
+        self.size = 0
+        self.total_written = 0
+
+    def write(self, data):
+        """ Appends the given bytes-like data, dropping the oldest data if the buffer is full """
+        data = memoryview(data)
+        n = len(data)
+        self.total_written += n
+        if n >= self.capacity:
+            # only the end of the data fits
+            self.view[:] = data[n - self.capacity:]
+            self.start = 0
+            self.size = self.capacity
+            return
+
+        end = (self.start + self.size) % self.capacity
+        first = min(n, self.capacity - end) # amount before we wrap around
+        self.view[end:end + first] = data[:first]
+        self.view[:n - first] = data[first:]
+
+        overflow = max(0, self.size + n - self.capacity)
+        self.start = (self.start + overflow) % self.capacity
+        self.size = min(self.capacity, self.size + n)
+
+    def views(self):
+        """ Returns a list of (at most two) memoryviews covering the contents, oldest first.
+        These are only valid until the next write. """
+        end = self.start + self.size
+        if end <= self.capacity:
+            return [self.view[self.start:end]]
+        return [self.view[self.start:], self.view[:end - self.capacity]]
+
+    def tobytes(self):
+        """ Returns a copy of the contents, oldest first """
+        return b"".join(view.tobytes() for view in self.views())
+
+    def tohex(self):
+        return hexlify(self.tobytes())
+
+    def clear(self):
+        self.start = 0
+        self.size = 0
+
+    def __len__(self):
+        return self.size
@@ -0,0 +1,128 @@
+#!/usr/bin/python
+# Multi-threaded runtime for the groundstation, so slow steps (publishing, radio commands, TLE updates)
+# don't hold up receiving data. Each stage of EQUiStation.mainloop runs on its own thread:
+#   serial reader -> (rx queue) -> framer/decoder -> (publish queue) -> publisher
+# with the scheduler (doppler corrections, etc.) and uplink sender alongside. All serial port access goes through one lock.
+import logging
+import threading
+from Queue import Queue, Empty
+
+class StationRuntime:
+    """ Runs an EQUiStation's main loop as separate threads connected by queues,
+    reusing the station's methods for each stage. """
+    READ_TIMEOUT_S = 1.0 # longest for the reader to wait on the serial port (also bounds how quickly we stop)
+    QUEUE_TIMEOUT_S = 1.0
+    ERROR_RETRY_DELAY_S = 1.0
+    RX_QUEUE_SIZE = 1024 # chunks of serial data
+    PUBLISH_QUEUE_SIZE = 256 # decoded packets
+
+    def __init__(self, station):
+        self.station = station
+        self.serial_lock = threading.RLock()
+        self.rx_queue = Queue(maxsize=self.RX_QUEUE_SIZE)
+        self.publish_queue = Queue(maxsize=self.PUBLISH_QUEUE_SIZE)
+        self.packet_received = threading.Event() # for the uplink sender
+        self.stopped = threading.Event()
+        self.threads = []
+        self.errors = 0
+
+    def run(self, radio_preconfig=False):
+        """ Sets up the station, starts all the threads and blocks until interrupted """
+        self.station.runtime = self
+        with self.serial_lock:
+            self.station.pre_init(radio_preconfig)
+
+        self.start()
+        try:
+            while not self.stopped.is_set():
+                self.stopped.wait(self.QUEUE_TIMEOUT_S)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def start(self):
+        for name, step in [("serial-reader", self.read_serial),
+                           ("framer-decoder", self.decode_rx_data),
+                           ("scheduler", self.run_scheduled),
+                           ("uplink-sender", self.send_uplinks),
+                           ("publisher", self.publish_packets)]:
+            thread = threading.Thread(target=self._run_worker, args=(step,), name=name)
+            thread.daemon = True
+            thread.start()
+            self.threads.append(thread)
+
+    def stop(self, timeout=5.0):
+        self.stopped.set()
+        self.station.scheduler.wake()
+        for thread in self.threads:
+            thread.join(timeout)
+        self.threads = []
+
+    def _run_worker(self, step):
+        """ Repeatedly runs the given step until stopped, logging (and then carrying on after) any errors """
+        while not self.stopped.is_set():
+            try:
+                step()
+            except Exception:
+                self.errors += 1
+                logging.exception("runtime: error in %s" % threading.current_thread().name)
+                self.stopped.wait(self.ERROR_RETRY_DELAY_S)
+
+    ##################################################################
+    # Stages
+    ##################################################################
+    def read_serial(self):
+        """ Waits for serial data and hands whatever is waiting to the framer/decoder """
+        self.station.wait_for_data(timeout=self.READ_TIMEOUT_S)
+        wakeup_time = self.station.last_wakeup
+        # (another thread may be using the port for radio commands, in which case it will have read the data)
+        with self.serial_lock:
+            inwaiting = self.station.ser.in_waiting
+            in_data = self.station.ser.read(size=inwaiting) if inwaiting > 0 else ""
+        if len(in_data) > 0:
+            self.rx_queue.put((in_data, wakeup_time))
+
+    def decode_rx_data(self):
+        """ Frames packets in received data, then decodes them and queues them to be published """
+        try:
+            in_data, wakeup_time = self.rx_queue.get(timeout=self.QUEUE_TIMEOUT_S)
+            if self.station.handle_rx_data(in_data, wakeup_time):
+                self.packet_received.set()
+        except Empty:
+            pass
+
+        # (this also picks up packets found in uplink/radio command responses)
+        for record in self.station.decode_received_packets():
+            self.publish_queue.put(record)
+
+    def run_scheduled(self):
+        """ Runs any due scheduled events (doppler corrections/pass updates, packet scans),
+        then sleeps until the next one (or the schedule changes) """
+        with self.serial_lock:
+            self.station.scheduler.run_due()
+        self.station.scheduler.wait(self.station.time_to_next_event())
+
+    def send_uplinks(self):
+        """ Sends queued uplink commands after we receive packets (or continually if set to) """
+        immediate = self.station.only_send_tx_cmd
+        got_packet = self.packet_received.wait(self.station.POLL_INTERVAL_S if immediate else self.READ_TIMEOUT_S)
+        self.packet_received.clear()
+        if got_packet or self.station.only_send_tx_cmd:
+            with self.serial_lock:
+                self.station.transmit()
+
+    def publish_packets(self):
+        try:
+            record = self.publish_queue.get(timeout=self.QUEUE_TIMEOUT_S)
+        except Empty:
+            return
+        self.station.publish_packet(**record)
+
+    def get_stats(self):
+        return {
+            "threads_alive": sum(1 for thread in self.threads if thread.is_alive()),
+            "rx_queue_depth": self.rx_queue.qsize(),
+            "publish_queue_depth": self.publish_queue.qsize(),
+            "errors": self.errors
+        }
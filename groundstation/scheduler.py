@@ -0,0 +1,141 @@
+#!/usr/bin/python
+# Central scheduler for the station's time-based actions (doppler corrections, pass updates, packet scans),
+# so the main loop can sleep until exactly when the next one is due.
+import heapq
+import logging
+import datetime
+import threading
+from collections import deque
+
+class Event:
+    """ An action scheduled to run at deadline (a UTC datetime). Events due at the same time
+    run in order of priority (lower first). """
+    def __init__(self, deadline, priority, seq, name, callback):
+        self.deadline = deadline
+        self.priority = priority
+        self.seq = seq
+        self.name = name
+        self.callback = callback
+        self.cancelled = False
+
+    def __repr__(self):
+        return "Event(%s at %s, priority %d)" % (self.name, self.deadline.isoformat(), self.priority)
+
+class Scheduler:
+    """ A heap of named events. Scheduling an event replaces any pending one with the same name,
+    so each kind of action is only ever scheduled once. Records how late each event runs.
+    Safe to use from multiple threads (callbacks are run without holding the scheduler's lock). """
+    LATENESS_KEPT = 100 # per event name
+
+    def __init__(self):
+        self.heap = []
+        self.events = {} # name -> pending event
+        self.seq = 0 # keeps the heap order stable for events with the same deadline and priority
+        self.lock = threading.Lock()
+        self.changed = threading.Event() # set whenever the schedule changes, to wake waiters
+
+        # stats
+        self.runs = {}
+        self.lateness = {}
+
+    def schedule(self, deadline, callback, name, priority=0):
+        """ Schedules callback to be run (with no arguments) at the UTC datetime deadline,
+        replacing any pending event with the same name. Returns the event. """
+        with self.lock:
+            if name in self.events:
+                self.events[name].cancelled = True
+            self.seq += 1
+            event = Event(deadline, priority, self.seq, name, callback)
+            heapq.heappush(self.heap, (deadline, priority, event.seq, event))
+            self.events[name] = event
+        self.changed.set()
+        return event
+
+    def cancel(self, name):
+        """ Cancels the pending event with the given name, if any """
+        with self.lock:
+            event = self.events.pop(name, None)
+            if event is not None:
+                event.cancelled = True
+        self.changed.set()
+
+    def get(self, name):
+        """ Returns the pending event with the given name, or None """
+        with self.lock:
+            return self.events.get(name)
+
+    def next_deadline(self):
+        """ Returns the deadline of the next pending event, or None if there are none """
+        with self.lock:
+            self._drop_cancelled()
+            return self.heap[0][0] if len(self.heap) > 0 else None
+
+    def time_until_next(self, now=None):
+        """ Returns the number of seconds until the next event is due (negative if overdue),
+        or None if nothing is scheduled """
+        deadline = self.next_deadline()
+        if deadline is None:
+            return None
+        if now is None:
+            now = datetime.datetime.utcnow()
+        return (deadline - now).total_seconds()
+
+    def run_due(self, now=None):
+        """ Runs all events due by now (in deadline, then priority, order), returning how many were run.
+        Events scheduled by the callbacks are left for the next call, even if already due. """
+        if now is None:
+            now = datetime.datetime.utcnow()
+        run = 0
+        with self.lock:
+            last_seq = self.seq # (events with later seqs were scheduled during this call)
+        deferred = []
+        while True:
+            with self.lock:
+                self._drop_cancelled()
+                if len(self.heap) == 0 or self.heap[0][0] > now:
+                    break
+                entry = heapq.heappop(self.heap)
+                event = entry[3]
+                if event.seq > last_seq:
+                    deferred.append(entry)
+                    continue
+                del self.events[event.name]
+
+            lateness = (datetime.datetime.utcnow() - event.deadline).total_seconds()
+            self.runs[event.name] = self.runs.get(event.name, 0) + 1
+            self.lateness.setdefault(event.name, deque(maxlen=self.LATENESS_KEPT)).append(lateness)
+            logging.debug("running scheduled %s (%.3fs late)" % (event.name, lateness))
+            event.callback()
+            run += 1
+
+        with self.lock:
+            for entry in deferred:
+                heapq.heappush(self.heap, entry)
+        return run
+
+    def wait(self, timeout):
+        """ Blocks for up to timeout seconds, returning early if the schedule changes (or wake is called) """
+        self.changed.wait(timeout)
+        self.changed.clear()
+
+    def wake(self):
+        self.changed.set()
+
+    def _drop_cancelled(self):
+        while len(self.heap) > 0 and self.heap[0][3].cancelled:
+            heapq.heappop(self.heap)
+
+    def get_stats(self):
+        """ Returns the pending events, and how many times each kind of event has run and how late """
+        with self.lock:
+            pending = sorted(self.events.values(), key=lambda event: (event.deadline, event.priority))
+        stats = {"pending": [(event.name, event.deadline.isoformat()) for event in pending]}
+        for name, lateness in self.lateness.items():
+            lateness = list(lateness)
+            stats[name] = {
+                "runs": self.runs[name],
+                "lateness_last_s": lateness[-1],
+                "lateness_mean_s": sum(lateness) / len(lateness),
+                "lateness_max_s": max(lateness)
+            }
+        return stats
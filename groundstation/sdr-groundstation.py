@@ -7,6 +7,9 @@ import subprocess
 import time
 
 from groundstation import config, tracking, EQUiStation
+from pass_schedule import PassSchedule
+import multi_tracker
+from tle_refresh import TleRefresher
 import station_config as station
 import utils
 
@@ -19,6 +22,7 @@ LINEARITY_GAIN = 5
 SAMPLE_RATE = 2.5*1e6
 AIRSPY_CMD_PREFIX = "/usr/local/bin/airspy_rx -f 435.55 -l %d -g %d -a %d" % (LNA_GAIN, LINEARITY_GAIN, SAMPLE_RATE)
 FILE_TIME_FORMAT = "%m.%d.%y_%H:%M"
+SCHEDULE_FILENAME = "sdr_pass_schedule.json"
 
 def get_airspy_cmd(filename):
     return AIRSPY_CMD_PREFIX + " -r %s" % filename
@@ -28,14 +32,9 @@ def generate_airspy_filename(pass_data, increment):
     deg_pass = pass_data["max_alt"]
     return "%s/sdr_dump_%s_%ddeg%s.wav" % (station.sdr_dump_dir, start_date, deg_pass, increment if increment > 0 else "")
 
-def get_next_pass(tracker):
-    # update the TLE cache (every pass, we might as well)
-    success = tracker.update_tle()
-    if not success:
-        logging.error("error updating TLE data to latest")
-
-    # compute next pass geometrically
-    next_pass_data = tracker.get_next_pass()
+def get_next_pass(schedule):
+    # look up the next pass in the precomputed schedule
+    next_pass_data, _ = schedule.get_next_pass()
 
     # on fails, our best bet is probably to use the old pass as it won't change a ton
     if next_pass_data is None:
@@ -79,7 +78,14 @@ def wait_until(date):
         time.sleep(1)
 
 def main():
-    tracker = tracking.SatTracker(config.SAT_CATALOG_NUMBER)
+    tracker = multi_tracker.from_config(tracking.SatTracker(config.SAT_CATALOG_NUMBER))
+    schedule = PassSchedule(tracker, SCHEDULE_FILENAME, days=config.PASS_SCHEDULE_DAYS,
+                            refresh_interval_s=config.PASS_SCHEDULE_REFRESH_S)
+    schedule.start()
+    # (keep the TLEs up to date in the background, without holding up passes)
+    TleRefresher(tracker.get_trackers(), interval_s=config.TLE_REFRESH_INTERVAL_S,
+                 min_backoff_s=config.TLE_REFRESH_MIN_BACKOFF_S,
+                 max_backoff_s=config.TLE_REFRESH_MAX_BACKOFF_S).start()
 
     # config logging
     logging.basicConfig(
@@ -96,7 +102,7 @@ def main():
         raise ValueError("invalid station config")
 
     while True:
-        pass_data, success = get_next_pass(tracker)
+        pass_data, success = get_next_pass(schedule)
         if USE_FAKE:
             success = True
             pass_data = EQUiStation.generate_fake_pass(40)
@@ -0,0 +1,236 @@
+#!/usr/bin/python
+# Durable spool of packets waiting to be uploaded to the API, so none are lost
+# when the station's internet connection (or the station itself) goes down.
+import json
+import time
+import uuid
+import random
+import logging
+import sqlite3
+import threading
+import requests
+
+from publisher import Sink
+
+class STATUS:
+    PENDING = "pending"
+    ACKED = "acked" # accepted by the API
+    REJECTED = "rejected" # refused by the API in a way retrying won't fix
+    FAILED = "failed" # failed max_attempts times, so given up on (kept for inspection until purged)
+
+class PacketSpool:
+    """ A crash-safe queue of outgoing packet JSON in a SQLite database (in WAL mode).
+    Each packet gets a unique upload_id (included in what's uploaded, to tell retries of it apart from repeats
+    the satellite sent) and is kept pending until acknowledged, or until max_attempts uploads of it have failed.
+    Packets that failed are put behind the ones that haven't, so one bad packet can't hold up the rest.
+    Safe to use from multiple threads. """
+    def __init__(self, filename, max_attempts=50):
+        self.filename = filename
+        self.max_attempts = max_attempts
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(filename, check_same_thread=False)
+        with self.lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL") # (durable across app crashes; WAL keeps the DB consistent)
+            self.conn.execute("""CREATE TABLE IF NOT EXISTS packets (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                upload_id TEXT UNIQUE NOT NULL,
+                route TEXT,
+                body TEXT NOT NULL,
+                created REAL NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                finished REAL)""")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS packets_status ON packets (status, id)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS packets_pending ON packets (status, attempts, id)")
+
+    def put(self, body, route=None):
+        """ Adds the given JSON-able packet body to the spool, returning its upload_id """
+        upload_id = uuid.uuid4().hex
+        with self.lock, self.conn:
+            self.conn.execute("INSERT INTO packets (upload_id, route, body, created, status) VALUES (?, ?, ?, ?, ?)",
+                              (upload_id, route, json.dumps(body), time.time(), STATUS.PENDING))
+        return upload_id
+
+    def pending(self, limit):
+        """ Returns up to limit of the pending packets with the fewest failed attempts (then the oldest)
+        as (id, upload_id, route, body) tuples """
+        with self.lock:
+            rows = self.conn.execute("SELECT id, upload_id, route, body FROM packets WHERE status = ? "
+                                     "ORDER BY attempts, id LIMIT ?", (STATUS.PENDING, limit)).fetchall()
+        return [(row[0], row[1], row[2], json.loads(row[3])) for row in rows]
+
+    def finish(self, ids, status, error=None):
+        """ Marks the given pending packets as acked or rejected. Packets are only ever finished once. """
+        with self.lock, self.conn:
+            self.conn.executemany("UPDATE packets SET status = ?, last_error = ?, finished = ? WHERE id = ? AND status = ?",
+                                  [(status, error, time.time(), id, STATUS.PENDING) for id in ids])
+
+    def record_failure(self, ids, error, count_attempt=True):
+        """ Notes a failed (but retryable) upload attempt of the given packets, giving up on those that have now
+        failed max_attempts times. Failures that aren't the packets' fault (e.g. no connection) shouldn't be counted. """
+        with self.lock, self.conn:
+            if not count_attempt:
+                self.conn.executemany("UPDATE packets SET last_error = ? WHERE id = ?", [(error, id) for id in ids])
+                return
+            self.conn.executemany("UPDATE packets SET attempts = attempts + 1, last_error = ? WHERE id = ?",
+                                  [(error, id) for id in ids])
+            failed = self.conn.executemany("UPDATE packets SET status = ?, finished = ? "
+                                           "WHERE id = ? AND status = ? AND attempts >= ?",
+                                           [(STATUS.FAILED, time.time(), id, STATUS.PENDING, self.max_attempts)
+                                            for id in ids]).rowcount
+        if failed > 0:
+            logging.error("spool: giving up on %d packets after %d failed uploads: %s" % (failed, self.max_attempts, error))
+
+    def purge(self, older_than_s):
+        """ Deletes packets finished more than older_than_s ago """
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM packets WHERE status != ? AND finished < ?",
+                              (STATUS.PENDING, time.time() - older_than_s))
+
+    def counts(self):
+        """ Returns the number of packets with each status """
+        with self.lock:
+            rows = self.conn.execute("SELECT status, COUNT(*) FROM packets GROUP BY status").fetchall()
+        return dict(rows)
+
+class SpoolSink(Sink):
+    """ Publisher sink that just adds packets to the spool, for the uploader to send """
+    name = "spool"
+
+    def __init__(self, spool, uploader=None):
+        self.spool = spool
+        self.uploader = uploader
+
+    def send(self, record):
+        self.spool.put(record["json"], record.get("route"))
+        if self.uploader is not None:
+            self.uploader.wake()
+
+class SpoolUploader(threading.Thread):
+    """ Drains the spool to the API over a keep-alive session, oldest packets first.
+    If batch_route is given, up to batch_size packets are POSTed to it at a time as a JSON list
+    (and if the API refuses a batch, its packets are retried one at a time, so only the bad ones are rejected);
+    otherwise each is POSTed to its route (or the default route) separately.
+    Failed uploads are retried with exponential backoff (with jitter), except those the API
+    refuses as malformed (REJECTED_STATUS_CODES), which are marked rejected. Any 2xx response is an ack.
+    Delivery is at least once: the API doesn't drop repeated upload_ids, so a packet whose upload
+    succeeded without us getting the response is uploaded again.
+    Finished packets are purged from the spool retention_s after they finish (checked every purge_interval_s). """
+    TIMEOUT_S = 10
+    # (anything else, e.g. auth errors or rate limiting, may go away, so it's retried)
+    REJECTED_STATUS_CODES = [400, 422]
+
+    def __init__(self, spool, route, batch_route=None, batch_size=20, poll_interval_s=30,
+                 min_backoff_s=1, max_backoff_s=5*60, retention_s=7*24*60*60, purge_interval_s=60*60):
+        threading.Thread.__init__(self, name="spool-uploader")
+        self.daemon = True
+        self.spool = spool
+        self.route = route
+        self.batch_route = batch_route
+        self.batch_size = batch_size
+        self.poll_interval_s = poll_interval_s
+        self.min_backoff_s = min_backoff_s
+        self.max_backoff_s = max_backoff_s
+        self.retention_s = retention_s
+        self.purge_interval_s = purge_interval_s
+        self.last_purge = None
+        self.session = requests.Session()
+        self.wakeup = threading.Event()
+        self.stopped = threading.Event()
+        self.backoff_s = 0
+
+        # stats
+        self.uploaded = 0
+        self.rejected = 0
+        self.failed_attempts = 0
+        self.requests = 0
+        self.last_error = None
+
+    def wake(self):
+        """ Lets the uploader know there are new packets """
+        self.wakeup.set()
+
+    def stop(self, timeout=None):
+        self.stopped.set()
+        self.wakeup.set()
+        self.join(timeout)
+
+    def run(self):
+        while not self.stopped.is_set():
+            self.wakeup.clear()
+            if self.last_purge is None or time.time() - self.last_purge >= self.purge_interval_s:
+                self.spool.purge(self.retention_s)
+                self.last_purge = time.time()
+            rows = self.spool.pending(self.batch_size)
+            if len(rows) == 0:
+                self.wakeup.wait(self.poll_interval_s)
+                continue
+
+            try:
+                self.upload(rows)
+                self.backoff_s = 0
+            except Exception as ex:
+                self.failed_attempts += 1
+                self.last_error = str(ex)
+                logging.warning("spool: error uploading packets (retrying): %s" % ex)
+                self.backoff_s = min(self.max_backoff_s, max(self.min_backoff_s, 2*self.backoff_s))
+                # (wake up early only if stopping)
+                self.stopped.wait(self.backoff_s * random.uniform(0.5, 1))
+
+    def upload(self, rows):
+        """ Uploads the given spool rows, marking them finished as they're accepted/rejected.
+        Raises an exception (after saving any progress) if the upload should be retried. """
+        if self.batch_route is not None:
+            bodies = [self._with_id(body, upload_id) for _, upload_id, _, body in rows]
+            if self._post(self.batch_route, bodies, [row[0] for row in rows], reject=len(rows) == 1):
+                return
+            logging.warning("spool: batch of %d packets refused, uploading them one at a time" % len(rows))
+        for id, upload_id, route, body in rows:
+            self._post(route or self.route, self._with_id(body, upload_id), [id])
+
+    def _post(self, route, jsn, ids, reject=True):
+        """ POSTs the given JSON for the given spool rows, marking them acked or (if reject) rejected.
+        Returns whether they were finished (False if refused and not reject), and raises an exception
+        (after recording the failure) if the upload should be retried. """
+        self.requests += 1
+        try:
+            r = self.session.post(route, json=jsn, timeout=self.TIMEOUT_S)
+        except requests.RequestException as ex:
+            self.spool.record_failure(ids, str(ex), count_attempt=False)
+            raise
+
+        if 200 <= r.status_code < 300:
+            self.spool.finish(ids, STATUS.ACKED)
+            self.uploaded += len(ids)
+        elif r.status_code in self.REJECTED_STATUS_CODES:
+            if not reject:
+                return False
+            error = "rejected (%d): %s" % (r.status_code, r.text)
+            logging.error("spool: packet upload %s" % error)
+            self.spool.finish(ids, STATUS.REJECTED, error)
+            self.rejected += len(ids)
+        else:
+            error = "couldn't publish packet (%d): %s" % (r.status_code, r.text)
+            self.spool.record_failure(ids, error)
+            raise IOError(error)
+        return True
+
+    @staticmethod
+    def _with_id(body, upload_id):
+        body = dict(body)
+        body["upload_id"] = upload_id
+        return body
+
+    def get_stats(self):
+        stats = {
+            "uploaded": self.uploaded,
+            "rejected": self.rejected,
+            "requests": self.requests,
+            "failed_attempts": self.failed_attempts,
+            "backoff_s": self.backoff_s,
+            "last_error": self.last_error
+        }
+        stats.update(self.spool.counts())
+        return stats
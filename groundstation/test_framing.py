@@ -0,0 +1,79 @@
+#!/usr/bin/python
+# Tests of finding packets in the raw RX stream, including packets received with corrupted callsigns
+import random
+
+from reedsolomon import rscode
+from groundstation import EQUiStation
+from framing import PacketFramer
+
+MAX_CALLSIGN_ERRORS = 4
+
+def make_packet(rand):
+    """ Returns a random valid raw packet (callsign, rest of the header, then an encoded message) """
+    msg = bytearray(rand.getrandbits(8) for _ in range(EQUiStation.PACKET_LEN - EQUiStation.HEADER_LEN - rscode.NPAR))
+    header = EQUiStation.CALLSIGN + bytearray([rand.getrandbits(8)])
+    encoded, error = rscode.encode_bytes(msg)
+    assert error is None
+    return bytes(header + encoded)
+
+def make_noise(rand, length):
+    return bytes(bytearray(rand.getrandbits(8) for _ in range(length)))
+
+def flip_bits(data, start, end, num_bits, rand):
+    """ Returns data with num_bits distinct bits flipped in data[start:end] """
+    data = bytearray(data)
+    for bit in rand.sample(range(8*start, 8*end), num_bits):
+        data[bit // 8] ^= 1 << (bit % 8)
+    return bytes(data)
+
+def make_framer():
+    return PacketFramer(EQUiStation.CALLSIGN, EQUiStation.PACKET_LEN, max_callsign_errors=MAX_CALLSIGN_ERRORS,
+                        validate=EQUiStation.is_correctable_packet)
+
+def feed_in_chunks(framer, stream, rand):
+    events = []
+    i = 0
+    while i < len(stream):
+        n = rand.randint(1, 300)
+        events += framer.feed(stream[i:i+n])
+        i += n
+    return events
+
+def test_noise_after_near_callsigns_is_rejected():
+    rand = random.Random(1)
+    stream = b""
+    for _ in range(50):
+        num_errors = rand.randint(1, MAX_CALLSIGN_ERRORS)
+        near_callsign = flip_bits(EQUiStation.CALLSIGN, 0, len(EQUiStation.CALLSIGN), num_errors, rand)
+        stream += near_callsign + make_noise(rand, EQUiStation.PACKET_LEN)
+
+    framer = make_framer()
+    events = feed_in_chunks(framer, stream, rand)
+    assert events == []
+    assert framer.num_recovered == 0
+    assert framer.num_rejected >= 50
+
+def test_packets_with_corrupted_callsigns_are_recovered():
+    rand = random.Random(2)
+    stream = b""
+    expected = []
+    for _ in range(30):
+        stream += make_noise(rand, rand.randint(0, 400))
+        num_callsign_errors = rand.randint(0, MAX_CALLSIGN_ERRORS)
+        packet = make_packet(rand)
+        # (also corrupt some of the error-corrected part, within what the code can correct)
+        received = flip_bits(packet, EQUiStation.HEADER_LEN, EQUiStation.PACKET_LEN, rand.randint(0, 8), rand)
+        received = flip_bits(received, 0, len(EQUiStation.CALLSIGN), num_callsign_errors, rand)
+        expected.append((received, len(stream), num_callsign_errors, packet))
+        stream += received
+
+    framer = make_framer()
+    events = feed_in_chunks(framer, stream, rand)
+    assert [(e.packet, e.offset, e.callsign_errors) for e in events] == \
+        [(received, offset, errors) for received, offset, errors, _ in expected]
+    assert framer.num_recovered == sum(1 for _, _, errors, _ in expected if errors > 0)
+
+    for event, (_, _, _, packet) in zip(events, expected):
+        corrected, error, _ = EQUiStation.correct_raw_packet_errors(event.packet)
+        assert error is None
+        assert corrected == packet[:EQUiStation.PACKET_LEN - rscode.NPAR]
@@ -0,0 +1,36 @@
+#!/usr/bin/python
+# Tests of running scheduled events, including events scheduled by the callbacks
+import datetime
+
+from scheduler import Scheduler
+
+def test_events_rescheduled_into_the_past_wait_for_the_next_call():
+    scheduler = Scheduler()
+    now = datetime.datetime.utcnow()
+    runs = []
+    def reschedule():
+        runs.append("overdue")
+        scheduler.schedule(now - datetime.timedelta(seconds=1), reschedule, "overdue")
+    scheduler.schedule(now - datetime.timedelta(seconds=2), reschedule, "overdue")
+    scheduler.schedule(now, lambda: runs.append("other"), "other", priority=1)
+
+    assert scheduler.run_due(now) == 2
+    assert runs == ["overdue", "other"]
+    assert scheduler.get("overdue") is not None
+    assert scheduler.run_due(now) == 1
+    assert runs == ["overdue", "other", "overdue"]
+
+def test_due_events_run_in_deadline_then_priority_order():
+    scheduler = Scheduler()
+    now = datetime.datetime.utcnow()
+    runs = []
+    scheduler.schedule(now, lambda: runs.append("b"), "b", priority=1)
+    scheduler.schedule(now, lambda: runs.append("a"), "a", priority=0)
+    scheduler.schedule(now - datetime.timedelta(seconds=1), lambda: runs.append("first"), "first", priority=5)
+    scheduler.schedule(now + datetime.timedelta(seconds=1), lambda: runs.append("later"), "later")
+    scheduler.schedule(now, lambda: runs.append("cancelled"), "cancelled")
+    scheduler.cancel("cancelled")
+
+    assert scheduler.run_due(now) == 3
+    assert runs == ["first", "a", "b"]
+    assert scheduler.next_deadline() == now + datetime.timedelta(seconds=1)
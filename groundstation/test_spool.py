@@ -0,0 +1,86 @@
+#!/usr/bin/python
+# Tests of uploading the packet spool to the (mock) API when some packets fail
+import os
+import time
+import shutil
+import tempfile
+
+from spool import STATUS, PacketSpool, SpoolUploader
+from mock_api import MockApiServer
+
+def start_server():
+    server = MockApiServer(port=0)
+    server.start()
+    return server, "http://localhost:%d" % server.server_address[1]
+
+def wait_for(condition, timeout_s=10):
+    deadline = time.time() + timeout_s
+    while not condition() and time.time() < deadline:
+        time.sleep(0.05)
+    return condition()
+
+def run_uploader(spool, route, condition, **kwargs):
+    uploader = SpoolUploader(spool, route + "/receive", min_backoff_s=0.01, max_backoff_s=0.05, **kwargs)
+    uploader.start()
+    try:
+        assert wait_for(condition)
+    finally:
+        uploader.stop(timeout=5)
+    return uploader
+
+def test_failing_packet_doesnt_block_the_rest():
+    tmp_dir = tempfile.mkdtemp()
+    server, route = start_server()
+    try:
+        spool = PacketSpool(os.path.join(tmp_dir, "spool.db"), max_attempts=3)
+        spool.put({"n": 0})
+        server.fail_packet = lambda packet: 500 if packet["n"] == 0 else None
+        for n in range(1, 30):
+            spool.put({"n": n})
+
+        run_uploader(spool, route, lambda: spool.counts().get(STATUS.FAILED) == 1, batch_size=5)
+        assert sorted(packet["n"] for packet in server.packets) == list(range(1, 30))
+        assert spool.counts() == {STATUS.ACKED: 29, STATUS.FAILED: 1}
+        assert spool.pending(10) == []
+    finally:
+        server.shutdown()
+        server.server_close()
+        shutil.rmtree(tmp_dir)
+
+def test_refused_batch_only_rejects_bad_packets():
+    tmp_dir = tempfile.mkdtemp()
+    server, route = start_server()
+    try:
+        spool = PacketSpool(os.path.join(tmp_dir, "spool.db"))
+        for n in range(20):
+            spool.put({"n": n})
+        server.fail_packet = lambda packet: 422 if packet["n"] in (3, 17) else None
+
+        uploader = run_uploader(spool, route, lambda: spool.counts() == {STATUS.ACKED: 18, STATUS.REJECTED: 2},
+                                batch_route=route + "/batch", batch_size=10)
+        assert sorted(packet["n"] for packet in server.packets) == [n for n in range(20) if n not in (3, 17)]
+        assert uploader.rejected == 2
+    finally:
+        server.shutdown()
+        server.server_close()
+        shutil.rmtree(tmp_dir)
+
+def test_finished_packets_are_purged_while_running():
+    tmp_dir = tempfile.mkdtemp()
+    server, route = start_server()
+    try:
+        spool = PacketSpool(os.path.join(tmp_dir, "spool.db"))
+        uploader = SpoolUploader(spool, route + "/receive", poll_interval_s=0.05, retention_s=0, purge_interval_s=0)
+        uploader.start()
+        try:
+            for n in range(5):
+                spool.put({"n": n})
+            uploader.wake()
+            assert wait_for(lambda: len(server.packets) == 5)
+            assert wait_for(lambda: spool.counts() == {})
+        finally:
+            uploader.stop(timeout=5)
+    finally:
+        server.shutdown()
+        server.server_close()
+        shutil.rmtree(tmp_dir)
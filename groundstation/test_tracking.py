@@ -0,0 +1,48 @@
+#!/usr/bin/python
+# Tests of the doppler threshold time solver against a fine sweep of the passes
+import datetime
+
+from tracking import SatTracker, max_doppler_time_error_ms
+from groundstation import EQUiStation
+import radio_control
+
+# (fixed TLEs, so the passes are the same every run)
+TLE_LINES = ("ISS (ZARYA)",
+             "1 25544U 98067A   26289.50000000  .00016717  00000-0  10270-3 0  9997",
+             "2 25544  51.6416 247.4627 0006703 130.5360 325.0288 15.50377579 10009")
+START = datetime.datetime(2026, 10, 16, 12, 0, 0)
+NUM_PASSES = 10
+
+FREQ_STEP = radio_control.RADIO_FREQ_STEP_HZ
+FREQS = [1.5*FREQ_STEP, 0.5*FREQ_STEP, -0.5*FREQ_STEP, -1.5*FREQ_STEP]
+REFERENCE_STEP_S = 0.1
+MAX_ERROR_MS = 100 # how far the solved times may be from the reference sweep's
+MAX_EVALUATIONS = 60 # propagations per pass (a 5s sweep takes over 100 for a full pass)
+
+def get_passes(st):
+    return st.get_next_passes(start=st.datetime_to_ephem(START), num=NUM_PASSES)
+
+def test_solved_doppler_times_match_reference_sweep():
+    st = SatTracker(25544, tle_lines=TLE_LINES)
+    passes = get_passes(st)
+    assert len(passes) == NUM_PASSES
+    for pas in passes:
+        reference = st.get_doppler_freq_times(FREQS, pas, EQUiStation.RADIO_BASE_FREQ_HZ,
+                                              curve=st.get_pass_curve(pas, REFERENCE_STEP_S))
+        stats = {}
+        solved = st.get_doppler_freq_times(FREQS, pas, EQUiStation.RADIO_BASE_FREQ_HZ,
+                                           tolerance_s=EQUiStation.DOPPLER_TIME_TOLERANCE_S, stats=stats)
+        assert reference is not None
+        assert max_doppler_time_error_ms(solved, reference) <= MAX_ERROR_MS, (pas, solved, reference)
+        assert stats["evaluations"] <= MAX_EVALUATIONS
+
+def test_max_error_fails_on_mismatched_thresholds():
+    now = datetime.datetime.utcnow()
+    reference = {FREQS[0]: now, FREQS[1]: None}
+    assert max_doppler_time_error_ms(reference, reference) == 0
+    assert max_doppler_time_error_ms({FREQS[0]: now, FREQS[1]: now}, reference) == float("inf")
+    assert max_doppler_time_error_ms({FREQS[0]: None, FREQS[1]: None}, reference) == float("inf")
+    assert max_doppler_time_error_ms(None, reference) == float("inf")
+    assert max_doppler_time_error_ms(None, None) == 0
+    assert max_doppler_time_error_ms({FREQS[0]: now + datetime.timedelta(seconds=0.25), FREQS[1]: None},
+                                     reference) == 250
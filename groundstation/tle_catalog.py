@@ -0,0 +1,179 @@
+#!/usr/bin/python
+# Index of the TLEs in a (possibly large, multi-satellite) TLE file by catalog number,
+# parsed once and cached on disk next to the file so lookups and reloads are fast.
+import os
+import json
+import hashlib
+import logging
+import datetime
+import threading
+from collections import namedtuple
+
+INDEX_SUFFIX = ".index.json"
+DIGIT_VALUES = dict((str(d), d) for d in range(10))
+
+# one satellite's TLE: its name, the two element lines, and the epoch of the elements (a UTC datetime)
+TleEntry = namedtuple("TleEntry", ["name", "line1", "line2", "epoch"])
+
+def checksum_ok(line):
+    """ Returns whether the TLE line's last character is the checksum of the rest
+    (the sum of the digits, with minus signs counting as 1, mod 10) """
+    if len(line) < 69 or not line[68].isdigit():
+        return False
+    body = line[:68]
+    total = sum(DIGIT_VALUES.get(c, 0) for c in body) + body.count("-")
+    return total % 10 == int(line[68])
+
+def catalog_number(line):
+    """ Returns the (normalized, string) catalog number of the given TLE line """
+    number = line[2:7].strip()
+    return str(int(number)) if number.isdigit() else number
+
+def parse_epoch(line1):
+    """ Returns the epoch of the given first TLE line as a UTC datetime """
+    year = int(line1[18:20])
+    year += 2000 if year < 57 else 1900
+    day = float(line1[20:32])
+    return datetime.datetime(year, 1, 1) + datetime.timedelta(days=day - 1)
+
+def parse_tle_data(tle_data):
+    """ Parses the string list of TLEs (in two or three line format) into a dictionary
+    from catalog number to TleEntry, and returns it and the number of sets rejected
+    for failing their checksums or being malformed """
+    lines = [line.strip() for line in tle_data.split("\n")]
+    entries = {}
+    rejected = 0
+    name = None
+    i = 0
+    while i < len(lines):
+        line1 = lines[i]
+        line2 = lines[i+1] if i+1 < len(lines) else ""
+        if not (line1.startswith("1 ") and line2.startswith("2 ")):
+            # (a name line, or junk)
+            name = line1 if len(line1) > 0 else None
+            i += 1
+            continue
+
+        number = catalog_number(line1)
+        try:
+            if not (checksum_ok(line1) and checksum_ok(line2)) or catalog_number(line2) != number:
+                raise ValueError("bad checksum or mismatched lines")
+            epoch = parse_epoch(line1)
+        except ValueError as e:
+            logging.debug("tle catalog: rejected TLEs for %s: %s" % (number, e))
+            rejected += 1
+        else:
+            entries[number] = TleEntry(name if name is not None else number, line1, line2, epoch)
+        name = None
+        i += 2
+    return entries, rejected
+
+class TleCatalog:
+    """ The TLEs in filename, indexed by catalog number. The file is only parsed when it changes
+    (by mtime and size, then by content hash), and the index is cached in filename + INDEX_SUFFIX
+    so restarts don't have to parse it either. Safe to use from multiple threads. """
+    def __init__(self, filename):
+        self.filename = filename
+        self.index_filename = filename + INDEX_SUFFIX
+        self.lock = threading.Lock()
+        self.stamp = None # (mtime, size) of the file the entries are from
+        self.entries = {}
+        self.rejected = 0
+
+        # stats
+        self.parses = 0
+        self.index_loads = 0
+
+    def load(self):
+        """ (Re)loads the catalog if the file changed since it was last loaded. Raises IOError if
+        there is no file. """
+        try:
+            st = os.stat(self.filename)
+        except OSError as e:
+            raise IOError(e.errno, e.strerror, self.filename)
+        stamp = (st.st_mtime, st.st_size)
+        with self.lock:
+            if stamp == self.stamp:
+                return
+
+            index = self._load_index()
+            if index is not None and tuple(index["stamp"]) == stamp:
+                self._use_index(index, stamp)
+                return
+
+            with open(self.filename, "r") as f:
+                tle_data = f.read()
+            digest = hashlib.sha1(tle_data).hexdigest()
+            if index is not None and index["sha1"] == digest:
+                # (rewritten with the same TLEs, as happens on every update that finds nothing new)
+                self._use_index(index, stamp)
+            else:
+                self.entries, self.rejected = parse_tle_data(tle_data)
+                self.parses += 1
+                if self.rejected > 0:
+                    logging.warning("tle catalog: rejected %d TLE sets in %s" % (self.rejected, self.filename))
+            self.stamp = stamp
+            self._save_index(digest)
+
+    def get(self, norad_id):
+        """ Returns the TleEntry for the given NORAD ID (string or int), or None if there isn't one """
+        with self.lock:
+            return self.entries.get(str(norad_id))
+
+    def _use_index(self, index, stamp):
+        # (ephem wants str, not the unicode JSON gives us)
+        self.entries = dict((str(number), TleEntry(str(name), str(line1), str(line2), parse_epoch(line1)))
+                            for number, (name, line1, line2) in index["entries"].items())
+        self.rejected = index["rejected"]
+        self.stamp = stamp
+        self.index_loads += 1
+
+    def _load_index(self):
+        try:
+            with open(self.index_filename, "r") as f:
+                return json.load(f)
+        except (IOError, ValueError):
+            return None
+
+    def _save_index(self, digest):
+        index = {
+            "stamp": self.stamp,
+            "sha1": digest,
+            "rejected": self.rejected,
+            "entries": dict((number, [entry.name, entry.line1, entry.line2])
+                            for number, entry in self.entries.items())
+        }
+        # write then rename, so a crash never leaves a partial file
+        tmp_filename = self.index_filename + ".tmp"
+        try:
+            with open(tmp_filename, "w") as f:
+                json.dump(index, f)
+            os.rename(tmp_filename, self.index_filename)
+        except (IOError, OSError) as e:
+            logging.error("tle catalog: error saving index %s: %s" % (self.index_filename, e))
+
+    def get_stats(self):
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "rejected": self.rejected,
+                "parses": self.parses,
+                "index_loads": self.index_loads
+            }
+
+# catalogs by filename, shared by all the trackers reading the same file
+_catalogs = {}
+_catalogs_lock = threading.Lock()
+
+def get_catalog(filename):
+    """ Returns the (shared) TleCatalog of the given file, which may not have been loaded yet """
+    with _catalogs_lock:
+        if filename not in _catalogs:
+            _catalogs[filename] = TleCatalog(filename)
+        return _catalogs[filename]
+
+def get_stats():
+    """ Returns the stats of every catalog, by filename """
+    with _catalogs_lock:
+        catalogs = list(_catalogs.values())
+    return dict((catalog.filename, catalog.get_stats()) for catalog in catalogs)
@@ -0,0 +1,208 @@
+#!/usr/bin/python
+# Background refreshing of the TLE files, so the station always has the latest TLEs on hand
+# and never waits on (or hangs with) the tracking server.
+import os
+import json
+import time
+import random
+import logging
+import datetime
+import threading
+import requests
+
+import tle_catalog
+
+META_SUFFIX = ".http.json"
+
+class TleSource:
+    """ A TLE file and the route it's downloaded from. Downloads are conditional (on the ETag and
+    Last-Modified of the last download, which are saved in filename + META_SUFFIX), and only
+    replace the file if they have valid TLEs. Safe to use from multiple threads. """
+    TIMEOUT_S = 10
+
+    def __init__(self, filename, route):
+        self.filename = filename
+        self.route = route
+        self.meta_filename = filename + META_SUFFIX
+        self.lock = threading.Lock()
+        self.etag = None
+        self.last_modified = None
+        self.load_meta()
+
+        # stats
+        self.downloads = 0
+        self.not_modified = 0
+        self.failures = 0
+        self.last_checked = None # (time.time() of the last successful check)
+        self.last_error = None
+
+    def load_meta(self):
+        try:
+            with open(self.meta_filename, "r") as f:
+                meta = json.load(f)
+        except (IOError, ValueError):
+            return
+        if meta.get("route") == self.route:
+            self.etag = meta.get("etag")
+            self.last_modified = meta.get("last_modified")
+
+    def fetch(self, session=requests):
+        """ Downloads the TLEs if they changed, returning whether the file was updated.
+        Raises an exception (after counting the failure) if the download fails. """
+        with self.lock:
+            try:
+                return self._fetch(session)
+            except Exception as ex:
+                self.failures += 1
+                self.last_error = str(ex)
+                raise
+
+    def _fetch(self, session):
+        headers = {}
+        # (only ask for changes if we still have the file they'd be changes to)
+        if os.path.exists(self.filename):
+            if self.etag is not None:
+                headers["If-None-Match"] = self.etag
+            if self.last_modified is not None:
+                headers["If-Modified-Since"] = self.last_modified
+
+        r = session.get(self.route, headers=headers, timeout=self.TIMEOUT_S)
+        if r.status_code == requests.codes.not_modified:
+            self.not_modified += 1
+            self.last_checked = time.time()
+            return False
+        if r.status_code != requests.codes.ok:
+            raise IOError("error code getting TLEs: %d" % r.status_code)
+
+        tle_data = str(r.content)
+        # clean text of HTML (unless it doesn't seem to be there)
+        tle_data_list = tle_data.split("\n")
+        if len(tle_data_list) == 22:
+            tle_data_list = tle_data_list[13:16]
+            tle_data = "\n".join(tle_data_list)
+
+        # keep the TLEs we have rather than replace them with an error page
+        entries, _ = tle_catalog.parse_tle_data(tle_data)
+        if len(entries) == 0:
+            raise ValueError("no valid TLEs in response from %s" % self.route)
+
+        # write then rename, so readers never see a partial file
+        tmp_filename = self.filename + ".tmp"
+        with open(tmp_filename, "w") as f:
+            f.write(tle_data)
+        os.rename(tmp_filename, self.filename)
+
+        self.etag = r.headers.get("ETag")
+        self.last_modified = r.headers.get("Last-Modified")
+        try:
+            with open(self.meta_filename, "w") as f:
+                json.dump({"route": self.route, "etag": self.etag, "last_modified": self.last_modified}, f)
+        except IOError as e:
+            logging.warning("tle refresh: error saving %s: %s" % (self.meta_filename, e))
+        self.downloads += 1
+        self.last_checked = time.time()
+        return True
+
+    def get_stats(self):
+        return {
+            "checked_ago_s": time.time() - self.last_checked if self.last_checked is not None else None,
+            "downloads": self.downloads,
+            "not_modified": self.not_modified,
+            "failures": self.failures,
+            "last_error": self.last_error
+        }
+
+# sources by (filename, route), shared by all the trackers using them
+_sources = {}
+_sources_lock = threading.Lock()
+
+def get_source(filename, route):
+    """ Returns the (shared) TleSource for the given file and route """
+    with _sources_lock:
+        if (filename, route) not in _sources:
+            _sources[(filename, route)] = TleSource(filename, route)
+        return _sources[(filename, route)]
+
+class TleRefresher(threading.Thread):
+    """ Refreshes the TLE files of the given SatTrackers every interval_s in the background,
+    reloading the trackers whose files changed. Trackers keep using their current TLEs until then
+    (or if the refresh fails, in which case it's retried with exponential backoff, with jitter). """
+    def __init__(self, trackers, interval_s=60*60, min_backoff_s=30, max_backoff_s=60*60):
+        threading.Thread.__init__(self, name="tle-refresher")
+        self.daemon = True
+        self.trackers = list(trackers)
+        self.interval_s = interval_s
+        self.min_backoff_s = min_backoff_s
+        self.max_backoff_s = max_backoff_s
+        self.session = requests.Session()
+        self.wakeup = threading.Event()
+        self.stopped = threading.Event()
+        self.backoff_s = 0
+
+        # stats
+        self.refreshes = 0
+        self.failed_refreshes = 0
+
+    def wake(self):
+        """ Refreshes now (or as soon as any backoff is over) """
+        self.wakeup.set()
+
+    def stop(self, timeout=None):
+        self.stopped.set()
+        self.wakeup.set()
+        self.join(timeout)
+
+    def run(self):
+        while not self.stopped.is_set():
+            self.wakeup.clear()
+            try:
+                self.refresh()
+                self.backoff_s = 0
+                wait_s = self.interval_s
+            except Exception as ex:
+                self.failed_refreshes += 1
+                logging.warning("tle refresh: error refreshing TLEs (retrying): %s" % ex)
+                self.backoff_s = min(self.max_backoff_s, max(self.min_backoff_s, 2*self.backoff_s))
+                wait_s = self.backoff_s * random.uniform(0.5, 1)
+            self.wakeup.wait(wait_s)
+
+    def refresh(self):
+        """ Fetches every TLE file (once each) and reloads the trackers of those that changed.
+        Raises an exception if any couldn't be fetched, after refreshing the rest. """
+        errors = []
+        for (filename, route), trackers in self._get_sources().items():
+            try:
+                changed = get_source(filename, route).fetch(self.session)
+            except Exception as ex:
+                errors.append("%s: %s" % (route, ex))
+                continue
+            if changed:
+                logging.info("tle refresh: downloaded new TLEs to %s" % filename)
+                for tracker in trackers:
+                    if not tracker.reload_tle():
+                        logging.error("tle refresh: no TLEs for %s in %s" % (tracker.norad_id, filename))
+        self.refreshes += 1
+        if len(errors) > 0:
+            raise IOError("; ".join(errors))
+
+    def _get_sources(self):
+        sources = {}
+        for tracker in self.trackers:
+            sources.setdefault((tracker.tle_fname, tracker.tle_route), []).append(tracker)
+        return sources
+
+    def get_stats(self):
+        """ Returns the age of each satellite's TLEs, and the refresh counts of each file """
+        now = datetime.datetime.utcnow()
+        stats = {
+            "refreshes": self.refreshes,
+            "failed_refreshes": self.failed_refreshes,
+            "backoff_s": self.backoff_s
+        }
+        for tracker in self.trackers:
+            tle = tracker.tle
+            stats["tle_age_h_%s" % tracker.norad_id] = \
+                (now - tle._epoch.datetime()).total_seconds() / 3600.0 if tle is not None else None
+        for filename, route in self._get_sources():
+            stats[filename] = get_source(filename, route).get_stats()
+        return stats
@@ -5,31 +5,97 @@ import ephem
 import datetime
 import math
 import logging
-import requests
-from collections import OrderedDict
+import numpy as np
+from collections import OrderedDict, namedtuple
 
 import station_config as station
 import groundstation
 import utils
+import radio_control
+import tle_catalog
+import tle_refresh
 
 DEFAULT_TLE_FNAME = "tle.txt"
 TLE_GET_ROUTE = "http://tracking.brownspace.org/api/tle" #"https://www.celestrak.com/cgi-bin/TLE.pl?CATNR=%s"
 
+# The satellite's track over a pass, sampled at regular times. Each field is a NumPy array:
+# times (ephem dates, i.e. float days), range_rates (m/s, negative when approaching), doppler_factors,
+# elevations and azimuths (degrees)
+PassCurve = namedtuple("PassCurve", ["times", "range_rates", "doppler_factors", "elevations", "azimuths"])
+
+def brent_root(func, a, b, fa, fb, xtol, max_iter=100):
+    """ Finds a root of func in [a, b] to within xtol using Brent's method (inverse quadratic
+    interpolation/secant steps, falling back to bisection), given fa = func(a) and fb = func(b)
+    of opposite signs. Adapted from scipy's brentq. """
+    if fa == 0:
+        return a
+    if fb == 0:
+        return b
+    xpre, xcur, fpre, fcur = a, b, fa, fb
+    xblk, fblk, spre, scur = 0.0, 0.0, 0.0, 0.0
+    for _ in range(max_iter):
+        if fpre * fcur < 0:
+            xblk, fblk = xpre, fpre
+            spre = scur = xcur - xpre
+        if abs(fblk) < abs(fcur):
+            xpre, xcur, xblk = xcur, xblk, xcur
+            fpre, fcur, fblk = fcur, fblk, fcur
+
+        delta = xtol / 2
+        sbis = (xblk - xcur) / 2
+        if fcur == 0 or abs(sbis) < delta:
+            return xcur
+
+        if abs(spre) > delta and abs(fcur) < abs(fpre):
+            if xpre == xblk:
+                # secant
+                stry = -fcur * (xcur - xpre) / (fcur - fpre)
+            else:
+                # inverse quadratic interpolation
+                dpre = (fpre - fcur) / (xpre - xcur)
+                dblk = (fblk - fcur) / (xblk - xcur)
+                stry = -fcur * (fblk * dblk - fpre * dpre) / (dblk * dpre * (fblk - fpre))
+            if 2 * abs(stry) < min(abs(spre), 3 * abs(sbis) - delta):
+                spre, scur = scur, stry
+            else:
+                spre, scur = sbis, sbis # interpolation is going badly; bisect
+        else:
+            spre, scur = sbis, sbis
+
+        xpre, fpre = xcur, fcur
+        if abs(scur) > delta:
+            xcur += scur
+        else:
+            xcur += delta if sbis > 0 else -delta
+        fcur = func(xcur)
+    return xcur
+
 class SatTracker:
     SPEED_OF_LIGHT_MPS = 299792000
 
-    def __init__(self, norad_id, tle_fname=DEFAULT_TLE_FNAME):
+    def __init__(self, norad_id, tle_fname=DEFAULT_TLE_FNAME, tle_route=TLE_GET_ROUTE, tle_lines=None):
+        """ Tracks the satellite with the given NORAD ID, with TLEs from tle_fname (downloaded from tle_route),
+        or just the given (name, line 1, line 2) TLE lines if given """
         self.norad_id = str(norad_id)
         self.tle_fname = tle_fname
+        self.tle_route = tle_route
         self.tle = None
-        self.load_tle() # populates self.tle
+        self.tle_lines = None
+        self.observer = None # station observer, copied for use
+        if tle_lines is not None:
+            self.tle_lines = tuple(tle_lines)
+            self.tle = ephem.readtle(*self.tle_lines)
+        else:
+            self.load_tle() # populates self.tle
 
     def get_observer(self):
-        obs = ephem.Observer()
-        obs.lon = str(station.station_lon)
-        obs.lat = str(station.station_lat)
-        obs.elevation = station.station_alt
-        return obs
+        """ Returns a (new copy of the) observer at the station """
+        if self.observer is None:
+            self.observer = ephem.Observer()
+            self.observer.lon = str(station.station_lon)
+            self.observer.lat = str(station.station_lat)
+            self.observer.elevation = station.station_alt
+        return self.observer.copy()
 
     def get_next_pass(self, start=None):
         """ Returns a dictionary with the rise and set time and azimuth as well as
@@ -45,7 +111,8 @@ class SatTracker:
             else:
                 obs.date = ephem.now()
 
-            passData = obs.next_pass(self.tle)
+            tle = self.tle.copy() # copy to not modify (we may be used from multiple threads)
+            passData = obs.next_pass(tle)
             # next_pass returns a six-element tuple giving:
             # (dates are in UTC)
             # 0  Rise time
@@ -63,17 +130,16 @@ class SatTracker:
                 if data is None:
                     return None
 
-            rise_time = passData[0].datetime()
-            set_time = passData[4].datetime()
+            # (reuse the observer and TLE copy for the doppler factors)
             return OrderedDict([
-                ('rise_time', rise_time),
+                ('rise_time', passData[0].datetime()),
                 ('rise_azimuth', math.degrees(passData[1])),
-                ('rise_doppler_factor', self.get_doppler_factor(rise_time)),
+                ('rise_doppler_factor', self._compute_doppler_factor(obs, tle, passData[0])),
                 ('max_alt_time', passData[2].datetime()),
                 ('max_alt', math.degrees(passData[3])),
-                ('set_time', set_time),
+                ('set_time', passData[4].datetime()),
                 ('set_azimuth', math.degrees(passData[5])),
-                ('set_doppler_factor', self.get_doppler_factor(set_time))
+                ('set_doppler_factor', self._compute_doppler_factor(obs, tle, passData[4]))
             ])
         except ValueError as e: # thrown by ephem
             logging.error("tracking: error computing pass: %s" % e)
@@ -81,18 +147,32 @@ class SatTracker:
 
     # TLE handling adapted from https://github.com/tydlwav/GSW-Sat-Tracking work
     def load_tle(self):
-        for i in range(2):
-            try:
-                with open(self.tle_fname, 'r') as tle_file:
-                    tles = tle_file.read()
-                    self.tle = self.extract_tle(self.norad_id, tles)
-                    if self.tle is None:
-                        raise IOError("tracking file could not be parsed")
-
-            except IOError as e:
-                logging.warn("tracking: TLE file not found, attempting to re-download (err: %s)" % e)
-                # if the file's not found, we need to perform initial update
-                self.update_tle()
+        """ Loads our TLE from the (indexed) TLE file, downloading it if it isn't there or doesn't have ours """
+        if not self.reload_tle():
+            logging.warn("tracking: no TLEs for %s in %s, attempting to re-download" % (self.norad_id, self.tle_fname))
+            # if the file's not found, we need to perform initial update
+            self.update_tle()
+
+    def reload_tle(self):
+        """ Loads our TLE from the (indexed) TLE file, without downloading it. Returns if it had our TLE
+        (if not, we keep any TLE we had) """
+        try:
+            catalog = tle_catalog.get_catalog(self.tle_fname)
+            catalog.load()
+            entry = catalog.get(self.norad_id)
+        except IOError as e:
+            logging.debug("tracking: couldn't load TLE file: %s" % e)
+            return False
+        if entry is None:
+            return False
+        self._set_tle_entry(entry)
+        return True
+
+    def get_tle_key(self):
+        """ Returns a string identifying the current TLEs (by satellite and epoch), or None if there are none """
+        if self.tle is None:
+            return None
+        return "%s:%s" % (self.norad_id, self.tle._epoch)
 
     def get_next_passes(self, start=None, num=10):
         if start is None:
@@ -109,18 +189,24 @@ class SatTracker:
     ## Doppler Helpers ##
     #####################
 
-    def get_doppler_freq_times(self, dev_freqs_hz, pass_data, base_freq_hz, time_step_s=5):
+    def get_doppler_freq_times(self, dev_freqs_hz, pass_data, base_freq_hz, tolerance_s=0.05, curve=None, stats=None):
         """ Returns a dictionary from the values in dev_freqs_hz to the approximate datetimes
             corresponding to when those relative frequency deviations occured in the given pass.
-            Returns None if the the pass did not generate sufficient data given time_step_s.
+            Returns None if the the pass did not generate sufficient data.
             Additionally, if any of the given frequency deviations were never reached in the pass
             (they were larger than the largest deviation or smaller than the smallest)
             they will be set to None.
             :param base_freq_hz: required to convert between
-            relative doppler frequencies and doppler factors. """
+            relative doppler frequencies and doppler factors.
+            :param tolerance_s: how accurately to find the times (see find_doppler_factor_times)
+            :param curve: if given, interpolate the times from this PassCurve of the pass instead
+            :param stats: see find_doppler_factor_times """
         # convert the frequencies to factors for easier comparison with library output
         factors = [dev_freq_hz / float(base_freq_hz) for dev_freq_hz in dev_freqs_hz]
-        factor_times = self.get_doppler_factor_times(factors, pass_data, time_step_s)
+        if curve is not None:
+            factor_times = self.get_doppler_factor_times(factors, pass_data, None, curve=curve)
+        else:
+            factor_times = self.find_doppler_factor_times(factors, pass_data, tolerance_s, stats=stats)
         if factor_times is None:
             return None
 
@@ -131,94 +217,110 @@ class SatTracker:
             freq_times[freq_val] = factor_times[fac_val]
         return freq_times
 
-    def get_doppler_factor_times(self, factors, pass_data, time_step_s):
+    def get_doppler_factor_times(self, factors, pass_data, time_step_s, curve=None):
         """ Returns a dictionary from the values in factors to the approximate datetimes
             corresponding to when those factors occur in the given pass.
             Returns None if the the pass did not generate sufficient data given time_step_s.
             Additionally, if any of the given factors were never reached in the pass
             (they were larger than the largest factor or smaller than the smallest)
-            they will be set to None. """
-        # grab a long list of all factors, equally spaced in the pass
-        all_factors = self.get_doppler_factors(pass_data, time_step_s)
+            they will be set to None.
+            :param curve: the pass's PassCurve, if already computed (see get_pass_curve);
+            otherwise it's computed with time_step_s resolution """
+        if curve is None:
+            curve = self.get_pass_curve(pass_data, time_step_s)
+        all_factors = curve.doppler_factors
         if len(all_factors) < 1:
             return None
 
-        # sort in descending order so we can go through the pass sequentially
-        factors = sorted(factors, reverse=True)
-        i = 0
+        # the factors should decrease over the pass (from approaching to receding)
+        if np.any(np.diff(all_factors) > 1e-6):
+            logging.error("List of doppler factors for a pass was not monotonically decreasing: %s" % all_factors)
+
+        # find when each factor is crossed by linear interpolation between the neighboring samples
+        # (np.interp needs increasing x values, so negate the decreasing factors)
+        # (see: https://en.wikipedia.org/wiki/Linear_interpolation#Linear_interpolation_between_two_known_points)
+        factors = np.asarray(factors, dtype=float)
+        interp_times = np.interp(-factors, -all_factors, curve.times)
+        # factors at or outside the largest/smallest in the pass were never reached
+        reached = (factors < all_factors[0]) & (factors > all_factors[-1])
+
         factors_dict = {}
+        for factor, interp_time, was_reached in zip(factors.tolist(), interp_times.tolist(), reached.tolist()):
+            factors_dict[factor] = ephem.Date(interp_time).datetime() if was_reached else None
+        return factors_dict
+
+    def find_doppler_factor_times(self, factors, pass_data, tolerance_s=0.05, stats=None):
+        """ Returns a dictionary from the values in factors to the datetimes (to within tolerance_s)
+            when those factors occur in the given pass, or None for any factors never reached in the pass.
+            Each factor is bracketed by the pass's rise and set and then solved for with Brent's method,
+            which takes around ten propagations per factor.
+            Returns None if the pass data is invalid (it sets before it rises).
+            :param stats: if a dict is given, the number of propagations made is put in its "evaluations" """
+        obs = self.get_observer()
+        tle = self.tle.copy() # copy to not modify
+        evaluations = [0]
+        def factor_at(date):
+            evaluations[0] += 1
+            return self._compute_doppler_factor(obs, tle, date)
+
+        # the factor decreases over the pass (from approaching to receding),
+        # so only factors between those at rise and set are reached
+        start = float(ephem.Date(pass_data["rise_time"]))
+        end = float(ephem.Date(pass_data["set_time"]))
+        if end <= start:
+            return None
+        start_factor = factor_at(start)
+        end_factor = factor_at(end)
 
-        # initially, iterate through and set to None all the factors LARGER
-        # than the largest factor in all_factors (they're outside this pass)
-        # NOTE: the largest factor should always be the last factor in the list
-        largest_fac = all_factors[0]["factor"]
-        while factors[i] >= largest_fac:
-            factors_dict[factors[i]] = None
-            i += 1
-            # if for some reason we reach the end, quit with all factors None
-            if i == len(factors):
-                return factors_dict
-
-        # iterate over the long list of factors, finding the intersection point
-        # of each of the given factors
-        # (do linear regression with prev point so skip first point)
-        for j in range(1, len(all_factors)):
-            prev_point = all_factors[j-1]
-            point = all_factors[j]
-            # check that it's monotonically decreasing
-            if prev_point["factor"] - point["factor"] < -1e-6:
-                logging.error("List of doppler factors for a pass was not monotonically decreasing: %s" % all_factors)
-
-            # print("%20s: fac=%+8f desired=%+8f (%d) (freq=%+4f)" % (point["time"], point["factor"], factors[i], i, 435.55e3 * point["factor"]))
-
-            # as soon as the current factor in the list (decreasing) is smaller than the largest desired
-            # factor ("intersects it"/has passed it) we can estimate the exact time of that factor using
-            # linear regression between the previous point and this one
-            if point["factor"] < factors[i]:
-                # use the formula for linear interpolation to compute the expected (interpolated)
-                # date given the desired factor
-                # (see: https://en.wikipedia.org/wiki/Linear_interpolation#Linear_interpolation_between_two_known_points)
-                # (this is on a plot of seconds vs. factor value)
-                secs_per_factor = (point["time"] - prev_point["time"]).total_seconds() / (point["factor"] - prev_point["factor"])
-                secs_from_prev = (factors[i] - prev_point["factor"]) * secs_per_factor
-                interp_time = prev_point["time"] + datetime.timedelta(seconds=secs_from_prev)
-                assert utils.dtime_after(interp_time, prev_point["time"]) and utils.dtime_after(point["time"], interp_time)
-                factors_dict[factors[i]] = interp_time
-                # move onto the next smallest factor in our desired list
-                i += 1
-                # if we reach the end, quit
-                if i == len(factors):
-                    return factors_dict
-
-        # at the end, iterate through and set to None all the factors SMALLER
-        # than the smallest factor in all_factors (they're outside this pass)
-        # NOTE: the smallest factor should always be the last factor in the list
-        smallest_fac = all_factors[len(all_factors)-1]["factor"]
-        while factors[i] <= smallest_fac:
-            factors_dict[factors[i]] = None
-            i += 1
-            # if we reach the end, quit
-            if i == len(factors):
-                return factors_dict
+        factors_dict = {}
+        for factor in factors:
+            if start_factor > factor > end_factor:
+                root = brent_root(lambda date: factor_at(date) - factor, start, end,
+                                  start_factor - factor, end_factor - factor, tolerance_s * ephem.second)
+                factors_dict[factor] = ephem.Date(root).datetime()
+            else:
+                factors_dict[factor] = None
 
+        if stats is not None:
+            stats["evaluations"] = evaluations[0]
         return factors_dict
 
+    def get_pass_curve(self, pass_data, time_step_s=1):
+        """ Returns a PassCurve of the satellite's track over the given pass (from rise to set),
+        sampled every time_step_s seconds.
+        Uses a single observer and TLE copy, stepping them through the pass in ephem dates (without any
+        datetime conversions) and filling preallocated arrays, so even 1s resolution takes milliseconds. """
+        obs = self.get_observer()
+        tle = self.tle.copy() # copy to not modify
+        start = ephem.Date(pass_data["rise_time"])
+        end = ephem.Date(pass_data["set_time"])
+        step = time_step_s * ephem.second
+        num = max(0, int(math.ceil((end - start) / step)))
+        times = start + step * np.arange(num)
+        # (the last sample may round to the set time; keep only samples strictly before it)
+        times = times[times < end]
+
+        range_rates = np.empty(len(times))
+        elevations = np.empty(len(times))
+        azimuths = np.empty(len(times))
+        for i, t in enumerate(times.tolist()):
+            obs.date = t
+            tle.compute(obs)
+            range_rates[i] = tle.range_velocity
+            elevations[i] = tle.alt
+            azimuths[i] = tle.az
+
+        # negative because negative (inbound) range rate means an increase in frequency
+        doppler_factors = -range_rates / self.SPEED_OF_LIGHT_MPS
+        return PassCurve(times, range_rates, doppler_factors, np.degrees(elevations), np.degrees(azimuths))
+
     def get_doppler_factors(self, pass_data, time_step_s):
         """ Returns a list of {'time', 'factor'} dicts giving the doppler factor at each time.
         Sorted in increasing time order.
          :param time_step_s: the time step to use to generate the list. """
-        obs = self.get_observer()
-        tle = self.tle.copy() # copy to not modify
-        factors = []
-        cur_time = pass_data["rise_time"]
-        while utils.dtime_after(pass_data["set_time"], cur_time):
-            factors.append({
-                "time": cur_time,
-                "factor": self.get_doppler_factor(cur_time, obs=obs, tle=tle)
-            })
-            cur_time = cur_time + datetime.timedelta(seconds=time_step_s)
-
-        return factors
+        curve = self.get_pass_curve(pass_data, time_step_s)
+        return [{"time": ephem.Date(t).datetime(), "factor": factor}
+                for t, factor in zip(curve.times.tolist(), curve.doppler_factors.tolist())]
 
     def get_doppler_factor(self, dtime, obs=None, tle=None):
         # use provided objects if given, otherwise get new ones
@@ -226,11 +328,14 @@ class SatTracker:
             obs = self.get_observer()
         if tle is None:
             tle = self.tle.copy() # copy to not modify
+        return self._compute_doppler_factor(obs, tle, self.datetime_to_ephem(dtime))
 
-        obs.date = self.datetime_to_ephem(dtime)
+    @classmethod
+    def _compute_doppler_factor(cls, obs, tle, date):
+        obs.date = date
         tle.compute(obs)
         # negative because negative (inbound) range rate means an increase in frequency
-        return -tle.range_velocity / self.SPEED_OF_LIGHT_MPS
+        return -tle.range_velocity / cls.SPEED_OF_LIGHT_MPS
 
     @staticmethod
     def pass_tostr(pass_data, sig_freq_hz=1000):
@@ -259,59 +364,39 @@ class SatTracker:
     @staticmethod
     def extract_tle(norad_id, tle_data):
         """ Extracts the TLE set with the given string NORAD ID from the string list of TLEs,
-            and returns a three-element string list of the satellite name and two lines of elements.
-            Returns None if no TLEs for norad_id was found. """
-        tle_list = tle_data.split("\n")
+            and returns it as an ephem body. Returns None if no TLEs for norad_id was found. """
+        tle_lines = SatTracker.extract_tle_lines(norad_id, tle_data)
+        return ephem.readtle(*tle_lines) if tle_lines is not None else None
 
-        # invalid TLE file
-        if len(tle_list) < 3:
-            return None
-
-        for i in range(0, len(tle_list)-2):
-            try:
-                tle = ephem.readtle(tle_list[i], tle_list[i+1], tle_list[i+2])
-            except ValueError:
-                # watch for bad TLE line formats when we're in the middle of the line
-                continue
-
-            if str(tle.catalog_number) == norad_id:
-                return tle
+    @staticmethod
+    def extract_tle_lines(norad_id, tle_data):
+        """ Extracts the TLE set with the given string NORAD ID from the string list of TLEs,
+            and returns a three-element string tuple of the satellite name and two lines of elements.
+            Returns None if no TLEs for norad_id was found (or they failed their checksums). """
+        entries, _ = tle_catalog.parse_tle_data(tle_data)
+        entry = entries.get(str(norad_id))
+        return (entry.name, entry.line1, entry.line2) if entry is not None else None
 
-        return None
+    def _set_tle_entry(self, entry):
+        """ Sets our TLE from the given TleEntry (to None if it's None) """
+        self.tle_lines = (entry.name, entry.line1, entry.line2) if entry is not None else None
+        self.tle = ephem.readtle(*self.tle_lines) if self.tle_lines is not None else None
 
     def update_tle(self):
-        """ Update the TLE data from the remote Celestrack server. Returns if successful """
+        """ Updates the TLE data from the remote server now (if it changed), blocking on the download.
+        Returns if successful. (The station keeps them up to date with a tle_refresh.TleRefresher instead.) """
         # watch for any connection failure
         try:
-            req = requests.get(TLE_GET_ROUTE)
-            if req.status_code != requests.codes.ok:
-                logging.error("tracking: error code getting TLEs: %d" % req.status_code)
-                return False
+            tle_refresh.get_source(self.tle_fname, self.tle_route).fetch()
         except Exception as ex:
             logging.error("tracking: exception getting TLEs: %s" % ex)
             return False
 
-        tle_data = str(req.text.decode("utf8"))
-
-        # clean text of HTML (unless it doesn't seem to be there)
-        tle_data_list = tle_data.split("\n")
-        if len(tle_data_list) == 22:
-            tle_data_list = tle_data_list[13:16]
-            tle_data = "\n".join(tle_data_list)
-
         # update memory cache
-        self.tle = self.extract_tle(self.norad_id, tle_data)
-
-        try:
-            # update file cache
-            with open(self.tle_fname, 'w') as tle_file:
-                # Make file blank
-                tle_file.truncate(0)
-                tle_file.write(tle_data)
-                return True
-        except IOError as e:
-            logging.error("tracking: error writing TLE file: %s" % e)
+        if not self.reload_tle():
+            logging.error("tracking: no TLEs for %s in %s" % (self.norad_id, self.tle_fname))
             return False
+        return True
 
     def pyephem_pass_test(self, start_date=None, num=10):
         """ Adapted from https://brainwagon.org/2009/09/27/how-to-use-python-to-predict-satellite-locations/ """
@@ -334,9 +419,45 @@ class SatTracker:
             print
             obs.date = tr + ephem.minute
 
+def max_doppler_time_error_ms(times, reference):
+    """ Returns the largest difference (in ms) between the doppler threshold times (as given by
+    get_doppler_freq_times) and the reference ones, or infinity if they disagree on whether there
+    are any times, or on which thresholds are reached in the pass """
+    if times is None or reference is None:
+        return 0 if times is None and reference is None else float("inf")
+    errors = [0]
+    for freq in reference:
+        if (times.get(freq) is None) != (reference[freq] is None):
+            return float("inf")
+        if reference[freq] is not None:
+            errors.append(abs((times[freq] - reference[freq]).total_seconds())*1000)
+    return max(errors)
+
+def check_doppler_time_accuracy(st, passes, base_freq_hz, tolerance_s=0.05, reference_step_s=0.1):
+    """ Prints the error of the doppler threshold times found by the solver (and by interpolating
+    5s samples, as we used to) against a reference sweep of the given passes, with the propagations each took
+    (see test_tracking.py for the test of them) """
+    freq_step = radio_control.RADIO_FREQ_STEP_HZ
+    freqs = [1.5*freq_step, 0.5*freq_step, -0.5*freq_step, -1.5*freq_step]
+    for pas in passes:
+        reference = st.get_doppler_freq_times(freqs, pas, base_freq_hz, curve=st.get_pass_curve(pas, reference_step_s))
+        stats = {}
+        solved = st.get_doppler_freq_times(freqs, pas, base_freq_hz, tolerance_s=tolerance_s, stats=stats)
+        coarse_curve = st.get_pass_curve(pas, 5)
+        coarse = st.get_doppler_freq_times(freqs, pas, base_freq_hz, curve=coarse_curve)
+        print("%s: solver: %3d propagations, max error %6.1f ms | 5s samples: %3d propagations, max error %6.1f ms" %
+              (utils.date_to_str(pas["rise_time"]), stats.get("evaluations", 0), max_doppler_time_error_ms(solved, reference),
+               len(coarse_curve.times), max_doppler_time_error_ms(coarse, reference)))
+
 if __name__ == "__main__":
+    import sys
     import config
     st = SatTracker(config.SAT_CATALOG_NUMBER)
+    if len(sys.argv) > 1 and sys.argv[1] == "accuracy":
+        print("doppler threshold time accuracy (against a 0.1s sweep):")
+        passes = st.get_next_passes(num=10, start=datetime.datetime.utcnow())
+        check_doppler_time_accuracy(st, passes, groundstation.EQUiStation.RADIO_BASE_FREQ_HZ)
+        sys.exit(0)
     #st.update_tle()
     print("next passes:")
     passes = st.get_next_passes(num=10, start=datetime.datetime.utcnow()) # + datetime.timedelta(hours=1))
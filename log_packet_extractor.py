@@ -1,22 +1,45 @@
 #!/usr/bin/python
-# Script to extract hex packets from a log file dumped by EQUiSatOS in with the PRINT_HEX_TRANSMISSIONS flag defined.
+# Script to extract hex packets from a log file dumped by EQUiSatOS in with the PRINT_HEX_TRANSMISSIONS flag defined,
+# or from a groundstation RX capture directory (optionally only data received in a time range).
+import os
 import sys
 import csv
+import calendar
+import datetime
 from binascii import hexlify
 from groundstation import groundstation
+from groundstation.framing import PacketFramer
+from groundstation.capture_store import CaptureReader
 from groundstation.packetparse import packetparse
 import json
 
 CONVERT_TO_HEX = False # as opposed to assuming it's in hex
 WRITE_PARSED = True
-CSV_HEADERS = ["packet", "valid (only hex chars)", "parsed timestamp", "parsed message type", "parsed sat state", "full parsed JSON"]
+CORRECT_ERRORS = True # error correct (in one batch) and parse the corrected packets
+CSV_HEADERS = ["packet", "valid (only hex chars)", "parsed timestamp", "parsed message type", "parsed sat state", "full parsed JSON",
+               "corrected packet", "correction error"]
 
-def check_line_for_packets(line, outwriter):
+def check_line_for_packets(line, framer):
+    """ Feeds the next line of the log to the framer, returning any packets it completed
+    (packets may be split across lines) """
     if CONVERT_TO_HEX:
         line = hexlify(line)
+    else:
+        line = line.rstrip("\r\n")
+
+    return [event.packet for event in framer.feed(line)]
+
+def write_packets(packets, outwriter):
+    corrected = [""] * len(packets)
+    errors = [None] * len(packets)
+    if CORRECT_ERRORS and len(packets) > 0:
+        corrected, errors = groundstation.EQUiStation.correct_packets_errors(packets)
+
+    for i in range(len(packets)):
+        packet = packets[i]
+        # parse the corrected version if we have it
+        to_parse = corrected[i] if CORRECT_ERRORS and errors[i] is None else packet
 
-    packets, _ = groundstation.EQUiStation.extract_packets(line)
-    for packet in packets:
         # whether valid
         valid = packetparse.is_hex_str(packet)
 
@@ -24,38 +47,53 @@ def check_line_for_packets(line, outwriter):
         try:
             preamble = {"timestamp": -1, "message_type": "[corrupted]", "satellite_state": "[corrupted]"}
             if valid:
-                preamble = packetparse.parse_preamble(packet)
+                preamble = packetparse.parse_preamble(to_parse)
 
             # parse too if asked
             parsed = ""
             if WRITE_PARSED and valid:
-                parsed, _ = packetparse.parse_packet(packet)
+                parsed, _ = packetparse.parse_packet(to_parse)
 
-            outwriter.writerow([packet, valid, preamble["timestamp"], preamble["message_type"], preamble["satellite_state"], json.dumps(parsed, indent=4)])
+            outwriter.writerow([packet, valid, preamble["timestamp"], preamble["message_type"], preamble["satellite_state"], json.dumps(parsed, indent=4),
+                                corrected[i], errors[i]])
         except KeyError:
             continue # parsing error
 
-    return len(packets)
-
-def parse_packets(filename, outfile):
-    num_found = 0
-    with open(filename, "r") as log:
-        with open(outfile, "w") as out:
-            outwriter = csv.writer(out)
-            outwriter.writerow(CSV_HEADERS)
-
+def parse_packets(filename, outfile, start=None, end=None):
+    """ Extracts packets from the given log file or capture directory (in which case only data
+    received in [start, end) is used, if given) and writes them to a CSV """
+    packets = []
+    framer = PacketFramer(groundstation.EQUiStation.CALLSIGN_HEX, groundstation.EQUiStation.PACKET_STR_LEN)
+    if os.path.isdir(filename):
+        for _, data in CaptureReader(filename).read(start, end):
+            packets += [event.packet for event in framer.feed(hexlify(data))]
+    else:
+        with open(filename, "r") as log:
             while True:
                 line = log.readline()
                 if line == "":
-                    return num_found
+                    break
                 else:
-                    num_found += check_line_for_packets(line, outwriter)
+                    packets += check_line_for_packets(line, framer)
+
+    with open(outfile, "w") as out:
+        outwriter = csv.writer(out)
+        outwriter.writerow(CSV_HEADERS)
+        write_packets(packets, outwriter)
+
+    return len(packets)
+
+def parse_time(time_str):
+    """ Converts a UTC time string (e.g. 2018-09-01T14:02:00) to seconds since epoch """
+    return calendar.timegm(datetime.datetime.strptime(time_str, "%Y-%m-%dT%H:%M:%S").timetuple())
 
 def main():
-    if len(sys.argv) != 3:
-        print("usage: ./log_packet_extractor.py <log file> <output csv>")
+    if not (3 <= len(sys.argv) <= 5):
+        print("usage: ./log_packet_extractor.py <log file or capture dir> <output csv> [start UTC time] [end UTC time]")
     else:
-        num_found = parse_packets(sys.argv[1], sys.argv[2])
+        start = parse_time(sys.argv[3]) if len(sys.argv) >= 4 else None
+        end = parse_time(sys.argv[4]) if len(sys.argv) >= 5 else None
+        num_found = parse_packets(sys.argv[1], sys.argv[2], start, end)
         print("Found %d packets" % num_found)
 
 if __name__ == "__main__":